@@ -0,0 +1,5 @@
+"""
+Benchmarks for `together`, run against synthetic plugin sets
+
+Run with `python -m benchmarks --help` from the repository root.
+"""
@@ -0,0 +1,93 @@
+import json
+import sys
+import tempfile
+
+import click
+
+from benchmarks.generate import describe, generate
+from benchmarks.measure import compare, run_suite
+from benchmarks.plugin_support import REGISTRATION_STYLES
+
+
+@click.command("benchmarks")
+@click.option("--plugins", default=20, show_default=True, help="Number of plugins.")
+@click.option("--depth", default=3, show_default=True, help="Depth of the tree.")
+@click.option("--fanout", default=5, show_default=True, help="Children per group.")
+@click.option(
+    "--style",
+    type=click.Choice(REGISTRATION_STYLES),
+    default="list",
+    show_default=True,
+    help="How plugins return their registrations.",
+)
+@click.option("--handlers", default=2, show_default=True, help="Handlers per plugin.")
+@click.option("--repeat", default=20, show_default=True, help="Warm repetitions.")
+@click.option("--cold-repeat", default=5, show_default=True, help="Cold repetitions.")
+@click.option("--save", type=click.Path(dir_okay=False), help="Write results here.")
+@click.option(
+    "--baseline",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Compare against results saved with --save.",
+)
+@click.option(
+    "--threshold",
+    default=1.2,
+    show_default=True,
+    help="Ratio to the baseline at which a measurement is a regression.",
+)
+def main(
+    plugins,
+    depth,
+    fanout,
+    style,
+    handlers,
+    repeat,
+    cold_repeat,
+    save,
+    baseline,
+    threshold,
+):
+    """
+    Generate a synthetic plugin set, measure it, and optionally compare the
+    results with a baseline. Exits with status 1 if any measurement regressed.
+    """
+    params = dict(
+        plugins=plugins, depth=depth, fanout=fanout, style=style, handlers=handlers
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        generated = generate(directory, **params)
+        click.echo(describe(generated))
+        results = run_suite(generated, params, repeat=repeat, cold_repeat=cold_repeat)
+
+    click.echo()
+    for name, result in results["results"].items():
+        click.echo(
+            f"{name:<20} median {result['median_ms']:9.3f}ms  "
+            f"min {result['min_ms']:9.3f}ms"
+        )
+
+    if save:
+        with open(save, "w") as fp:
+            json.dump(results, fp, indent=2)
+
+    if baseline:
+        with open(baseline) as fp:
+            baseline_results = json.load(fp)
+        if baseline_results["params"] != params:
+            click.echo("warning: baseline was run with different parameters", err=True)
+        click.echo()
+        regressed = False
+        for name, base_ms, cur_ms, ratio, is_regression in compare(
+            results, baseline_results, threshold
+        ):
+            regressed = regressed or is_regression
+            marker = "  REGRESSION" if is_regression else ""
+            click.echo(
+                f"{name:<20} {base_ms:9.3f}ms -> {cur_ms:9.3f}ms "
+                f"({ratio:.2f}x){marker}"
+            )
+        if regressed:
+            sys.exit(1)
+
+
+main()
@@ -0,0 +1,167 @@
+"""
+Generate synthetic `together` plugin sets
+
+A generated plugin set is a package of plugin modules on disk, plus a module
+defining a TogetherCLI subclass which registers them. Writing real modules
+means that benchmarks include the cost of importing plugins, as they would in
+an installed CLI.
+"""
+
+import collections
+import os
+import textwrap
+
+from benchmarks.plugin_support import REGISTRATION_STYLES
+
+GeneratedCLI = collections.namedtuple(
+    "GeneratedCLI", ["directory", "package", "cli_module", "leaf_path", "node_count"]
+)
+
+ROOT_NAME = "bench"
+
+
+def plan_tree(depth, fanout):
+    """
+    Lay out a tree of groups and commands as (kind, name, path) tuples, in
+    breadth-first order
+
+    Every group has `fanout` children. Groups fill the levels above `depth`,
+    and the deepest level holds commands.
+    """
+    nodes = []
+    parents = [[ROOT_NAME]]
+    for level in range(1, depth + 1):
+        kind = "command" if level == depth else "group"
+        children = []
+        for parent in parents:
+            for _ in range(fanout):
+                name = f"{kind[0]}{len(nodes)}"
+                nodes.append((kind, name, parent))
+                children.append(parent + [name])
+        parents = children
+    return nodes
+
+
+def _chunk(nodes, count):
+    # split into `count` contiguous chunks, so that any parent is registered
+    # by the same plugin as its children or by an earlier one
+    size, extra = divmod(len(nodes), count)
+    chunks, start = [], 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(nodes[start:end])
+        start = end
+    return chunks
+
+
+_ROOT_MODULE = """\
+import click
+
+import together
+
+
+@together.hook
+def together_root_command(config):
+    @click.group({root!r})
+    @together.verbose_option
+    def root():
+        pass
+
+    return root
+"""
+
+_PLUGIN_MODULE = """\
+import together
+from benchmarks.plugin_support import make_exception_handlers, make_hook_output
+
+NODES = {nodes!r}
+
+
+@together.hook
+def together_configure(config):
+    config[{name!r}] = {{"enabled": True}}
+
+
+@together.hook
+def together_subcommand(config):
+    return make_hook_output(NODES, {style!r})
+
+
+@together.hook
+def together_exception_handler(config):
+    return make_exception_handlers({index!r}, {handlers!r})
+"""
+
+_CLI_MODULE = """\
+import importlib
+
+import together
+
+PLUGINS = {plugins!r}
+
+
+class BenchCLI(together.TogetherCLI):
+    def register_plugins(self):
+        for name in PLUGINS:
+            module = importlib.import_module({package!r} + "." + name)
+            self.plugin_manager.register(module, name=name)
+"""
+
+
+def generate(directory, plugins=10, depth=2, fanout=5, style="list", handlers=2):
+    """
+    Write a plugin set into `directory` and return a GeneratedCLI describing it
+
+    `directory` must be on `sys.path` to import the result. The package name
+    encodes the parameters, so several plugin sets can be generated into the
+    same directory and imported by the same process.
+    """
+    if style not in REGISTRATION_STYLES:
+        raise ValueError(f"style must be one of {REGISTRATION_STYLES}, got {style}")
+    if plugins < 1 or depth < 1 or fanout < 1:
+        raise ValueError("plugins, depth, and fanout must all be at least 1")
+
+    package = f"together_bench_p{plugins}_d{depth}_f{fanout}_{style}_h{handlers}"
+    pkgdir = os.path.join(directory, package)
+    os.makedirs(pkgdir, exist_ok=True)
+
+    def write(name, content):
+        with open(os.path.join(pkgdir, name + ".py"), "w") as fp:
+            fp.write(content)
+
+    nodes = plan_tree(depth, fanout)
+    names = ["root"]
+    write("__init__", "")
+    write("root", _ROOT_MODULE.format(root=ROOT_NAME))
+    for index, chunk in enumerate(_chunk(nodes, plugins)):
+        if not chunk:
+            continue
+        name = f"plugin_{index:04d}"
+        names.append(name)
+        write(
+            name,
+            _PLUGIN_MODULE.format(
+                nodes=[list(x) for x in chunk],
+                name=name,
+                style=style,
+                index=index,
+                handlers=handlers,
+            ),
+        )
+    write("cli", _CLI_MODULE.format(plugins=names, package=package))
+
+    _, leaf_name, leaf_parent = nodes[-1]
+    return GeneratedCLI(
+        directory=directory,
+        package=package,
+        cli_module=f"{package}.cli",
+        leaf_path=leaf_parent + [leaf_name],
+        node_count=len(nodes),
+    )
+
+
+def describe(generated):
+    return textwrap.dedent(f"""\
+        package:   {generated.package}
+        commands:  {generated.node_count}
+        leaf:      {" ".join(generated.leaf_path)}""")
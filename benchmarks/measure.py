@@ -0,0 +1,152 @@
+"""
+Measurements of a generated plugin set
+
+"cold" measurements run in a fresh interpreter for each repetition, so they
+include importing `together`, `click`, and all of the plugins. "warm"
+measurements run in this process after everything has been imported once.
+"""
+
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import together
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_COLD_SCRIPT = """\
+import json, time
+t0 = time.perf_counter()
+from {cli_module} import BenchCLI
+cli = BenchCLI()
+t1 = time.perf_counter()
+cli.build()
+t2 = time.perf_counter()
+print(json.dumps({{"construct": t1 - t0, "build": t2 - t1}}))
+"""
+
+
+def summarize(samples):
+    """Summarize a list of times (in seconds) in milliseconds"""
+    return {
+        "repeat": len(samples),
+        "min_ms": min(samples) * 1000,
+        "median_ms": statistics.median(samples) * 1000,
+        "mean_ms": statistics.mean(samples) * 1000,
+    }
+
+
+def _time(func, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        func(arg)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _run_cli(cli, args):
+    cli.reload_command_state_object()
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            cli(args=args, prog_name=cli.root_command.name)
+        except SystemExit:
+            pass
+
+
+def measure_cold(generated, repeat):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [generated.directory, REPO_ROOT] + env.get("PYTHONPATH", "").split(os.pathsep)
+    )
+    script = _COLD_SCRIPT.format(cli_module=generated.cli_module)
+    samples = {"construct": [], "build": []}
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            env=env,
+            check=True,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        ).stdout
+        for key, value in json.loads(output).items():
+            samples[key].append(value)
+    return {f"cold_{k}": summarize(v) for k, v in samples.items()}
+
+
+def measure_warm(generated, repeat):
+    if generated.directory not in sys.path:
+        sys.path.insert(0, generated.directory)
+    cli_class = importlib.import_module(generated.cli_module).BenchCLI
+
+    built = cli_class()
+    built.build()
+    leaf_args = generated.leaf_path[1:]
+    exceptions = [
+        predicate()
+        for predicate, _callback, _priority in built.exception_handlers.by_priority
+        if isinstance(predicate, type)
+    ] + [ValueError("unhandled"), KeyError("unhandled")]
+
+    def dispatch(_):
+        for err in exceptions:
+            built.exception_handlers.find_callback(err)
+
+    return {
+        "warm_construct": summarize(_time(lambda _: cli_class(), repeat)),
+        "warm_build": summarize(_time(lambda cli: cli.build(), repeat, cli_class)),
+        "leaf_invoke": summarize(_time(lambda _: _run_cli(built, leaf_args), repeat)),
+        "help": summarize(_time(lambda _: _run_cli(built, ["--help"]), repeat)),
+        "exception_dispatch": summarize(_time(dispatch, repeat)),
+    }
+
+
+def run_suite(generated, params, repeat=20, cold_repeat=5):
+    results = {}
+    results.update(measure_cold(generated, cold_repeat))
+    results.update(measure_warm(generated, repeat))
+    return {
+        "params": params,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "together": _together_version(),
+        },
+        "results": results,
+    }
+
+
+def _together_version():
+    try:
+        from together.discovery import _importlib_metadata
+
+        return _importlib_metadata().version("together")
+    except Exception:
+        return os.path.dirname(together.__file__)
+
+
+def compare(current, baseline, threshold=1.2):
+    """
+    Compare the median times of two result sets
+
+    Returns (name, baseline_ms, current_ms, ratio, regressed) rows for each
+    measurement present in both. A measurement regressed if its ratio exceeds
+    `threshold`.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        base_ms = baseline["results"][name]["median_ms"]
+        cur_ms = result["median_ms"]
+        ratio = cur_ms / base_ms if base_ms else float("inf")
+        rows.append((name, base_ms, cur_ms, ratio, ratio > threshold))
+    return rows
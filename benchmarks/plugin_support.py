@@ -0,0 +1,80 @@
+"""
+Runtime support for generated benchmark plugins
+
+Generated plugin modules describe the nodes of the command tree which they
+register, and use these helpers to build the click commands and the hook
+output in the requested registration style.
+"""
+
+import click
+
+from together import SubcommandRegistration, get_verbosity
+
+REGISTRATION_STYLES = ("command", "tuple", "registration", "list")
+
+
+def _make_command(kind, name):
+    if kind == "group":
+
+        @click.group(name, help=f"Benchmark group {name}.")
+        def group():
+            pass
+
+        return group
+
+    @click.command(name, help=f"Benchmark command {name}.")
+    @click.option("--count", type=int, default=1, help="How many times to run.")
+    @click.option("--format", type=click.Choice(["json", "text"]), default="text")
+    @click.argument("items", nargs=-1)
+    def command(count, format, items):
+        if get_verbosity() > 0:
+            click.echo(f"{name} {count} {format} {items}")
+
+    return command
+
+
+def make_hook_output(nodes, style):
+    """
+    Convert node descriptions, (kind, name, path) tuples, into output for the
+    `together_subcommand` hook
+
+    The "command" style returns bare commands where possible (for commands
+    attached to the root) and falls back to tuples. The "tuple" and
+    "registration" styles return a single item when there is only one node,
+    and a list otherwise. The "list" style always returns a list.
+    """
+    items = []
+    for kind, name, path in nodes:
+        cmd = _make_command(kind, name)
+        if style == "registration":
+            items.append(SubcommandRegistration(cmd, path))
+        elif style == "command" and len(path) == 1:
+            items.append(cmd)
+        else:
+            items.append((cmd, path))
+    if len(items) == 1 and style != "list":
+        return items[0]
+    return items
+
+
+class BenchError(Exception):
+    pass
+
+
+def make_exception_handlers(plugin_index, count):
+    """
+    Produce `count` exception handlers for a plugin, mixing class predicates
+    and callable predicates across a range of priorities
+    """
+    handlers = []
+    for i in range(count):
+        errtype = type(f"BenchError{plugin_index}_{i}", (BenchError,), {})
+        if i % 2:
+            predicate = errtype
+        else:
+
+            def predicate(err, _errtype=errtype):
+                return isinstance(err, _errtype)
+
+        handlers.append((predicate, lambda err: 2, i % 5))
+    return handlers
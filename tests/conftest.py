@@ -3,6 +3,9 @@ import shlex
 import pytest
 from click.testing import CliRunner
 
+# used to test together.pytest_plugin
+pytest_plugins = ["pytester"]
+
 
 # a class to contain a TogetherCLI and make it conform to the interface
 # expected by CliRunner.invoke
@@ -0,0 +1,120 @@
+import asyncio
+
+import click
+import pytest
+
+from together import LazySubcommandRegistration, TogetherCLI, hook
+from together.aio import run_coroutine, wrap_async_callbacks
+
+
+class Resource:
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+
+
+class AsyncPlugin:
+    @hook
+    def together_root_command(self, config):
+        @click.group("mycli")
+        @click.pass_context
+        async def root(ctx):
+            await asyncio.sleep(0)
+            ctx.obj = Resource()
+
+        return root
+
+    @hook
+    async def together_configure_async(self, config):
+        await asyncio.sleep(0)
+        config["async_configured"] = True
+
+    @hook
+    def together_subcommand(self, config):
+        @click.command("check")
+        @click.pass_obj
+        async def check(resource):
+            # the resource was created on the same loop as this callback
+            assert resource.loop is asyncio.get_running_loop()
+            click.echo("same loop")
+
+        @click.command("fail")
+        async def fail():
+            await asyncio.sleep(0)
+            raise KeyError("boom")
+
+        return [check, fail]
+
+    @hook
+    def together_exception_handler(self, config):
+        return [(KeyError, lambda err: click.echo(f"handled {err}") or 3)]
+
+
+class AsyncCLI(TogetherCLI):
+    def register_plugins(self):
+        self.plugin_manager.register(AsyncPlugin())
+
+
+def test_async_configure_runs_at_init():
+    assert AsyncCLI().config["async_configured"] is True
+
+
+def test_async_callbacks_share_one_loop(capsys):
+    cli = AsyncCLI()
+    with pytest.raises(SystemExit) as excinfo:
+        cli(["check"], prog_name="mycli")
+    assert excinfo.value.code == 0
+    assert "same loop" in capsys.readouterr().out
+    # the loop is closed at the end of the invocation
+    assert cli._event_loop is None
+
+
+def test_async_exceptions_use_handlers(capsys):
+    with pytest.raises(SystemExit) as excinfo:
+        AsyncCLI()(["fail"], prog_name="mycli")
+    assert excinfo.value.code == 3
+    assert "handled 'boom'" in capsys.readouterr().out
+
+
+def _lazy_async_command():
+    @click.command("later")
+    async def later():
+        await asyncio.sleep(0)
+        click.echo("later ran")
+
+    return later
+
+
+def test_lazy_async_commands_are_wrapped(capsys):
+    class LazyPlugin:
+        @hook
+        def together_subcommand(self, config):
+            return LazySubcommandRegistration("later", _lazy_async_command)
+
+    class LazyCLI(AsyncCLI):
+        def register_plugins(self):
+            super().register_plugins()
+            self.plugin_manager.register(LazyPlugin())
+
+    with pytest.raises(SystemExit) as excinfo:
+        LazyCLI()(["later"], prog_name="mycli")
+    assert excinfo.value.code == 0
+    assert "later ran" in capsys.readouterr().out
+
+
+def test_run_coroutine_without_invocation():
+    async def answer():
+        return 42
+
+    assert run_coroutine(answer()) == 42
+
+
+def test_wrapping_is_idempotent():
+    @click.command("cmd")
+    async def cmd():
+        return 1
+
+    wrap_async_callbacks(cmd)
+    wrapped = cmd.callback
+    wrap_async_callbacks(cmd)
+    assert cmd.callback is wrapped
+    assert cmd.callback() == 1
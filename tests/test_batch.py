@@ -0,0 +1,191 @@
+import json
+import os
+
+import click
+import pytest
+
+from together import (
+    Resource,
+    TogetherCLI,
+    get_resource,
+    get_verbosity,
+    hook,
+    verbose_option,
+)
+from together.batch import (
+    BatchParseError,
+    main,
+    parse_batch_input,
+    parse_batch_line,
+)
+
+
+class BasePlugin:
+    @hook
+    def together_root_command(self, config):
+        @click.group("mycli")
+        @verbose_option
+        def mycli():
+            pass
+
+        return mycli
+
+
+class SubcmdPlugin:
+    @hook
+    def together_subcommand(self, config):
+        @click.command("echo")
+        @click.argument("words", nargs=-1)
+        def echo(words):
+            click.echo(f"{' '.join(words)} v={get_verbosity()}")
+
+        @click.command("fail")
+        def fail():
+            click.echo("failing", err=True)
+            raise ValueError("bad")
+
+        return [echo, fail]
+
+    @hook
+    def together_exception_handler(self, config):
+        return (ValueError, lambda err: 3)
+
+
+class MyCLI(TogetherCLI):
+    def register_plugins(self):
+        self.plugin_manager.register(BasePlugin())
+        self.plugin_manager.register(SubcmdPlugin())
+
+
+@pytest.mark.parametrize(
+    "line, expect",
+    (
+        ("echo 'a b' c", ["echo", "a b", "c"]),
+        ('["echo", "a b"]', ["echo", "a b"]),
+        ('{"args": ["-v", "echo"]}', ["-v", "echo"]),
+        ("   ", None),
+        ("# a comment", None),
+    ),
+)
+def test_parse_batch_line(line, expect):
+    assert parse_batch_line(line) == expect
+
+
+@pytest.mark.parametrize(
+    "line, match",
+    (
+        ('{"args": "echo"}', "list of strings"),
+        ("echo 'unbalanced", "could not split"),
+        ('{"args": ["echo"]', "invalid JSON"),
+        ('{"argv": ["echo"]}', "no 'args'"),
+    ),
+)
+def test_parse_batch_line_rejects_bad_lines(line, match):
+    with pytest.raises(BatchParseError, match=match):
+        parse_batch_line(line)
+
+
+def test_parse_batch_input_continues_after_errors():
+    parsed = list(parse_batch_input(["echo a", "echo 'b", "", '["echo", "c"]']))
+    assert parsed[0] == ["echo", "a"]
+    assert isinstance(parsed[1], BatchParseError)
+    assert str(parsed[1]).startswith("line 2: could not split")
+    assert parsed[2] == ["echo", "c"]
+
+
+@pytest.mark.parametrize("workers", (0, 2))
+def test_run_batch(workers):
+    argvs = [["-v", "echo", "one"], ["echo", "two"], ["fail"], ["nosuchcmd"]]
+    results = list(MyCLI().run_batch(argvs, workers=workers))
+
+    assert [x.index for x in results] == [0, 1, 2, 3]
+    assert [x.exit_code for x in results] == [0, 0, 3, 2]
+    # state is not carried between invocations
+    assert results[0].stdout == "one v=1\n"
+    assert results[1].stdout == "two v=0\n"
+    assert results[2].stderr == "failing\n"
+    assert "No such command" in results[3].stderr
+
+
+@pytest.mark.parametrize("workers", (0, 2))
+def test_batch_main_reports_bad_lines(tmp_path, workers):
+    infile = tmp_path / "commands.txt"
+    infile.write_text(
+        "echo 'unbalanced\n" '{"args": ["echo"\n' '{"argv": ["echo"]}\n' "echo after\n"
+    )
+    result = click.testing.CliRunner(mix_stderr=False).invoke(
+        main, ["test_batch:MyCLI", str(infile), "--workers", str(workers)]
+    )
+    assert result.exit_code == 1
+    records = [json.loads(x) for x in result.stdout.splitlines()]
+    assert [(x["index"], x["exit_code"]) for x in records] == [
+        (0, 2),
+        (1, 2),
+        (2, 2),
+        (3, 0),
+    ]
+    assert [x["args"] for x in records] == [None, None, None, ["echo", "after"]]
+    assert records[0]["stderr"].startswith("line 1: could not split")
+    assert records[1]["stderr"].startswith("line 2: invalid JSON")
+    assert records[2]["stderr"].startswith("line 3: batch record has no 'args'")
+    assert records[3]["stdout"] == "after v=0\n"
+
+
+def test_batch_main(tmp_path):
+    infile = tmp_path / "commands.txt"
+    infile.write_text('echo hello\n\n["fail"]\n')
+    result = click.testing.CliRunner().invoke(main, ["test_batch:MyCLI", str(infile)])
+    assert result.exit_code == 1
+    records = [json.loads(x) for x in result.output.splitlines()]
+    assert [(x["args"], x["exit_code"]) for x in records] == [
+        (["echo", "hello"], 0),
+        (["fail"], 3),
+    ]
+
+
+class Connection:
+    def __init__(self, name):
+        self.name = name
+
+    def close(self):
+        # workers are separate processes, so closes are recorded in a file
+        with open(os.environ["BATCH_TEST_CLOSE_LOG"], "a") as fp:
+            fp.write(f"{self.name} {os.getpid()}\n")
+
+
+class ResourcePlugin:
+    @hook
+    def together_subcommand(self, config):
+        @click.command("connect")
+        def connect():
+            get_resource("db")
+            get_resource("pool")
+
+        return connect
+
+    @hook
+    def together_resource(self, config):
+        return [
+            Resource("db", lambda: Connection("db")),
+            Resource("pool", lambda: Connection("pool"), persistent=True),
+        ]
+
+
+class ResourceCLI(MyCLI):
+    def register_plugins(self):
+        super().register_plugins()
+        self.plugin_manager.register(ResourcePlugin())
+
+
+@pytest.mark.parametrize("workers", (0, 2))
+def test_batch_closes_resources(tmp_path, monkeypatch, workers):
+    log = tmp_path / "closed.log"
+    monkeypatch.setenv("BATCH_TEST_CLOSE_LOG", str(log))
+    results = list(ResourceCLI().run_batch([["connect"]] * 4, workers=workers))
+    assert [x.exit_code for x in results] == [0] * 4
+
+    closed = [x.split() for x in log.read_text().splitlines()]
+    assert [name for name, _ in closed].count("db") == 4
+    # each process which built the persistent resource closed it once
+    pool_pids = [pid for name, pid in closed if name == "pool"]
+    assert pool_pids and len(pool_pids) == len(set(pool_pids))
@@ -0,0 +1,104 @@
+import subprocess
+import sys
+import textwrap
+import zipfile
+
+import pytest
+
+from together import discovery
+from together.bundle import BundleError, build_bundle
+
+
+@pytest.fixture
+def bundle_env(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "bundle_plugin.py").write_text(textwrap.dedent("""
+            import click
+            import together
+
+            @together.hook
+            def together_subcommand(config):
+                @click.command("where")
+                def where():
+                    click.echo(click.__file__)
+
+                return where
+            """))
+    (src / "bundle_cli.py").write_text(textwrap.dedent("""
+            import click
+            import together
+
+            class Root:
+                @together.hook
+                def together_root_command(self, config):
+                    return click.group("bundled")(lambda: None)
+
+            class BundleCLI(together.TogetherCLI):
+                entrypoint_group = "bundletest"
+
+                def register_plugins(self):
+                    self.plugin_manager.register(Root())
+                    super().register_plugins()
+            """))
+    distinfo = src / "bundle_plugin-1.0.dist-info"
+    distinfo.mkdir()
+    (distinfo / "METADATA").write_text("Name: bundle-plugin\nVersion: 1.0\n")
+    (distinfo / "entry_points.txt").write_text("[bundletest]\nwhere = bundle_plugin\n")
+    monkeypatch.syspath_prepend(str(src))
+    return tmp_path
+
+
+def test_bundle_runs_from_archive_with_frozen_registry(bundle_env):
+    output = bundle_env / "app.pyz"
+    modules = build_bundle("bundle_cli:BundleCLI", str(output), prog_name="bundled")
+    assert modules == ["bundle_cli", "bundle_plugin", "click", "pluggy", "together"]
+
+    # run isolated from the source tree, so that the plugin can only be found
+    # through the frozen registry, and its imports only from the archive
+    result = subprocess.run(
+        [sys.executable, "-I", str(output), "where"],
+        cwd=str(bundle_env),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.startswith(str(output))
+
+    help_result = subprocess.run(
+        [sys.executable, "-I", str(output), "--help"],
+        cwd=str(bundle_env),
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    assert "Usage: bundled" in help_result.stdout
+
+
+def test_main_module_source(bundle_env):
+    output = bundle_env / "app.pyz"
+    build_bundle("bundle_cli:BundleCLI", str(output), prog_name="bundled")
+    with zipfile.ZipFile(str(output)) as archive:
+        main = archive.read("__main__.py").decode()
+    assert main.splitlines()[0] == "import importlib.util"
+
+
+def test_missing_modules_are_errors(bundle_env):
+    with pytest.raises(BundleError, match="cannot find module 'no_such_module'"):
+        build_bundle(
+            "bundle_cli:BundleCLI",
+            str(bundle_env / "app.pyz"),
+            include=["no_such_module"],
+        )
+
+
+def test_frozen_entrypoints_skip_scan(monkeypatch):
+    def fail(group):
+        raise AssertionError("entrypoints were scanned")
+
+    monkeypatch.setattr(discovery, "scan_entrypoints", fail)
+    monkeypatch.setattr(discovery, "_frozen_entrypoints", {})
+    discovery.freeze_entrypoints("frozen", [("dist", "name", "mod:attr")])
+    assert discovery.get_entrypoints("frozen") == [
+        discovery.EntryPointRecord("dist", "name", "mod:attr")
+    ]
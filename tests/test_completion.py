@@ -0,0 +1,90 @@
+import click
+import pytest
+
+from together import TogetherCLI, hook
+
+HOOK_CALLS = []
+
+
+def complete_names(ctx, args, incomplete):
+    return ["alice", "bob"]
+
+
+class BasePlugin:
+    @hook
+    def together_root_command(self, config):
+        HOOK_CALLS.append("root")
+
+        @click.group("mycli")
+        def mycli():
+            pass
+
+        return mycli
+
+
+class SubcmdPlugin:
+    @hook
+    def together_subcommand(self, config):
+        @click.command("foo", short_help="Foo.")
+        @click.option("--format", type=click.Choice(["json", "text"]))
+        @click.option("--name", autocompletion=complete_names)
+        def foo(format, name):
+            pass
+
+        @click.command("fizz", short_help="Fizz.")
+        def fizz():
+            pass
+
+        @click.command("secret", hidden=True)
+        def secret():
+            pass
+
+        return [foo, fizz, secret]
+
+
+@pytest.fixture
+def cli_class(tmp_path, monkeypatch):
+    class MyCLI(TogetherCLI):
+        snapshot_path = str(tmp_path / "snapshot.json")
+
+        def register_plugins(self):
+            self.plugin_manager.register(BasePlugin())
+            self.plugin_manager.register(SubcmdPlugin())
+
+    MyCLI().write_snapshot()
+    HOOK_CALLS.clear()
+    monkeypatch.setenv("_MYCLI_COMPLETE", "complete_bash")
+    return MyCLI
+
+
+def _complete(monkeypatch, cli_class, line):
+    words = line.split(" ")
+    monkeypatch.setenv("COMP_WORDS", line)
+    monkeypatch.setenv("COMP_CWORD", str(len(words) - 1))
+    return cli_class.serve_completion_from_snapshot(prog_name="mycli")
+
+
+@pytest.mark.parametrize(
+    "line, expect",
+    (
+        ("mycli f", ["fizz", "foo"]),
+        ("mycli ", ["fizz", "foo"]),
+        ("mycli foo --f", ["--format"]),
+        ("mycli foo --format ", ["json", "text"]),
+    ),
+)
+def test_complete_from_snapshot(monkeypatch, capsys, cli_class, line, expect):
+    with pytest.raises(SystemExit):
+        _complete(monkeypatch, cli_class, line)
+    assert capsys.readouterr().out.split() == expect
+    assert HOOK_CALLS == []
+
+
+def test_dynamic_completion_falls_back(monkeypatch, capsys, cli_class):
+    assert _complete(monkeypatch, cli_class, "mycli foo --name ") is False
+    assert capsys.readouterr().out == ""
+
+
+def test_not_served_without_request(monkeypatch, cli_class):
+    monkeypatch.delenv("_MYCLI_COMPLETE")
+    assert _complete(monkeypatch, cli_class, "mycli f") is False
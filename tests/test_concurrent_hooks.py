@@ -0,0 +1,112 @@
+import threading
+
+import click
+import pytest
+
+from together import TogetherCLI, hook
+from together.concurrent_hooks import ConfigConflictError
+
+
+def _make_plugin(index, barrier=None, config_key=None):
+    class Plugin:
+        @hook
+        def together_configure(self, config):
+            if barrier:
+                # all configure hooks must be running at once to pass
+                barrier.wait(timeout=5)
+            if config_key:
+                config[config_key] = index
+
+        @hook
+        def together_subcommand(self, config):
+            return click.command(f"cmd{index}")(lambda: None)
+
+    return Plugin()
+
+
+class BasePlugin:
+    @hook
+    def together_root_command(self, config):
+        return click.group("mycli")(lambda: None)
+
+    @hook
+    def together_configure(self, config):
+        config["base"] = True
+
+
+def _make_cli(plugins, threads=4):
+    class MyCLI(TogetherCLI):
+        concurrent_plugin_threads = threads
+
+        def register_plugins(self):
+            self.plugin_manager.register(BasePlugin(), name="base")
+            for index, plugin in enumerate(plugins):
+                self.plugin_manager.register(plugin, name=f"plugin{index}")
+
+    return MyCLI
+
+
+def test_configure_runs_concurrently_and_merges():
+    barrier = threading.Barrier(3)
+    cli_class = _make_cli(
+        [_make_plugin(i, barrier=barrier, config_key=f"key{i}") for i in range(3)]
+    )
+    cli = cli_class()
+    assert cli.config == {"base": True, "key0": 0, "key1": 1, "key2": 2}
+
+
+def test_registration_order_matches_sequential():
+    plugins = [_make_plugin(i) for i in range(8)]
+    concurrent = _make_cli(plugins, threads=4)().build()
+    sequential = _make_cli(plugins, threads=0)().build()
+    assert list(concurrent.commands) == list(sequential.commands)
+    assert list(concurrent.commands) == [f"cmd{i}" for i in range(8)]
+
+
+def test_conflicting_config_writes_are_errors():
+    cli_class = _make_cli(
+        [_make_plugin(0, config_key="shared"), _make_plugin(1, config_key="shared")]
+    )
+    with pytest.raises(ConfigConflictError) as excinfo:
+        cli_class().configure()
+    assert "'shared' was written by both 'plugin1' and 'plugin0'" in str(excinfo.value)
+
+
+def _monitor_hook_calls(cli):
+    calls = []
+    cli.plugin_manager.add_hookcall_monitoring(
+        lambda name, impls, kwargs: calls.append(name),
+        lambda outcome, name, impls, kwargs: None,
+    )
+    return calls
+
+
+def _forbid_subset_hook_caller(cli, monkeypatch):
+    # subset hook callers scan every plugin, so using one per plugin makes the
+    # build quadratic in the number of plugins
+    def subset_hook_caller(*args, **kwargs):
+        raise AssertionError("subset_hook_caller was used")
+
+    monkeypatch.setattr(cli.plugin_manager, "subset_hook_caller", subset_hook_caller)
+
+
+def test_sequential_build_goes_through_pluggy(monkeypatch):
+    cli = _make_cli([_make_plugin(i) for i in range(50)], threads=0)()
+    _forbid_subset_hook_caller(cli, monkeypatch)
+    calls = _monitor_hook_calls(cli)
+    cli.build()
+    # one call, however many plugins there are
+    assert calls.count("together_subcommand") == 1
+    owners = {path[-1]: owner for path, owner in cli.command_owners.items()}
+    assert owners == {f"cmd{i}": f"plugin{i}" for i in range(50)}
+
+
+def test_plugin_hook_call_goes_through_pluggy(monkeypatch):
+    cli = _make_cli([_make_plugin(i) for i in range(3)], threads=0)()
+    _forbid_subset_hook_caller(cli, monkeypatch)
+    calls = _monitor_hook_calls(cli)
+    results = cli._call_plugin_hook("together_subcommand", "plugin1", config={})
+    assert calls == ["together_subcommand"]
+    assert [x.name for x in results] == ["cmd1"]
+    # the implementations are restored afterwards
+    assert len(cli.plugin_manager.hook.together_subcommand(config={})) == 3
@@ -0,0 +1,127 @@
+import json
+
+import click
+import pytest
+
+import together.config
+from together import TogetherCLI, hook
+from together.config import (
+    ConfigFileCache,
+    ConfigFileError,
+    ConfigLoader,
+    default_config_paths,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_parsed_files():
+    together.config._parsed_files.clear()
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.fixture
+def layered_files(tmp_path):
+    return [
+        _write(tmp_path / "system.ini", "[mycli]\ncolor = red\nwidth = 80\n"),
+        _write(tmp_path / "user.toml", '[mycli]\ncolor = "blue"\n[other]\nx = 1\n'),
+        _write(tmp_path / "project.json", json.dumps({"mycli": {"width": 100}})),
+    ]
+
+
+def test_layers_merge_in_order(layered_files):
+    loaded = ConfigLoader(layered_files).load(["mycli"])
+    assert loaded == {"mycli": {"color": "blue", "width": 100}}
+
+
+def test_unchanged_files_are_not_reparsed(layered_files, tmp_path, monkeypatch):
+    cache = ConfigFileCache(tmp_path / "cache" / "config.json")
+    expect = ConfigLoader(layered_files, cache=cache).load(["mycli", "other"])
+
+    # a new process, with nothing parsed in memory, is served from the cache
+    together.config._parsed_files.clear()
+
+    def fail(path):
+        raise AssertionError(f"parsed {path}")
+
+    monkeypatch.setattr(together.config, "parse_config_file", fail)
+    assert ConfigLoader(layered_files, cache=cache).load(["mycli", "other"]) == expect
+
+    # once a file changes, only that file is parsed again
+    parsed = []
+    monkeypatch.setattr(
+        together.config,
+        "parse_config_file",
+        lambda path: parsed.append(path) or {"mycli": {"width": 120}},
+    )
+    with open(layered_files[2], "a") as fp:
+        fp.write("\n")
+    loaded = ConfigLoader(layered_files, cache=cache).load(["mycli"])
+    assert parsed == [layered_files[2]]
+    assert loaded["mycli"]["width"] == 120
+
+
+def test_bad_files_raise(tmp_path):
+    with pytest.raises(ConfigFileError, match="unsupported"):
+        ConfigLoader([_write(tmp_path / "c.yaml", "a: 1")]).load(["a"])
+    with pytest.raises(ConfigFileError, match="only sections"):
+        ConfigLoader([_write(tmp_path / "c.json", '{"a": 1}')]).load(["a"])
+
+
+def test_default_paths(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "xdg"))
+    user = _write(tmp_path / "xdg" / "mycli" / "config.toml", "")
+    project = _write(tmp_path / "proj" / ".mycli.ini", "")
+    subdir = tmp_path / "proj" / "a" / "b"
+    subdir.mkdir(parents=True)
+    assert default_config_paths("mycli", cwd=str(subdir)) == [user, project]
+
+
+def test_cli_loads_requested_sections(layered_files):
+    seen = {}
+
+    class Plugin:
+        @hook
+        def together_root_command(self, config):
+            return click.group("mycli")(lambda: None)
+
+        @hook
+        def together_config_sections(self):
+            return "mycli"
+
+        @hook
+        def together_configure(self, config):
+            seen.update(config)
+
+    class MyCLI(TogetherCLI):
+        config_app_name = "mycli"
+
+        def register_plugins(self):
+            self.plugin_manager.register(Plugin())
+
+        def get_config_paths(self):
+            return layered_files
+
+    cli = MyCLI()
+    assert "other" not in cli.config
+    assert seen == {"mycli": {"color": "blue", "width": 100}}
+
+
+def test_unwritable_cache_is_ignored(layered_files, tmp_path):
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    # the cache's directory can't be created, as a file is in the way
+    cache = ConfigFileCache(blocker / "config.json")
+    loaded = ConfigLoader(layered_files, cache=cache).load(["mycli"])
+    assert loaded == {"mycli": {"color": "blue", "width": 100}}
+
+
+def test_loaded_values_are_copies(tmp_path):
+    path = _write(tmp_path / "c.toml", '[mycli]\nnames = ["a"]\n')
+    first = ConfigLoader([path]).load(["mycli"])
+    first["mycli"]["names"].append("b")
+    assert ConfigLoader([path]).load(["mycli"]) == {"mycli": {"names": ["a"]}}
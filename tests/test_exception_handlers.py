@@ -1,6 +1,7 @@
 import click
 
 from together import TogetherCLI, hook
+from together.exception_handlers import ExceptionHandlerCollection
 
 
 def valueerror_handler(exception):
@@ -68,3 +69,48 @@ def test_invoke_handler(run_cmd):
     main = MyCLI()
     result = run_cmd(main, "mycli bar", assert_exit_code=3)
     assert result.stderr == "Bad value: in bar\n"
+
+
+def _naive_find_callback(collection, exception):
+    # the original linear scan, used as a reference for dispatch results
+    for predicate, callback, _priority in collection.by_priority:
+        if isinstance(predicate, type):
+            if isinstance(exception, predicate):
+                return callback
+        elif predicate(exception):
+            return callback
+    return None
+
+
+def test_dispatch_matches_linear_scan():
+    handlers = [
+        (LookupError, lambda e: 1),
+        (KeyError, lambda e: 2, 5),
+        (lambda e: "special" in str(e), lambda e: 3, 10),
+        (lambda e: isinstance(e, IndexError), lambda e: 4, 5),
+        (ValueError, lambda e: 5, -1),
+        [(Exception, lambda e: 6, -10), (OSError, lambda e: 7, 10)],
+    ]
+    collection = ExceptionHandlerCollection(handlers)
+
+    exceptions = [
+        KeyError("x"),
+        KeyError("special"),
+        IndexError("x"),
+        IndexError("special"),
+        ValueError("x"),
+        UnicodeDecodeError("utf-8", b"", 0, 1, "special"),
+        FileNotFoundError("x"),
+        RuntimeError("x"),
+    ]
+    # run twice so that the second pass uses cached dispatch results
+    for _ in range(2):
+        for exception in exceptions:
+            expect = _naive_find_callback(collection, exception)
+            assert collection.find_callback(exception) is expect
+
+
+def test_dispatch_no_match():
+    collection = ExceptionHandlerCollection([(KeyError, lambda e: 1)])
+    assert collection.find_callback(ValueError()) is None
+    assert collection.find_callback(ValueError()) is None
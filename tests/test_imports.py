@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from together.importaudit import ImportBudgetExceeded, audit_imports
+
+CLI_MODULE = """
+import click
+import together
+
+
+class BasePlugin:
+    @together.hook
+    def together_root_command(self, config):
+        import audit_dep_root  # noqa: F401
+
+        @click.group("mycli")
+        @click.option("--name")
+        def mycli(name):
+            pass
+
+        return mycli
+
+
+class FooPlugin:
+    @together.hook
+    def together_subcommand(self, config):
+        @click.command("foo")
+        def foo():
+            import audit_dep_foo  # noqa: F401
+
+        return foo
+
+
+class MyCLI(together.TogetherCLI):
+    def register_plugins(self):
+        self.plugin_manager.register(BasePlugin(), name="base")
+        self.plugin_manager.register(FooPlugin(), name="foo")
+"""
+
+
+def test_import_together_does_not_import_click():
+    output = subprocess.check_output(
+        [
+            sys.executable,
+            "-c",
+            "import sys, together; together.hook; print('click' in sys.modules)",
+        ],
+        universal_newlines=True,
+    )
+    assert output.strip() == "False"
+
+
+def test_lazy_exports():
+    import together
+
+    assert "TogetherCLI" in dir(together)
+    with pytest.raises(AttributeError):
+        together.NoSuchName
+
+
+@pytest.fixture
+def audit_env(tmp_path):
+    (tmp_path / "audit_cli.py").write_text(textwrap.dedent(CLI_MODULE))
+    (tmp_path / "audit_dep_root.py").write_text("")
+    (tmp_path / "audit_dep_foo.py").write_text("")
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(tmp_path), os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+    )
+    return env
+
+
+def test_audit_attributes_imports(audit_env):
+    audit = audit_imports("audit_cli:MyCLI", ["foo"], env=audit_env)
+    assert "audit_dep_root" in audit.modules("plugin:base")
+    assert "audit_dep_foo" in audit.modules("command:mycli foo")
+    assert "click" in audit.modules("target")
+
+    audit.check_budget("plugin:foo", max_modules=0)
+    with pytest.raises(ImportBudgetExceeded, match="audit_dep_foo"):
+        audit.check_budget("command:mycli foo", forbidden=["audit_dep_foo"])
+    with pytest.raises(ImportBudgetExceeded, match="budget 0"):
+        audit.check_budget("plugin:base", max_modules=0)
+
+
+def test_audit_labels_commands_by_their_path(audit_env):
+    # option values are not part of the command path
+    audit = audit_imports("audit_cli:MyCLI", ["--name", "x", "foo"], env=audit_env)
+    assert "audit_dep_foo" in audit.modules("command:mycli foo")
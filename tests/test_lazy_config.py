@@ -0,0 +1,151 @@
+import copy
+import pickle
+import threading
+
+import click
+import pytest
+
+from together import CommandState, LazyConfig, TogetherCLI, get_state, hook
+
+
+def test_providers_run_once_on_first_read():
+    calls = []
+    config = LazyConfig({"eager": 1})
+    config.register_lazy("slow", lambda: calls.append(1) or "value")
+
+    assert "slow" in config
+    assert sorted(config) == ["eager", "slow"]
+    assert len(config) == 2
+    assert not config.is_resolved("slow")
+    assert calls == []
+
+    assert config["slow"] == "value"
+    assert config["slow"] == "value"
+    assert calls == [1]
+    assert config.is_resolved("slow")
+
+
+def test_setting_and_deleting_replace_providers():
+    config = LazyConfig()
+    config.register_lazy("a", lambda: pytest.fail("provider called"))
+    config["a"] = 2
+    assert config["a"] == 2
+
+    config.register_lazy("b", lambda: pytest.fail("provider called"))
+    del config["b"]
+    assert "b" not in config
+    with pytest.raises(KeyError):
+        config["b"]
+
+
+def test_failed_providers_are_retried():
+    attempts = []
+
+    def provider():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("not yet")
+        return "ok"
+
+    config = LazyConfig()
+    config.register_lazy("key", provider)
+    with pytest.raises(OSError):
+        config["key"]
+    assert config["key"] == "ok"
+
+
+def test_concurrent_reads_call_provider_once():
+    calls = []
+    barrier = threading.Barrier(4)
+    config = LazyConfig()
+    config.register_lazy("key", lambda: calls.append(1) or object())
+
+    results = []
+
+    def read():
+        barrier.wait(timeout=5)
+        results.append(config["key"])
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert len({id(x) for x in results}) == 1
+
+
+def test_timing_report():
+    config = LazyConfig()
+    config.register_lazy("used", lambda: 1)
+    config.register_lazy("unused", lambda: 2)
+    config["used"]
+    report = config.timing_report()
+    assert [x["key"] for x in report] == ["used", "unused"]
+    assert report[0]["resolved"] and report[0]["seconds"] >= 0
+    assert report[1] == {"key": "unused", "seconds": None, "resolved": False}
+
+
+@pytest.mark.parametrize("threads", [0, 4])
+def test_only_the_invoked_command_pays(threads, capsys):
+    computed = []
+
+    def provider(name):
+        return lambda: computed.append(name) or f"{name}-value"
+
+    class Plugin:
+        @hook
+        def together_root_command(self, config):
+            return click.group("mycli")(lambda: None)
+
+        @hook
+        def together_configure(self, config):
+            config.register_lazy("creds", provider("creds"))
+            config.register_lazy("tools", provider("tools"))
+
+        @hook
+        def together_subcommand(self, config):
+            @click.command("login")
+            def login():
+                state = get_state()
+                assert isinstance(state, CommandState)
+                click.echo(state.config["creds"])
+
+            return login
+
+    class MyCLI(TogetherCLI):
+        concurrent_plugin_threads = threads
+        lazy_config = True
+
+        def register_plugins(self):
+            self.plugin_manager.register(Plugin())
+
+    cli = MyCLI()
+    with pytest.raises(SystemExit):
+        cli(["login"], prog_name="mycli")
+    assert "creds-value" in capsys.readouterr().out
+    assert computed == ["creds"]
+    assert [x["key"] for x in cli.config.timing_report() if x["resolved"]] == ["creds"]
+
+
+def test_default_config_is_a_dict():
+    assert type(TogetherCLI().config) is dict
+
+    class LazyCLI(TogetherCLI):
+        lazy_config = True
+
+    assert isinstance(LazyCLI().config, LazyConfig)
+
+
+def test_copy_and_pickle():
+    config = LazyConfig({"eager": [1]})
+    config.register_lazy("lazy", lambda: 2)
+    copied = copy.deepcopy(config)
+    copied["eager"].append(3)
+    assert config["eager"] == [1]
+    assert copied["lazy"] == 2
+    assert not config.is_resolved("lazy")
+
+    restored = pickle.loads(pickle.dumps(LazyConfig({"eager": 1})))
+    assert dict(restored) == {"eager": 1}
+    restored["other"] = 2
@@ -0,0 +1,107 @@
+import click
+import pytest
+
+from together import LazySubcommandRegistration, TogetherCLI, hook
+
+LOAD_COUNTS = {}
+
+
+@click.command("baz")
+def baz():
+    click.echo("in baz")
+
+
+def load_foo():
+    LOAD_COUNTS["foo"] = LOAD_COUNTS.get("foo", 0) + 1
+
+    @click.command("foo", help="Run the foo command.")
+    def foo():
+        click.echo("in foo")
+
+    return foo
+
+
+def load_bar():
+    LOAD_COUNTS["bar"] = LOAD_COUNTS.get("bar", 0) + 1
+
+    @click.group("bar")
+    def bar():
+        click.echo("in bar")
+
+    return bar
+
+
+class BasePlugin:
+    @hook
+    def together_root_command(self, config):
+        @click.group("mycli")
+        def mycli():
+            pass
+
+        return mycli
+
+
+class LazyPlugin:
+    @hook
+    def together_subcommand(self, config):
+        return [
+            LazySubcommandRegistration("foo", load_foo, short_help="Run foo."),
+            LazySubcommandRegistration("bar", load_bar),
+            LazySubcommandRegistration(
+                "baz", "test_lazy_subcommands:baz", ["mycli", "bar"]
+            ),
+        ]
+
+
+class MyCLI(TogetherCLI):
+    def register_plugins(self):
+        self.plugin_manager.register(BasePlugin())
+        self.plugin_manager.register(LazyPlugin())
+
+
+@pytest.fixture(autouse=True)
+def _reset_counts():
+    LOAD_COUNTS.clear()
+
+
+def test_foo_is_not_loaded_by_build():
+    cli = MyCLI()
+    cli.build()
+    assert "foo" not in LOAD_COUNTS
+    # 'bar' had to load in order to attach 'baz' to it
+    assert LOAD_COUNTS["bar"] == 1
+
+
+def test_invoke_lazy_command(run_cmd):
+    result = run_cmd(MyCLI(), "mycli foo")
+    assert result.output == "in foo\n"
+    assert LOAD_COUNTS["foo"] == 1
+
+
+def test_invoke_lazy_command_under_lazy_group(run_cmd):
+    result = run_cmd(MyCLI(), "mycli bar baz")
+    assert result.output == "in bar\nin baz\n"
+
+
+def test_root_help_does_not_load_declared_short_help(run_cmd):
+    result = run_cmd(MyCLI(), "mycli --help")
+    assert "Run foo." in result.output
+    assert "foo" not in LOAD_COUNTS
+
+
+def test_loader_name_mismatch_is_error():
+    class BadPlugin:
+        @hook
+        def together_subcommand(self, config):
+            return LazySubcommandRegistration("notfoo", load_foo)
+
+    class BadCLI(MyCLI):
+        def register_plugins(self):
+            super().register_plugins()
+            self.plugin_manager.register(BadPlugin())
+
+    cli = BadCLI()
+    cli.build()
+    with pytest.raises(ValueError) as excinfo:
+        cli.root_command.get_command(None, "notfoo").load()
+    assert "produced a command named 'foo'" in str(excinfo.value)
@@ -0,0 +1,94 @@
+import logging
+
+import click
+import pytest
+
+from together import TogetherCLI, configure_logging, hook, lazy_format, verbose_option
+
+log = logging.getLogger("mycli_test")
+
+
+@pytest.fixture(autouse=True)
+def reset_logger():
+    yield
+    log.handlers.clear()
+    log.setLevel(logging.NOTSET)
+
+
+class BasePlugin:
+    @hook
+    def together_root_command(self, config):
+        @click.group("mycli")
+        @verbose_option
+        def mycli():
+            pass
+
+        return mycli
+
+    @hook
+    def together_subcommand(self, config):
+        @click.command("foo")
+        @verbose_option
+        def foo():
+            log.warning("warned")
+            log.info("informed")
+            log.debug("debugged")
+
+        return foo
+
+
+class MyCLI(TogetherCLI):
+    logger_name = "mycli_test"
+
+    def register_plugins(self):
+        self.plugin_manager.register(BasePlugin())
+
+
+@pytest.mark.parametrize(
+    "line, expect",
+    [
+        ("mycli foo", ["WARNING: warned"]),
+        ("mycli -v foo", ["WARNING: warned", "INFO: informed"]),
+        ("mycli -v foo -v", ["WARNING: warned", "INFO: informed", "DEBUG: debugged"]),
+        ("mycli foo -vvvv", ["WARNING: warned", "INFO: informed", "DEBUG: debugged"]),
+    ],
+)
+def test_verbosity_sets_log_level(run_cmd, line, expect):
+    result = run_cmd(MyCLI(), line)
+    assert result.stderr.splitlines() == expect
+
+
+def test_logging_is_not_configured_by_default(run_cmd):
+    class PlainCLI(MyCLI):
+        logger_name = None
+
+    run_cmd(PlainCLI(), "mycli -vv foo")
+    assert log.level == logging.NOTSET
+    assert log.handlers == []
+
+
+def test_configure_logging_adds_one_handler():
+    configure_logging(0, "mycli_test")
+    configure_logging(2, "mycli_test")
+    assert log.level == logging.DEBUG
+    assert len(log.handlers) == 1
+
+
+def test_lazy_format_only_runs_when_emitted():
+    calls = []
+
+    def expensive(x, suffix=""):
+        calls.append(x)
+        return f"{x}{suffix}"
+
+    configure_logging(0, "mycli_test")
+    log.debug("value: %s", lazy_format(expensive, 1))
+    assert calls == []
+
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    log.addHandler(handler)
+    log.warning("value: %s", lazy_format(expensive, 2, suffix="!"))
+    assert calls == [2]
+    assert records[0].getMessage() == "value: 2!"
@@ -2,6 +2,7 @@ import click
 import pytest
 
 from together import TogetherCLI, hook
+from together.registration import CommandRegistrationError
 
 
 def test_non_group_root_is_type_error():
@@ -22,3 +23,72 @@ def test_non_group_root_is_type_error():
         MyCLI().build()
 
     assert "Cannot register a non-MultiCommand root" in str(excinfo.value)
+
+
+class RootPlugin:
+    @hook
+    def together_root_command(self, config):
+        @click.group("mycli")
+        def mycli():
+            pass
+
+        @mycli.group("preattached")
+        def preattached():
+            pass
+
+        return mycli
+
+
+def _build_with(*registrations):
+    class SubcmdPlugin:
+        @hook
+        def together_subcommand(self, config):
+            return list(registrations)
+
+    class MyCLI(TogetherCLI):
+        def register_plugins(self):
+            self.plugin_manager.register(RootPlugin())
+            self.plugin_manager.register(SubcmdPlugin())
+
+    return MyCLI().build()
+
+
+def _cmd(name, group=False):
+    return (click.group if group else click.command)(name)(lambda: None)
+
+
+def test_attach_under_preattached_and_registered_groups():
+    root = _build_with(
+        _cmd("foo", group=True),
+        (_cmd("bar"), ["mycli", "foo"]),
+        (_cmd("baz"), ["mycli", "preattached"]),
+    )
+    assert set(root.commands["foo"].commands) == {"bar"}
+    assert set(root.commands["preattached"].commands) == {"baz"}
+
+
+@pytest.mark.parametrize(
+    "registrations, message",
+    (
+        ([(_cmd("bar"), ["mycli", "foo"])], "no command found at 'mycli foo'"),
+        (
+            [_cmd("foo"), (_cmd("bar"), ["mycli", "foo"])],
+            "'mycli foo' is not a group",
+        ),
+        ([_cmd("foo"), _cmd("foo")], "'mycli' already has a command named 'foo'"),
+        ([(_cmd("foo"), ["othercli"])], "expected path to start with the root name"),
+    ),
+)
+def test_bad_registration_is_error(registrations, message):
+    with pytest.raises(CommandRegistrationError) as excinfo:
+        _build_with(*registrations)
+    assert message in str(excinfo.value)
+
+
+def test_all_registration_errors_are_reported():
+    with pytest.raises(CommandRegistrationError) as excinfo:
+        _build_with(
+            (_cmd("bar"), ["mycli", "foo"]),
+            (_cmd("baz"), ["mycli", "buzz"]),
+        )
+    assert len(excinfo.value.errors) == 2
@@ -0,0 +1,141 @@
+import io
+import json
+
+import click
+import pytest
+
+from together import TogetherCLI, format_option, hook, write_records
+from together.output import CSVWriter, TableWriter
+
+
+def _records(n):
+    for i in range(n):
+        yield {"id": i, "name": f"item{i}"}
+
+
+@pytest.mark.parametrize(
+    "format, expect",
+    [
+        ("ndjson", '{"id": 0, "name": "item0"}\n{"id": 1, "name": "item1"}\n'),
+        ("json", '[\n{"id": 0, "name": "item0"},\n{"id": 1, "name": "item1"}\n]\n'),
+        ("csv", "id,name\n0,item0\n1,item1\n"),
+        ("text", "id  name\n0   item0\n1   item1\n"),
+    ],
+)
+def test_formats(format, expect):
+    stream = io.StringIO()
+    assert write_records(_records(2), format=format, stream=stream) == 2
+    assert stream.getvalue() == expect
+
+
+@pytest.mark.parametrize(
+    "format, expect", [("json", "[]\n"), ("ndjson", ""), ("csv", ""), ("text", "")]
+)
+def test_empty(format, expect):
+    stream = io.StringIO()
+    write_records([], format=format, stream=stream)
+    assert stream.getvalue() == expect
+
+
+def test_json_array_is_valid_json():
+    stream = io.StringIO()
+    write_records(_records(5), format="json", stream=stream)
+    assert json.loads(stream.getvalue()) == list(_records(5))
+
+
+class CountingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+def test_output_is_written_in_chunks_while_iterating():
+    stream = CountingStream()
+    seen_before_end = []
+
+    def records():
+        yield from _records(10)
+        # the first chunks are written before the generator finishes
+        seen_before_end.append(stream.getvalue().count("\n"))
+        yield from _records(2)
+
+    write_records(records(), format="ndjson", stream=stream, chunk_size=4)
+    assert seen_before_end == [8]
+    assert stream.writes == 4
+
+
+def test_tuples_with_fields():
+    stream = io.StringIO()
+    with CSVWriter(stream, fields=["a", "b"]) as writer:
+        writer.write((1, 2))
+    assert stream.getvalue() == "a,b\n1,2\n"
+
+
+def test_table_widths_come_from_sample():
+    stream = io.StringIO()
+    with TableWriter(stream, sample_size=2) as writer:
+        writer.write_all([{"k": "a"}, {"k": "bb"}, {"k": "longer"}])
+    assert stream.getvalue() == "k\na\nbb\nlonger\n"
+
+
+def _make_cli():
+    class Plugin:
+        @hook
+        def together_root_command(self, config):
+            return format_option(click.group("mycli")(lambda: None))
+
+        @hook
+        def together_subcommand(self, config):
+            @click.command("list")
+            @format_option(default="ndjson")
+            def list_cmd():
+                write_records(_records(1))
+
+            return list_cmd
+
+    class MyCLI(TogetherCLI):
+        def register_plugins(self):
+            self.plugin_manager.register(Plugin())
+
+    return MyCLI()
+
+
+@pytest.mark.parametrize(
+    "args, expect",
+    [
+        # the leaf's default wins over the root's
+        ("mycli list", '{"id": 0, "name": "item0"}\n'),
+        # the root's explicit value wins over the leaf's default
+        ("mycli --format csv list", "id,name\n0,item0\n"),
+        # the leaf's explicit value wins over the root's
+        ("mycli --format csv list --format text", "id  name\n0   item0\n"),
+        ("mycli list --format csv", "id,name\n0,item0\n"),
+    ],
+)
+def test_format_option_levels(run_cmd, args, expect):
+    assert run_cmd(_make_cli(), args).output == expect
+
+
+def test_format_option_root_default(run_cmd):
+    class Plugin:
+        @hook
+        def together_root_command(self, config):
+            return format_option(default="csv")(click.group("mycli")(lambda: None))
+
+        @hook
+        def together_subcommand(self, config):
+            @click.command("list")
+            def list_cmd():
+                write_records(_records(1))
+
+            return list_cmd
+
+    class MyCLI(TogetherCLI):
+        def register_plugins(self):
+            self.plugin_manager.register(Plugin())
+
+    assert run_cmd(MyCLI(), "mycli list").output == "id,name\n0,item0\n"
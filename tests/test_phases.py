@@ -0,0 +1,111 @@
+import click
+import pytest
+
+from together import TogetherCLI, hook
+
+
+class CountingPlugin:
+    def __init__(self):
+        self.calls = []
+
+    @hook
+    def together_root_command(self, config):
+        self.calls.append("root")
+        return click.group("mycli")(lambda: None)
+
+    @hook
+    def together_configure(self, config):
+        self.calls.append("configure")
+        config["configured"] = True
+
+    @hook
+    def together_exception_handler(self, config):
+        self.calls.append("exception_handler")
+        return [(KeyError, lambda err: 4)]
+
+    @hook
+    def together_subcommand(self, config):
+        @click.command("ok")
+        def ok():
+            pass
+
+        @click.command("fail")
+        def fail():
+            raise KeyError("x")
+
+        return [ok, fail]
+
+
+@pytest.fixture
+def plugin():
+    return CountingPlugin()
+
+
+@pytest.fixture
+def cli(plugin):
+    class MyCLI(TogetherCLI):
+        def register_plugins(self):
+            self.plugin_manager.register(plugin)
+
+    return MyCLI()
+
+
+def test_construction_only_registers_plugins(cli, plugin):
+    assert cli.completed_phases == ("plugins",)
+    assert plugin.calls == []
+
+
+def test_config_phase_runs_on_first_access(cli, plugin):
+    assert cli.config["configured"] is True
+    assert cli.config["configured"] is True
+    assert cli.completed_phases == ("plugins", "config")
+    assert plugin.calls == ["configure"]
+
+
+def test_exception_handlers_phase_runs_on_first_access(cli, plugin):
+    assert cli.exception_handlers.find_callback(KeyError())
+    assert cli.completed_phases == ("plugins", "config", "exception_handlers")
+    assert plugin.calls == ["configure", "exception_handler"]
+
+
+def test_build_phase_needs_config_only(cli, plugin):
+    cli.build()
+    assert cli.completed_phases == ("plugins", "config", "build")
+    assert plugin.calls == ["configure", "root"]
+
+
+def test_successful_invocations_skip_exception_handlers(cli, plugin):
+    with pytest.raises(SystemExit) as excinfo:
+        cli(["ok"], prog_name="mycli")
+    assert excinfo.value.code == 0
+    assert "exception_handlers" not in cli.completed_phases
+    assert "exception_handler" not in plugin.calls
+
+
+def test_failing_invocations_load_exception_handlers(cli, plugin):
+    with pytest.raises(SystemExit) as excinfo:
+        cli(["fail"], prog_name="mycli")
+    assert excinfo.value.code == 4
+    assert plugin.calls == ["configure", "root", "exception_handler"]
+
+
+def test_failed_config_phase_runs_again():
+    attempts = []
+
+    class FlakyPlugin:
+        @hook
+        def together_configure(self, config):
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OSError("flaky")
+            config["ok"] = True
+
+    class MyCLI(TogetherCLI):
+        def register_plugins(self):
+            self.plugin_manager.register(FlakyPlugin())
+
+    cli = MyCLI()
+    with pytest.raises(OSError):
+        cli.configure()
+    assert cli.completed_phases == ("plugins",)
+    assert cli.config == {"ok": True}
@@ -0,0 +1,114 @@
+import textwrap
+
+import click
+import pytest
+
+from together import TogetherCLI, discovery
+
+
+@pytest.fixture
+def sample_dist(tmp_path, monkeypatch):
+    (tmp_path / "sample_plugin.py").write_text(textwrap.dedent("""
+            import click
+            import together
+
+            @together.hook
+            def together_root_command(config):
+                @click.group("sample", invoke_without_command=True)
+                def sample():
+                    click.echo("at root")
+
+                return sample
+            """))
+    distinfo = tmp_path / "sample_plugin-1.0.dist-info"
+    distinfo.mkdir()
+    (distinfo / "METADATA").write_text("Name: sample-plugin\nVersion: 1.0\n")
+    (distinfo / "entry_points.txt").write_text("[together]\nroot = sample_plugin\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delenv("TOGETHER_RESCAN_PLUGINS", raising=False)
+    return tmp_path
+
+
+@pytest.fixture
+def cached_cli(tmp_path_factory):
+    # kept out of the sys.path entry, so that writing other files there is
+    # seen as a change to the environment
+    cachedir = tmp_path_factory.mktemp("cache")
+
+    class MyCLI(TogetherCLI):
+        plugin_cache_path = str(cachedir / "plugins.json")
+
+    return MyCLI
+
+
+def _forbid_scan(monkeypatch):
+    def fail(group):
+        raise AssertionError("entrypoints were rescanned")
+
+    monkeypatch.setattr(discovery, "scan_entrypoints", fail)
+
+
+def test_default_loading_finds_entrypoint(sample_dist, run_cmd):
+    result = run_cmd(TogetherCLI(), "sample")
+    assert result.output == "at root\n"
+
+
+def test_cache_hit_skips_scan(sample_dist, cached_cli, monkeypatch):
+    cached_cli()
+    _forbid_scan(monkeypatch)
+    cli = cached_cli()
+    assert isinstance(cli.build(), click.Group)
+
+
+def test_cache_is_invalidated_by_path_change(sample_dist, cached_cli, monkeypatch):
+    cached_cli()
+    calls = []
+    real_scan = discovery.scan_entrypoints
+    monkeypatch.setattr(
+        discovery, "scan_entrypoints", lambda g: calls.append(g) or real_scan(g)
+    )
+    (sample_dist / "another_module.py").write_text("")
+    cached_cli()
+    assert calls == ["together"]
+
+
+def test_invalidate_and_env_force_rescan(sample_dist, cached_cli, monkeypatch):
+    cli = cached_cli()
+    cli.invalidate_plugin_discovery_cache()
+    assert (
+        discovery.PluginDiscoveryCache(cli.plugin_cache_path).load("together") is None
+    )
+
+    cached_cli()
+    monkeypatch.setenv("TOGETHER_RESCAN_PLUGINS", "1")
+    _forbid_scan(monkeypatch)
+    with pytest.raises(AssertionError, match="rescanned"):
+        cached_cli()
+
+
+def test_concurrent_entrypoint_loading(sample_dist, run_cmd):
+    class MyCLI(TogetherCLI):
+        concurrent_plugin_threads = 2
+
+    result = run_cmd(MyCLI(), "sample")
+    assert result.output == "at root\n"
+
+
+def test_cache_in_sys_path_directory(sample_dist, monkeypatch):
+    class MyCLI(TogetherCLI):
+        plugin_cache_path = str(sample_dist / "plugins.json")
+
+    MyCLI()
+    _forbid_scan(monkeypatch)
+    assert isinstance(MyCLI().build(), click.Group)
+
+
+@pytest.mark.parametrize("cached", (False, True))
+def test_plugin_distinfo_is_recorded(sample_dist, cached_cli, cached):
+    cli_class = cached_cli if cached else TogetherCLI
+    cli_class()
+    cli = cli_class()
+    [(plugin, dist)] = cli.plugin_manager.list_plugin_distinfo()
+    assert plugin is cli.plugin_manager.get_plugin("root")
+    assert dist.project_name == "sample-plugin"
+    assert dist.version == "1.0"
@@ -0,0 +1,104 @@
+import json
+
+import click
+import pytest
+
+from together import TogetherCLI, hook
+from together.profiling import Profiler
+
+
+class BasePlugin:
+    @hook
+    def together_root_command(self, config):
+        @click.group("mycli")
+        def mycli():
+            pass
+
+        return mycli
+
+    @hook
+    def together_configure(self, config):
+        config["base"] = True
+
+
+class FooPlugin:
+    @hook
+    def together_subcommand(self, config):
+        @click.command("foo")
+        def foo():
+            click.echo("in foo")
+
+        return foo
+
+    @hook
+    def together_exception_handler(self, config):
+        return (ValueError, lambda e: 3)
+
+
+class MyCLI(TogetherCLI):
+    def register_plugins(self):
+        self.plugin_manager.register(BasePlugin(), name="base")
+        self.plugin_manager.register(FooPlugin(), name="foo")
+
+
+def test_profiling_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("TOGETHER_PROFILE", raising=False)
+    assert not MyCLI().profiler.enabled
+
+
+def test_profile_json(tmp_path, monkeypatch, run_cmd):
+    path = tmp_path / "profile.json"
+    monkeypatch.setenv("TOGETHER_PROFILE", str(path))
+    result = run_cmd(MyCLI(), "mycli foo")
+    assert result.output == "in foo\n"
+
+    spans = json.loads(path.read_text())["spans"]
+    names = {(x["name"], x["args"].get("plugin")) for x in spans}
+    assert {
+        ("register_plugins", None),
+        ("configure", None),
+        ("together_configure", "base"),
+        ("build", None),
+        ("together_root_command", "base"),
+        ("together_subcommand", "foo"),
+        ("attach", None),
+        ("invoke", None),
+    } <= names
+    assert all(x["duration_ms"] >= 0 for x in spans)
+    # exception handlers are only loaded when a command fails
+    assert ("together_exception_handler", "foo") not in names
+    # hook calls made during the build are nested under it
+    build = next(x for x in spans if x["name"] == "build")
+    subcmd = next(x for x in spans if x["name"] == "together_subcommand")
+    assert subcmd["depth"] > build["depth"]
+
+
+def test_profile_chrome_trace(tmp_path, monkeypatch, run_cmd):
+    path = tmp_path / "trace.json"
+    monkeypatch.setenv("TOGETHER_PROFILE", str(path))
+    monkeypatch.setenv("TOGETHER_PROFILE_FORMAT", "chrome")
+    run_cmd(MyCLI(), "mycli foo")
+
+    events = json.loads(path.read_text())["traceEvents"]
+    assert events
+    assert all(x["ph"] == "X" for x in events)
+    assert "invoke" in {x["name"] for x in events}
+
+
+def test_bad_profile_format(tmp_path):
+    with pytest.raises(ValueError):
+        Profiler().write(str(tmp_path / "profile"), format="xml")
+
+
+@pytest.mark.parametrize("bad", ("format", "path"))
+def test_profile_problems_do_not_change_the_result(tmp_path, monkeypatch, run_cmd, bad):
+    path = tmp_path / "profile.json"
+    if bad == "format":
+        monkeypatch.setenv("TOGETHER_PROFILE_FORMAT", "xml")
+    else:
+        path = tmp_path / "missing-dir" / "profile.json"
+    monkeypatch.setenv("TOGETHER_PROFILE", str(path))
+    result = run_cmd(MyCLI(), "mycli foo")
+    assert result.output == "in foo\n"
+    assert "together: " in result.stderr
+    assert not path.exists()
@@ -0,0 +1,181 @@
+import asyncio
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import click
+import pytest
+
+from together import (
+    CommandState,
+    ContextExecutor,
+    LazyConfig,
+    Resource,
+    StateSnapshot,
+    TogetherCLI,
+    create_task,
+    get_resource,
+    get_state,
+    get_verbosity,
+    hook,
+    run_in_thread,
+    verbose_option,
+)
+
+
+def _describe(suffix):
+    return f"verbosity={get_verbosity()} color={get_state().config['color']}{suffix}"
+
+
+class Connection:
+    closed = []
+
+    def __init__(self):
+        self.name = "db"
+
+    def close(self):
+        Connection.closed.append(self.name)
+
+
+class BasePlugin:
+    @hook
+    def together_root_command(self, config):
+        @click.group("mycli")
+        @verbose_option
+        def mycli():
+            pass
+
+        return mycli
+
+    @hook
+    def together_configure(self, config):
+        config["color"] = "blue"
+
+    @hook
+    def together_subcommand(self, config):
+        @click.command("threads")
+        def threads():
+            with ContextExecutor(ThreadPoolExecutor(2)) as executor:
+                for line in executor.map(_describe, [" a", " b"]):
+                    click.echo(line)
+
+        @click.command("processes")
+        def processes():
+            with ContextExecutor(ProcessPoolExecutor(1)) as executor:
+                click.echo(executor.submit(_describe, "!").result())
+                # changes are sent to executors created after them
+                get_state().set("verbosity", 3)
+                click.echo(executor.submit(_describe, "!!").result())
+            with ContextExecutor(ProcessPoolExecutor(1)) as executor:
+                click.echo(executor.submit(_describe, "?").result())
+
+        @click.command("resources")
+        def resources():
+            with ContextExecutor(ThreadPoolExecutor(1)) as executor:
+                name = executor.submit(lambda: get_resource("db").name).result()
+            click.echo(f"built {name}")
+
+        @click.command("tasks")
+        async def tasks():
+            task = create_task(asyncio.sleep(0, "x"))
+            click.echo(await task)
+            click.echo(await run_in_thread(_describe, "?"))
+
+        return [threads, processes, resources, tasks]
+
+    @hook
+    def together_resource(self, config):
+        return Resource("db", Connection)
+
+
+class MyCLI(TogetherCLI):
+    def register_plugins(self):
+        self.plugin_manager.register(BasePlugin())
+
+
+def test_thread_executor(run_cmd):
+    result = run_cmd(MyCLI(), "mycli -v threads")
+    assert result.output == "verbosity=1 color=blue a\nverbosity=1 color=blue b\n"
+
+
+def test_process_executor(run_cmd, monkeypatch):
+    snapshots = []
+    from_state = StateSnapshot.from_state.__func__
+    monkeypatch.setattr(
+        StateSnapshot,
+        "from_state",
+        classmethod(
+            lambda cls, state=None: snapshots.append(1) or from_state(cls, state)
+        ),
+    )
+    result = run_cmd(MyCLI(), "mycli -vv processes")
+    assert result.output == (
+        "verbosity=2 color=blue!\nverbosity=2 color=blue!!\nverbosity=3 color=blue?\n"
+    )
+    # one snapshot per executor serves every submission
+    assert snapshots == [1, 1]
+
+
+def test_resources_built_in_threads_are_closed(run_cmd):
+    Connection.closed.clear()
+    result = run_cmd(MyCLI(), "mycli resources")
+    assert result.output == "built db\n"
+    assert Connection.closed == ["db"]
+
+
+def test_tasks_and_run_in_thread(run_cmd):
+    result = run_cmd(MyCLI(), "mycli tasks")
+    assert result.output == "x\nverbosity=0 color=blue?\n"
+
+
+def test_task_keeps_state_after_context_exits():
+    state = object()
+    with click.Context(click.Command("cmd"), obj=state):
+
+        async def later():
+            await asyncio.sleep(0)
+            return get_state()
+
+        async def main():
+            with click.Context(click.Command("cmd"), obj=state):
+                task = create_task(later())
+            return await task
+
+        assert asyncio.run(main()) is state
+
+
+def test_unpropagated_thread_has_no_state():
+    errors = []
+
+    def work():
+        try:
+            get_state()
+        except RuntimeError as err:
+            errors.append(err)
+
+    with click.Context(click.Command("cmd"), obj=object()):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+    assert len(errors) == 1
+
+
+def test_snapshot_skips_unpicklable_values():
+    cli = MyCLI()
+    cli.build()
+    state = cli.root_command.context_settings["obj"]
+    state.set("verbosity", 1)
+    state.set("callback", lambda: None)
+    snapshot = pickle.loads(pickle.dumps(StateSnapshot.from_state(state)))
+    restored = snapshot.restore()
+    assert restored.data == {"verbosity": 1}
+    assert restored.config["color"] == "blue"
+
+
+def test_snapshot_leaves_out_unresolved_lazy_values():
+    config = LazyConfig({"eager": 1})
+    config.register_lazy("used", lambda: 2)
+    config.register_lazy("unused", lambda: pytest.fail("provider called"))
+    assert config["used"] == 2
+    snapshot = StateSnapshot.from_state(CommandState(config=config))
+    assert pickle.loads(pickle.dumps(snapshot)).config == {"eager": 1, "used": 2}
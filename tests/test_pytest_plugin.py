@@ -0,0 +1,114 @@
+import textwrap
+
+import pytest
+
+CLI_MODULE = """
+import click
+import together
+
+BUILDS = []
+
+class Plugin:
+    @together.hook
+    def together_root_command(self, config):
+        BUILDS.append(1)
+        return together.verbose_option(click.group("mycli")(lambda: None))
+
+    @together.hook
+    def together_subcommand(self, config):
+        @click.command("show")
+        def show():
+            click.echo(f"verbosity={together.get_verbosity()}")
+            click.echo("to stderr", err=True)
+
+        @click.command("ask")
+        def ask():
+            click.echo(click.prompt("name"))
+
+        @click.command("boom")
+        def boom():
+            raise RuntimeError("boom")
+
+        @click.command("quit")
+        def quit():
+            raise SystemExit("bye")
+
+        return [show, ask, boom, quit]
+
+class MyCLI(together.TogetherCLI):
+    def register_plugins(self):
+        self.plugin_manager.register(Plugin())
+"""
+
+
+# the plugin is registered by its entry point when together is installed, and
+# registering it again under another name is an error
+LOAD_PLUGIN_CONFTEST = """
+import together.pytest_plugin
+
+def pytest_addhooks(pluginmanager):
+    if not pluginmanager.is_registered(together.pytest_plugin):
+        pluginmanager.register(together.pytest_plugin, "together")
+"""
+
+
+@pytest.fixture
+def project(pytester):
+    pytester.makeconftest(LOAD_PLUGIN_CONFTEST)
+    return pytester
+
+
+@pytest.fixture
+def cli_project(project):
+    pytester = project
+    pytester.makepyfile(sample_cli=CLI_MODULE)
+    pytester.syspathinsert()
+    pytester.makeini("[pytest]\ntogether_cli = sample_cli:MyCLI\n")
+    return pytester
+
+
+def test_session_cli_is_built_once(cli_project):
+    cli_project.makepyfile(test_sample=textwrap.dedent("""
+            import sample_cli
+
+            def test_verbose(together_invoke):
+                result = together_invoke("-vv show")
+                assert result.stdout == "verbosity=2\\n"
+                assert result.stderr == "to stderr\\n"
+
+            def test_state_is_reset(together_invoke):
+                assert together_invoke("show").stdout == "verbosity=0\\n"
+
+            def test_input(together_invoke):
+                result = together_invoke(["ask"], input="alice\\n")
+                assert result.stdout.endswith("alice\\n")
+
+            def test_errors(together_invoke):
+                result = together_invoke("boom", assert_exit_code=1)
+                assert isinstance(result.exception, RuntimeError)
+                together_invoke("missing", assert_exit_code=2)
+                # non-integer codes are handled as the interpreter would
+                result = together_invoke("quit", assert_exit_code=1)
+                assert result.stderr == "bye\\n"
+
+            def test_built_once(together_cli):
+                assert len(sample_cli.BUILDS) == 1
+            """))
+    result = cli_project.runpytest()
+    result.assert_outcomes(passed=5)
+
+
+def test_failed_invocations_report_output(cli_project):
+    cli_project.makepyfile(test_sample=textwrap.dedent("""
+            def test_fails(together_invoke):
+                together_invoke("boom")
+            """))
+    result = cli_project.runpytest()
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*exit_code=1 (expected 0)*"])
+
+
+def test_missing_target_is_a_usage_error(project):
+    project.makepyfile(test_sample="def test_x(together_cli):\n    pass\n")
+    result = project.runpytest()
+    result.stdout.fnmatch_lines(["*set the together_cli ini option*"])
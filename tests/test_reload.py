@@ -0,0 +1,179 @@
+import importlib
+import sys
+
+import click
+import pytest
+
+from together import TogetherCLI, hook
+from together.registration import CommandRegistrationError
+
+PLUGIN_SOURCE = """
+import click
+import together
+
+@together.hook
+def together_subcommand(config):
+    @click.group("tools")
+    def tools():
+        pass
+
+    @tools.command("{name}")
+    def cmd():
+        click.echo("{message}")
+
+    return tools
+"""
+
+
+class RootPlugin:
+    @hook
+    def together_root_command(self, config):
+        return click.group("mycli")(lambda: None)
+
+    @hook
+    def together_subcommand(self, config):
+        @click.command("other")
+        def other():
+            click.echo("other")
+
+        return other
+
+
+class NestedPlugin:
+    @hook
+    def together_subcommand(self, config):
+        @click.command("nested")
+        def nested():
+            click.echo("nested")
+
+        # attached beneath the reloadable plugin's group
+        return nested, ["mycli", "tools"]
+
+
+@pytest.fixture
+def plugin_module(tmp_path, monkeypatch):
+    path = tmp_path / "reloadable_plugin.py"
+
+    def write(name, message):
+        path.write_text(PLUGIN_SOURCE.format(name=name, message=message))
+
+    write("hello", "v1")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(sys, "dont_write_bytecode", True)
+    yield write
+    sys.modules.pop("reloadable_plugin", None)
+
+
+@pytest.fixture
+def cli(plugin_module):
+    class MyCLI(TogetherCLI):
+        def register_plugins(self):
+            self.plugin_manager.register(RootPlugin(), name="root")
+            self.plugin_manager.register(
+                importlib.import_module("reloadable_plugin"), name="reloadable"
+            )
+            self.plugin_manager.register(NestedPlugin(), name="nested")
+
+    return MyCLI()
+
+
+def test_reload_replaces_only_the_plugins_commands(cli, plugin_module, run_cmd):
+    root = cli.build()
+    other = root.commands["other"]
+    assert run_cmd(cli, "mycli tools hello").output == "v1\n"
+
+    plugin_module("goodbye", "version two")
+    cli.reload_plugin("reloadable")
+
+    assert cli.root_command is root
+    assert root.commands["other"] is other
+    assert run_cmd(cli, "mycli tools goodbye").output == "version two\n"
+    assert run_cmd(cli, "mycli tools nested").output == "nested\n"
+    run_cmd(cli, "mycli tools hello", assert_exit_code=2)
+
+    assert cli.command_owners[("mycli", "tools")] == "reloadable"
+    assert cli.command_owners[("mycli", "tools", "nested")] == "nested"
+    assert [x.plugin_name for x in cli.all_subcommands] == [
+        "root",
+        "reloadable",
+        "nested",
+    ]
+
+
+def test_reload_with_explicit_plugin(cli):
+    cli.build()
+
+    class Replacement:
+        @hook
+        def together_subcommand(self, config):
+            return click.command("replacement")(lambda: None)
+
+    # the nested command has nowhere to go, so the old tree is kept
+    with pytest.raises(CommandRegistrationError, match="no command found"):
+        cli.reload_plugin("reloadable", plugin=Replacement())
+    assert "replacement" not in cli.root_command.commands
+    assert list(cli.root_command.commands["tools"].commands) == ["hello", "nested"]
+    assert cli.command_owners[("mycli", "tools", "nested")] == "nested"
+    assert cli.command_index.lookup(("mycli", "replacement")) is None
+
+
+def test_reload_reports_attach_errors(cli):
+    cli.build()
+
+    class Conflicting:
+        @hook
+        def together_subcommand(self, config):
+            return click.group("other")(lambda: None)
+
+    with pytest.raises(CommandRegistrationError, match="already has a command"):
+        cli.reload_plugin("reloadable", plugin=Conflicting())
+
+
+def test_reload_reusing_command_objects(cli, tmp_path, run_cmd):
+    # commands defined in another module are not rebuilt by reloading the
+    # plugin's module
+    (tmp_path / "shared_cmds.py").write_text(
+        "import click\n"
+        "group = click.Group('shared')\n"
+        "child = click.Command('child', callback=lambda: click.echo('child'))\n"
+    )
+    (tmp_path / "shared_plugin.py").write_text(
+        "import together\n"
+        "from shared_cmds import child, group\n"
+        "@together.hook\n"
+        "def together_subcommand(config):\n"
+        "    return [group, (child, ['mycli', 'shared'])]\n"
+    )
+    try:
+        cli.plugin_manager.register(
+            importlib.import_module("shared_plugin"), name="shared"
+        )
+        cli.build()
+        cli.reload_plugin("shared")
+        cli.reload_plugin("shared", plugin=sys.modules["shared_plugin"])
+        assert run_cmd(cli, "mycli shared child").output == "child\n"
+        assert cli.command_owners[("mycli", "shared", "child")] == "shared"
+    finally:
+        sys.modules.pop("shared_plugin", None)
+        sys.modules.pop("shared_cmds", None)
+
+
+def test_reload_before_build_and_unknown_names(cli, plugin_module, run_cmd):
+    plugin_module("later", "v2")
+    cli.reload_plugin("reloadable")
+    # registration order is kept, so the nested command still finds its group
+    assert [x for x, _ in cli.plugin_manager.list_name_plugin()] == [
+        "root",
+        "reloadable",
+        "nested",
+    ]
+    assert run_cmd(cli, "mycli tools later").output == "v2\n"
+    with pytest.raises(ValueError, match="no plugin is registered"):
+        cli.reload_plugin("missing")
+
+
+def test_reloading_the_root_plugin_rebuilds(cli, run_cmd):
+    old_root = cli.build()
+    cli.reload_plugin("root", plugin=RootPlugin())
+    assert cli.root_command is not old_root
+    assert run_cmd(cli, "mycli tools nested").output == "nested\n"
@@ -0,0 +1,118 @@
+import click
+import pytest
+
+from together import Resource, TogetherCLI, get_resource, hook
+from together.resources import ResourceRegistry
+
+
+class Connection:
+    opened = []
+    closed = []
+
+    def __init__(self, name):
+        self.name = name
+        Connection.opened.append(name)
+
+    def close(self):
+        Connection.closed.append(self.name)
+
+
+@pytest.fixture(autouse=True)
+def reset_connections():
+    Connection.opened.clear()
+    Connection.closed.clear()
+
+
+class ResourcePlugin:
+    @hook
+    def together_root_command(self, config):
+        @click.group("mycli")
+        def root():
+            click.echo(f"root sees {get_resource('db').name}")
+
+        return root
+
+    @hook
+    def together_resource(self, config):
+        return [
+            Resource("db", lambda: Connection("db")),
+            Resource("cache", lambda: Connection("cache"), persistent=True),
+            Resource("unused", lambda: Connection("unused")),
+        ]
+
+    @hook
+    def together_subcommand(self, config):
+        @click.group("nested")
+        def nested():
+            pass
+
+        @nested.command("leaf")
+        def leaf():
+            click.echo(f"leaf sees {get_resource('db').name}")
+            get_resource("cache")
+
+        return nested
+
+
+class MyCLI(TogetherCLI):
+    def register_plugins(self):
+        self.plugin_manager.register(ResourcePlugin())
+
+
+def test_resources_are_shared_and_closed_at_teardown(run_cmd):
+    cli = MyCLI()
+    result = run_cmd(cli, "mycli nested leaf")
+    assert result.output == "root sees db\nleaf sees db\n"
+    assert Connection.opened == ["db", "cache"]
+    # the persistent resource outlives the invocation
+    assert Connection.closed == ["db"]
+
+    run_cmd(cli, "mycli nested leaf")
+    assert Connection.opened == ["db", "cache", "db"]
+    assert Connection.closed == ["db", "db"]
+
+    cli.close_resources()
+    assert Connection.closed == ["db", "db", "cache"]
+
+
+def test_persistent_resources_across_batch():
+    cli = MyCLI()
+    results = list(cli.run_batch([["nested", "leaf"]] * 3))
+    assert [x.exit_code for x in results] == [0, 0, 0]
+    assert Connection.opened.count("cache") == 1
+    assert Connection.opened.count("db") == 3
+    # the batch closes persistent resources when it finishes
+    assert Connection.closed.count("cache") == 1
+
+
+def test_registry_close_order_and_custom_close():
+    closed = []
+    definitions = {
+        "a": Resource("a", lambda: "A", close=closed.append),
+        "b": Resource("b", lambda: "B", close=closed.append),
+    }
+    registry = ResourceRegistry(lambda: definitions)
+    assert registry.get("a") == "A"
+    assert registry.get("a") == "A"
+    registry.get("b")
+    registry.close()
+    assert closed == ["B", "A"]
+    assert not registry.is_built("a")
+
+    with pytest.raises(KeyError, match="no resource named 'c'"):
+        registry.get("c")
+
+
+def test_duplicate_declarations_are_errors():
+    class Duplicate:
+        @hook
+        def together_resource(self, config):
+            return Resource("db", lambda: None)
+
+    class DuplicateCLI(MyCLI):
+        def register_plugins(self):
+            super().register_plugins()
+            self.plugin_manager.register(Duplicate())
+
+    with pytest.raises(ValueError, match="'db' was declared twice"):
+        DuplicateCLI().get_resource_definitions()
@@ -0,0 +1,158 @@
+import os
+import pickle
+import sys
+import time
+import types
+
+import click
+import pytest
+
+from together import TogetherCLI, cache_option, hook, memoize
+from together.result_cache import ResultStore
+
+
+def _make_cli(tmp_path, calls, ttl=None):
+    class Plugin:
+        @hook
+        def together_root_command(self, config):
+            @click.group("mycli")
+            @click.option("--region", default="us")
+            @cache_option
+            def root(region):
+                pass
+
+            return root
+
+        @hook
+        def together_configure(self, config):
+            config["memoize"] = {"path": str(tmp_path / "cache")}
+
+        @hook
+        def together_subcommand(self, config):
+            @click.command("scan")
+            @click.argument("target")
+            @memoize(ttl=ttl)
+            def scan(target):
+                calls.append(target)
+                click.echo(f"scanned {target}")
+                return len(calls)
+
+            return scan
+
+        @hook(specname="together_subcommand")
+        def dump_subcommand(self, config):
+            @click.command("dump")
+            @memoize
+            def dump():
+                calls.append("dump")
+                click.echo("text ", nl=False)
+                click.get_binary_stream("stdout").write(b"binary ")
+                sys.stdout.buffer.write(b"buffer ")
+                print("print")
+
+            return dump
+
+    class MyCLI(TogetherCLI):
+        def register_plugins(self):
+            self.plugin_manager.register(Plugin())
+
+    return MyCLI()
+
+
+def test_results_are_replayed(tmp_path, run_cmd):
+    calls = []
+    cli = _make_cli(tmp_path, calls)
+    assert run_cmd(cli, "mycli scan a").output == "scanned a\n"
+    assert run_cmd(cli, "mycli scan a").output == "scanned a\n"
+    assert calls == ["a"]
+
+    # different parameters, at any level, are different keys
+    run_cmd(cli, "mycli scan b")
+    run_cmd(cli, "mycli --region eu scan a")
+    assert calls == ["a", "b", "a"]
+
+    stats = ResultStore(str(tmp_path / "cache")).stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 3
+
+
+def test_binary_output_is_replayed(tmp_path, run_cmd):
+    calls = []
+    cli = _make_cli(tmp_path, calls)
+    expected = "text binary buffer print\n"
+    assert run_cmd(cli, "mycli dump").output == expected
+    assert run_cmd(cli, "mycli dump").output == expected
+    assert calls == ["dump"]
+
+
+def test_cache_option_modes(tmp_path, run_cmd):
+    calls = []
+    cli = _make_cli(tmp_path, calls)
+    run_cmd(cli, "mycli scan a")
+    run_cmd(cli, "mycli --cache off scan a")
+    run_cmd(cli, "mycli --cache refresh scan a")
+    assert calls == ["a", "a", "a"]
+    # the command state is shared between these invocations, so reset it
+    cli.reload_command_state_object()
+    run_cmd(cli, "mycli scan a")
+    assert calls == ["a", "a", "a"]
+
+
+def test_ttl_expiry(tmp_path, run_cmd):
+    calls = []
+    cli = _make_cli(tmp_path, calls, ttl=0.01)
+    run_cmd(cli, "mycli scan a")
+    time.sleep(0.05)
+    run_cmd(cli, "mycli scan a")
+    assert calls == ["a", "a"]
+
+
+def test_lru_eviction(tmp_path):
+    store = ResultStore(str(tmp_path))
+    store.set("old", "x" * 300)
+    # room for three entries
+    store.max_bytes = 3 * os.path.getsize(store._entry_path("old")) + 10
+    store.set("used", "x" * 300)
+    # make "old" the least recently used
+    os.utime(store._entry_path("old"), ns=(0, 0))
+    assert store.get("used") is not None
+    store.set("new", "x" * 300)
+    store.set("newer", "x" * 300)
+
+    assert store.get("old") is None
+    assert store.get("used")["value"] == "x" * 300
+    assert store.stats()["evictions"] == 1
+
+
+def test_unpicklable_values_are_not_cached(tmp_path):
+    store = ResultStore(str(tmp_path))
+    store.set("key", lambda: None)
+    assert store.get("key") is None
+
+
+def test_unloadable_entries_are_misses(tmp_path, monkeypatch):
+    store = ResultStore(str(tmp_path))
+    # a class which is gone by the time the entry is read
+    module = types.ModuleType("vanishing_module")
+    exec("class Thing:\n    pass\n", module.__dict__)
+    module.Thing.__module__ = "vanishing_module"
+    monkeypatch.setitem(sys.modules, "vanishing_module", module)
+    store.set("renamed", module.Thing())
+    monkeypatch.delitem(sys.modules, "vanishing_module")
+
+    for key, entry in [("bad-shape", {"value": 1}), ("not-a-dict", [1])]:
+        with open(store._entry_path(key), "wb") as fp:
+            pickle.dump(entry, fp)
+
+    for key in ["renamed", "bad-shape", "not-a-dict"]:
+        assert store.get(key) is None
+        assert not os.path.exists(store._entry_path(key))
+    assert store.stats()["misses"] == 3
+
+
+def test_coroutines_are_rejected():
+    async def callback():
+        pass
+
+    with pytest.raises(TypeError):
+        memoize(callback)
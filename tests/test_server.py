@@ -0,0 +1,212 @@
+import os
+import socket
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+
+from together import server as together_server
+
+CLI_MODULE = """
+import sys
+
+import click
+import together
+
+from together.server import run_client
+
+
+class BasePlugin:
+    @together.hook
+    def together_root_command(self, config):
+        @click.group("mycli")
+        @together.verbose_option
+        def mycli():
+            pass
+
+        return mycli
+
+
+class SubcmdPlugin:
+    @together.hook
+    def together_subcommand(self, config):
+        @click.command("show")
+        @together.verbose_option
+        def show():
+            import os
+            click.echo(f"verbosity={together.get_verbosity()}")
+            click.echo(f"cwd={os.getcwd()} env={os.environ.get('SERVER_TEST')}")
+            click.echo(f"pid={os.getpid()}")
+            click.echo("to stderr", err=True)
+
+        @click.command("fail")
+        def fail():
+            raise ValueError("bad")
+
+        @click.command("quit")
+        def quit():
+            sys.exit(4)
+
+        return [show, fail, quit]
+
+    @together.hook
+    def together_exception_handler(self, config):
+        return (ValueError, lambda err: 3)
+
+
+class MyCLI(together.TogetherCLI):
+    def register_plugins(self):
+        self.plugin_manager.register(BasePlugin())
+        self.plugin_manager.register(SubcmdPlugin())
+
+
+if __name__ == "__main__":
+    run_client(sys.argv.pop(1), lambda: MyCLI()(), prog_name="mycli")
+"""
+
+
+@pytest.fixture
+def env(tmp_path):
+    (tmp_path / "server_cli.py").write_text(textwrap.dedent(CLI_MODULE))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(tmp_path), os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+    )
+    env["SERVER_TEST"] = "from-client"
+    return env
+
+
+@pytest.fixture
+def server(tmp_path, env):
+    socket_path = str(tmp_path / "mycli.sock")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "together.server", "server_cli:MyCLI"]
+        + ["--socket", socket_path],
+        env=env,
+        cwd=str(tmp_path),
+    )
+    for _ in range(100):
+        if os.path.exists(socket_path):
+            break
+        time.sleep(0.05)
+    else:
+        proc.kill()
+        pytest.fail("server did not start")
+    yield proc, socket_path
+    proc.terminate()
+    proc.wait()
+
+
+def _client(env, socket_path, *args, cwd=None):
+    return subprocess.run(
+        [sys.executable, "-m", "server_cli", socket_path] + list(args),
+        env=env,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+
+
+def test_client_uses_server(tmp_path, env, server):
+    proc, socket_path = server
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+    for _ in range(2):  # state must not carry over between requests
+        result = _client(env, socket_path, "-v", "show", cwd=str(workdir))
+        assert result.returncode == 0
+        assert result.stdout.splitlines() == [
+            "verbosity=1",
+            f"cwd={workdir} env=from-client",
+            f"pid={proc.pid}",
+        ]
+        assert result.stderr == "to stderr\n"
+
+
+def test_server_exit_statuses(env, server):
+    _, socket_path = server
+    assert _client(env, socket_path, "fail").returncode == 3
+    assert _client(env, socket_path, "quit").returncode == 4
+    assert _client(env, socket_path, "nosuchcommand").returncode == 2
+
+
+def test_client_falls_back_without_server(tmp_path, env):
+    result = _client(env, str(tmp_path / "missing.sock"), "show")
+    assert result.returncode == 0
+    assert result.stdout.startswith("verbosity=0\n")
+
+
+def _raw_request(socket_path, request):
+    devnull = os.open(os.devnull, os.O_RDWR)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+            together_server._send_request(sock, request, [devnull] * 3)
+            return together_server._recv_reply(sock)
+    finally:
+        os.close(devnull)
+
+
+def test_server_survives_bad_requests(tmp_path, env, server):
+    _, socket_path = server
+    status, error = _raw_request(socket_path, {"argv": ["show"], "cwd": "/"})
+    assert status == 1
+    assert "KeyError('env')" in error
+
+    missing = str(tmp_path / "deleted")
+    request = {"argv": ["show"], "env": {}, "cwd": missing}
+    status, error = _raw_request(socket_path, request)
+    assert status == 1
+    assert "FileNotFoundError" in error
+
+    result = _client(env, socket_path, "show")
+    assert result.returncode == 0
+    assert result.stdout.startswith("verbosity=0\n")
+
+
+def test_client_falls_back_when_sending_fails(tmp_path, monkeypatch):
+    socket_path = str(tmp_path / "listening.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen()
+
+    def send_request(*args):
+        raise BrokenPipeError("server went away")
+
+    monkeypatch.setattr(together_server, "_send_request", send_request)
+    try:
+        result = together_server.run_client(socket_path, lambda: "fell back", argv=[])
+    finally:
+        listener.close()
+    assert result == "fell back"
+
+
+def test_client_fails_when_connection_drops_after_sending(tmp_path, capsys):
+    socket_path = str(tmp_path / "dropping.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen()
+
+    def accept_and_drop():
+        conn, _ = listener.accept()
+        conn.recv(1024)
+        conn.close()
+
+    fallbacks = []
+    thread = threading.Thread(target=accept_and_drop)
+    thread.start()
+    try:
+        with pytest.raises(SystemExit) as excinfo:
+            together_server.run_client(
+                socket_path, lambda: fallbacks.append(1), argv=[]
+            )
+    finally:
+        thread.join()
+        listener.close()
+    # the server may have run the command, so it is not run again
+    assert fallbacks == []
+    assert excinfo.value.code == 1
+    assert "connection lost before a reply" in capsys.readouterr().err
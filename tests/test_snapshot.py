@@ -0,0 +1,185 @@
+import click
+import pytest
+
+from together import (
+    LazySubcommandRegistration,
+    TogetherCLI,
+    discovery,
+    hook,
+    verbose_option,
+)
+from together.snapshot import CommandSnapshot
+
+HOOK_CALLS = []
+
+
+class BasePlugin:
+    @hook
+    def together_root_command(self, config):
+        HOOK_CALLS.append("root")
+
+        @click.group("mycli", context_settings={"help_option_names": ["-h", "--help"]})
+        @verbose_option
+        def mycli():
+            """A sample CLI."""
+
+        return mycli
+
+
+class SubcmdPlugin:
+    @hook
+    def together_subcommand(self, config):
+        HOOK_CALLS.append("subcommand")
+
+        @click.group("bar", short_help="Bar things.")
+        def bar():
+            pass
+
+        @click.command("foo")
+        @click.option("--format", type=click.Choice(["json", "text"]), help="Fmt.")
+        @click.option("--count", type=int, default=3, show_default=True)
+        @click.option("--color/--no-color", default=True)
+        @click.argument("names", nargs=-1)
+        def foo(format, count, color, names):
+            """Do foo things.
+
+            With a longer description."""
+
+        @click.command("secret", hidden=True)
+        def secret():
+            pass
+
+        return [
+            foo,
+            bar,
+            secret,
+            (foo, ["mycli", "bar"]),
+            LazySubcommandRegistration("lazy", "click:Command", short_help="Lazy."),
+        ]
+
+
+class MyCLI(TogetherCLI):
+    def register_plugins(self):
+        self.plugin_manager.register(BasePlugin())
+        self.plugin_manager.register(SubcmdPlugin())
+
+
+@pytest.fixture
+def snapshot_cli(tmp_path):
+    class SnapshotCLI(MyCLI):
+        snapshot_path = str(tmp_path / "snapshot.json")
+
+    HOOK_CALLS.clear()
+    return SnapshotCLI
+
+
+@pytest.mark.parametrize(
+    "line",
+    (
+        "mycli --help",
+        "mycli -h",
+        "mycli -v foo --help",
+        "mycli foo --format json --help",
+        "mycli bar --help",
+        "mycli bar foo --help",
+    ),
+)
+def test_help_matches_live_tree(snapshot_cli, run_cmd, capsys, line):
+    live_output = run_cmd(snapshot_cli(), line).output
+    HOOK_CALLS.clear()
+
+    with pytest.raises(SystemExit) as excinfo:
+        snapshot_cli.serve_help_from_snapshot(line.split()[1:], prog_name="mycli")
+    assert excinfo.value.code == 0
+    assert capsys.readouterr().out == live_output
+    assert HOOK_CALLS == []
+
+
+def test_call_writes_snapshot_only_for_help(snapshot_cli, run_cmd):
+    run_cmd(snapshot_cli(), "mycli foo")
+    assert snapshot_cli.load_snapshot() is None
+    run_cmd(snapshot_cli(), "mycli foo --help")
+    assert snapshot_cli.load_snapshot() is not None
+
+
+def test_unwritable_snapshot_path_renders_live_help(tmp_path, run_cmd):
+    (tmp_path / "file").write_text("")
+
+    class UnwritableCLI(MyCLI):
+        snapshot_path = str(tmp_path / "file" / "snapshot.json")
+
+    output = run_cmd(UnwritableCLI(), "mycli --help").output
+    assert output.startswith("Usage: mycli")
+    assert UnwritableCLI.load_snapshot() is None
+
+
+def test_unusable_snapshots_are_not_served(snapshot_cli, monkeypatch):
+    snapshot_cli().write_snapshot()
+    assert not snapshot_cli.serve_help_from_snapshot(["foo"])
+    # lazy commands which were never loaded cannot be described
+    assert not snapshot_cli.serve_help_from_snapshot(["lazy", "--help"])
+
+    monkeypatch.setattr(
+        snapshot_cli, "get_snapshot_fingerprint", classmethod(lambda cls: "changed")
+    )
+    assert snapshot_cli.load_snapshot() is None
+
+
+def test_list_subcommands():
+    cli = MyCLI()
+    snapshot = CommandSnapshot.from_command(cli.build(), "fp")
+    assert snapshot.list_subcommands(["mycli"]) == [
+        ("bar", "Bar things."),
+        ("foo", "Do foo things."),
+        ("lazy", "Lazy."),
+    ]
+    assert snapshot.list_subcommands(["mycli", "foo"]) is None
+    assert snapshot.list_subcommands(["mycli", "nosuchcmd"]) is None
+
+
+class EchoPlugin:
+    @hook
+    def together_subcommand(self, config):
+        @click.command("echo")
+        @click.option("--msg")
+        def echo(msg):
+            click.echo(f"msg={msg}")
+
+        return echo
+
+
+def test_option_value_named_like_help_is_not_help(snapshot_cli, run_cmd):
+    class EchoCLI(snapshot_cli):
+        def register_plugins(self):
+            super().register_plugins()
+            self.plugin_manager.register(EchoPlugin())
+
+    EchoCLI().write_snapshot()
+    assert EchoCLI.load_snapshot() is not None
+    for args in (["echo", "--msg", "--help"], ["echo", "--msg", "-h"]):
+        assert not EchoCLI.serve_help_from_snapshot(args)
+    assert not EchoCLI.serve_help_from_snapshot(["nosuchcommand", "--help"])
+    result = run_cmd(EchoCLI(), "mycli echo --msg --help")
+    assert result.output == "msg=--help\n"
+
+
+def test_snapshot_in_sys_path_directory(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    class PathCLI(MyCLI):
+        snapshot_path = str(tmp_path / "snapshot.json")
+        plugin_cache_path = str(tmp_path / "plugins.json")
+
+    PathCLI().write_snapshot()
+    assert PathCLI.load_snapshot() is not None
+    # installing a distribution there still changes the fingerprint
+    (tmp_path / "newdist-1.0.dist-info").mkdir()
+    assert PathCLI.load_snapshot() is None
+
+
+def test_fingerprint_without_plugin_cache_does_not_scan(snapshot_cli, monkeypatch):
+    def fail(group):
+        raise AssertionError("entrypoints were scanned")
+
+    monkeypatch.setattr(discovery, "scan_entrypoints", fail)
+    assert snapshot_cli.get_snapshot_fingerprint()
@@ -0,0 +1,152 @@
+import json
+
+import click
+import pytest
+from click.testing import CliRunner
+
+from together import CommandState, TogetherCLI, hook
+from together.click_tools import resolve_command_path
+from together.telemetry import (
+    TelemetryLog,
+    make_record,
+    make_stats_command,
+    percentile,
+    summarize,
+)
+
+
+class RootPlugin:
+    @hook
+    def together_root_command(self, config):
+        @click.group("mycli")
+        @click.option("--debug", is_flag=True)
+        def root(debug):
+            pass
+
+        return root
+
+    @hook
+    def together_subcommand(self, config):
+        return click.group("tools")(lambda: None)
+
+
+class ToolsPlugin:
+    @hook
+    def together_subcommand(self, config):
+        @click.command("fail")
+        def fail():
+            raise KeyError("x")
+
+        @click.command("ok")
+        @click.argument("value", required=False)
+        def ok(value):
+            pass
+
+        return [(fail, ["mycli", "tools"]), (ok, ["mycli", "tools"])]
+
+    @hook
+    def together_exception_handler(self, config):
+        def handle_keyerror(err):
+            return 5
+
+        return [(KeyError, handle_keyerror)]
+
+
+@pytest.fixture
+def telemetry_cli(tmp_path):
+    class MyCLI(TogetherCLI):
+        telemetry_path = str(tmp_path / "telemetry.log")
+
+        def register_plugins(self):
+            self.plugin_manager.register(RootPlugin(), name="root")
+            self.plugin_manager.register(ToolsPlugin(), name="tools")
+
+    return MyCLI
+
+
+def _records(cli):
+    return list(cli.get_telemetry_log().read())
+
+
+def test_invocations_are_recorded(telemetry_cli, monkeypatch):
+    monkeypatch.delenv("TOGETHER_TELEMETRY", raising=False)
+    cli = telemetry_cli()
+    for args in (["--debug", "tools", "ok", "val"], ["tools", "fail"]):
+        with pytest.raises(SystemExit):
+            cli(args, prog_name="mycli")
+
+    ok, fail = _records(cli)
+    assert ok["c"] == "mycli tools ok"
+    assert ok["p"] == "tools"
+    assert ok["x"] == 0 and ok["h"] is None
+    assert fail["c"] == "mycli tools fail"
+    assert fail["x"] == 5
+    assert fail["h"].endswith("handle_keyerror")
+    # construction is only counted for the first invocation
+    assert all(x["s"] >= 0 and x["b"] >= 0 for x in (ok, fail))
+
+
+def test_telemetry_is_off_by_default(tmp_path, monkeypatch):
+    monkeypatch.delenv("TOGETHER_TELEMETRY", raising=False)
+
+    class MyCLI(TogetherCLI):
+        def register_plugins(self):
+            self.plugin_manager.register(RootPlugin(), name="root")
+
+    assert MyCLI().get_telemetry_log() is None
+
+
+def test_rotation(tmp_path):
+    log = TelemetryLog(str(tmp_path / "t.log"), max_bytes=200, backups=2)
+    for i in range(20):
+        log.append(make_record(f"cmd {i}", None, 0.001, 0.002, 0))
+    assert not (tmp_path / "t.log.3").exists()
+    commands = [x["c"] for x in log.read()]
+    # older records were dropped, and the rest are in order
+    assert commands == sorted(commands, key=lambda x: int(x.split()[1]))
+    assert commands[-1] == "cmd 19"
+    assert len(commands) < 20
+
+
+def test_resolve_command_path_skips_callbacks():
+    calls = []
+
+    @click.group("root")
+    @click.option("--opt", callback=lambda ctx, param, value: calls.append(value))
+    def root(opt):
+        pass
+
+    @root.command("leaf")
+    def leaf():
+        pass
+
+    assert resolve_command_path(root, ["--opt", "x", "leaf"]) == ("root", "leaf")
+    assert resolve_command_path(root, ["missing"]) == ("root",)
+    assert resolve_command_path(root, ["--bad"]) == ("root",)
+    assert calls == []
+
+
+def test_percentiles_and_summary():
+    assert percentile([1, 2, 3, 4], 50) == 2
+    assert percentile([1, 2, 3, 4], 99) == 4
+    records = [make_record("a", "p1", 0.001, i / 1000, 0) for i in range(1, 11)]
+    records.append(make_record("b", "p1", 0.001, 0.001, 2))
+    rows = summarize(records)
+    assert [x["command"] for x in rows] == ["a", "b"]
+    assert rows[0]["count"] == 10
+    assert rows[0]["p50_ms"] == 6
+    assert rows[1]["errors"] == 1
+    assert summarize(records, by="plugin")[0]["count"] == 11
+
+
+def test_stats_command(tmp_path):
+    log = TelemetryLog(str(tmp_path / "t.log"))
+    log.append(make_record("mycli foo", "plug", 0.010, 0.005, 0))
+    stats = make_stats_command(str(tmp_path / "t.log"))
+    result = CliRunner().invoke(
+        stats, ["--format", "ndjson", "--by", "plugin"], obj=CommandState()
+    )
+    assert result.exit_code == 0, result.output
+    row = json.loads(result.output)
+    assert row["plugin"] == "plug"
+    assert row["p50_ms"] == 15
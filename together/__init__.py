@@ -1,13 +1,77 @@
-from together.core import TogetherCLI, hook
-from together.registration import SubcommandRegistration
-from together.state import CommandState, get_state, get_verbosity, verbose_option
+"""
+Build CLIs which `click` `together` using `pluggy`.
+
+Names other than `hook` are imported on first access (PEP 562), so that plugin
+modules which only need `together.hook` do not import `click` and the rest of
+`together` when they are imported.
+"""
+
+import importlib
+
+from together.hookspec import hook
+
+_LAZY_EXPORTS = {
+    "LazyConfig": "together.lazy_config",
+    "LazySubcommandRegistration": "together.registration",
+    "Resource": "together.resources",
+    "SubcommandRegistration": "together.registration",
+    "TogetherCLI": "together.core",
+    "CommandState": "together.state",
+    "get_state": "together.state",
+    "get_resource": "together.state",
+    "get_verbosity": "together.state",
+    "verbose_option": "together.state",
+    "configure_logging": "together.state",
+    "lazy_format": "together.state",
+    "ContextExecutor": "together.propagation",
+    "StateSnapshot": "together.propagation",
+    "capture_context": "together.propagation",
+    "create_task": "together.propagation",
+    "run_in_thread": "together.propagation",
+    "format_option": "together.output",
+    "cache_option": "together.result_cache",
+    "memoize": "together.result_cache",
+    "get_output_format": "together.output",
+    "write_records": "together.output",
+}
 
 __all__ = (
+    "LazyConfig",
+    "LazySubcommandRegistration",
+    "Resource",
     "SubcommandRegistration",
     "TogetherCLI",
     "hook",
     "CommandState",
     "get_state",
+    "get_resource",
     "get_verbosity",
     "verbose_option",
+    "configure_logging",
+    "lazy_format",
+    "ContextExecutor",
+    "StateSnapshot",
+    "capture_context",
+    "create_task",
+    "run_in_thread",
+    "format_option",
+    "cache_option",
+    "memoize",
+    "get_output_format",
+    "write_records",
 )
+
+
+def __getattr__(name):
+    try:
+        modname = _LAZY_EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module 'together' has no attribute '{name}'") from None
+    value = getattr(importlib.import_module(modname), name)
+    # cache the value so that later lookups do not call __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
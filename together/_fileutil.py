@@ -0,0 +1,24 @@
+"""
+Helpers for the files which `together` keeps (caches, snapshots, results)
+"""
+
+import os
+import tempfile
+
+
+def atomic_write(path, data, dir_mode=0o777):
+    """
+    Write `data` (bytes) to `path`, creating missing directories with
+    `dir_mode`. The data is written to a tempfile which is then renamed, so
+    that concurrent readers never see a partially written file.
+    """
+    dirname = os.path.dirname(path) or "."
+    os.makedirs(dirname, mode=dir_mode, exist_ok=True)
+    fd, tmppath = tempfile.mkstemp(dir=dirname, prefix=".together-")
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(data)
+        os.replace(tmppath, path)
+    except BaseException:
+        os.unlink(tmppath)
+        raise
@@ -0,0 +1,80 @@
+"""
+Support for asyncio commands
+
+Command callbacks (for the root, groups, and leaf commands) may be coroutine
+functions. `together` wraps them so that click can call them normally, and
+runs them to completion on one event loop per invocation, owned by
+`TogetherCLI.__call__`. Since every callback in an invocation runs on the same
+loop, a group callback can create async resources (e.g. a client session) for
+its subcommands to use.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import inspect
+
+import click
+
+# the TogetherCLI whose event loop should be used for the current invocation
+_loop_owner = contextvars.ContextVar("together_loop_owner", default=None)
+
+
+def run_coroutine(coro):
+    """
+    Run a coroutine to completion on the event loop of the current invocation,
+    or on a new event loop if there is no current invocation
+    """
+    owner = _loop_owner.get()
+    if owner is None:
+        return asyncio.run(coro)
+    return owner.get_event_loop().run_until_complete(coro)
+
+
+@contextlib.contextmanager
+def loop_owner_scope(owner):
+    """Make `owner` provide the event loop for the duration of the block"""
+    token = _loop_owner.set(owner)
+    try:
+        yield
+    finally:
+        _loop_owner.reset(token)
+
+
+def _wrap(func):
+    # look through decorators like `click.pass_context`, which wrap a coroutine
+    # function in a plain function that returns the coroutine
+    if func is None or getattr(func, "_together_async_wrapper", False):
+        return func
+    if not asyncio.iscoroutinefunction(inspect.unwrap(func)):
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return run_coroutine(func(*args, **kwargs))
+
+    wrapper._together_async_wrapper = True
+    return wrapper
+
+
+def wrap_async_callbacks(cmd):
+    """
+    Replace coroutine function callbacks on `cmd` and, for click Groups, all of
+    its subcommands, with synchronous wrappers which call `run_coroutine`
+
+    Lazy commands which have not been loaded are skipped, and wrap their
+    commands when they load.
+    """
+    # imported here, as together.registration imports this module
+    from together.registration import LazyCommand
+
+    if isinstance(cmd, LazyCommand):
+        if cmd.is_loaded:
+            wrap_async_callbacks(cmd.load())
+        return
+    cmd.callback = _wrap(cmd.callback)
+    if isinstance(cmd, click.MultiCommand):
+        cmd.result_callback = _wrap(cmd.result_callback)
+    for subcmd in getattr(cmd, "commands", {}).values():
+        wrap_async_callbacks(subcmd)
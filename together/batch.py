@@ -0,0 +1,192 @@
+"""
+Run many invocations of a TogetherCLI from one built command tree
+
+Input is one invocation per line, either as a shell-quoted command line
+(without the program name) or as an NDJSON record: a JSON list of arguments or
+an object with an "args" list. Blank lines and lines starting with "#" are
+skipped.
+
+Each invocation gets a fresh CommandState and its own captured stdout, stderr,
+and exit status. Invocations can be spread across a pool of worker processes,
+each of which builds the CLI once.
+
+    python -m together.batch mypackage.cli:MyCLI commands.txt --workers 4
+
+Results are written as NDJSON, in input order. A line which cannot be parsed
+gets a result with exit status 2 and the error on stderr, and the rest of the
+batch still runs.
+"""
+
+import collections
+import json
+import multiprocessing
+import multiprocessing.util
+import shlex
+
+import click
+from click.testing import CliRunner
+
+from together.discovery import load_entrypoint_value
+
+BatchResult = collections.namedtuple(
+    "BatchResult", ["index", "args", "exit_code", "stdout", "stderr"]
+)
+
+
+# the exit status of lines which could not be parsed, as for click usage errors
+PARSE_ERROR_EXIT_CODE = 2
+
+
+class BatchParseError(ValueError):
+    """A line of batch input could not be parsed"""
+
+
+def parse_batch_line(line):
+    """
+    Parse one line of batch input into a list of arguments, or None if the
+    line should be skipped
+
+    Raises a BatchParseError if the line is malformed.
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if line[0] in "[{":
+        try:
+            record = json.loads(line)
+        except ValueError as err:
+            raise BatchParseError(f"invalid JSON record: {err}") from err
+        if isinstance(record, dict):
+            if "args" not in record:
+                raise BatchParseError(f"batch record has no 'args': {line}")
+            args = record["args"]
+        else:
+            args = record
+        if not isinstance(args, list) or not all(isinstance(x, str) for x in args):
+            raise BatchParseError(f"batch records must hold a list of strings: {line}")
+        return args
+    try:
+        return shlex.split(line)
+    except ValueError as err:
+        raise BatchParseError(f"could not split line: {err}") from err
+
+
+def parse_batch_input(lines):
+    """
+    Yield the arguments of each invocation in `lines`. Lines which cannot be
+    parsed yield a BatchParseError (rather than raising it), so that a batch
+    can report them and continue.
+    """
+    for lineno, line in enumerate(lines, 1):
+        try:
+            args = parse_batch_line(line)
+        except BatchParseError as err:
+            yield BatchParseError(f"line {lineno}: {err}")
+            continue
+        if args is not None:
+            yield args
+
+
+def run_captured(cli, args, index=0):
+    """
+    Run one invocation of `cli`, capturing its output, as a BatchResult
+
+    If `args` is a BatchParseError, the result reports it instead.
+    """
+    if isinstance(args, BatchParseError):
+        return BatchResult(index, None, PARSE_ERROR_EXIT_CODE, "", f"{args}\n")
+    runner = CliRunner(mix_stderr=False)
+    with runner.isolation() as (stdout, stderr):
+        exit_code = cli.run_for_exit_code(args)
+        return BatchResult(
+            index,
+            list(args),
+            exit_code,
+            stdout.getvalue().decode(errors="replace"),
+            stderr.getvalue().decode(errors="replace"),
+        )
+
+
+def load_cli(target):
+    """Load a TogetherCLI from a "module:attribute" string naming a subclass
+    or instance"""
+    obj = load_entrypoint_value(target)
+    return obj() if isinstance(obj, type) else obj
+
+
+# each worker process builds its own CLI once, in the pool initializer
+_worker_cli = None
+
+
+def _init_worker(target):
+    global _worker_cli
+    _worker_cli = load_cli(target)
+    _worker_cli.build()
+    # close persistent resources when the worker exits, as the sequential path
+    # does when the batch finishes
+    multiprocessing.util.Finalize(
+        _worker_cli, _worker_cli.close_resources, exitpriority=10
+    )
+
+
+def _run_in_worker(item):
+    index, args = item
+    return run_captured(_worker_cli, args, index)
+
+
+def run_batch(cli, argvs, workers=0, target=None, chunksize=16):
+    """
+    Run each list of arguments in `argvs` and yield BatchResults in order.
+    Items of `argvs` which are BatchParseErrors produce error results.
+
+    With `workers`, invocations run in a pool of that many processes. Workers
+    construct their own CLI from `target` (a "module:attribute" string), which
+    defaults to the class of `cli`.
+    """
+    if not workers:
+        cli.build()
+        try:
+            for index, args in enumerate(argvs):
+                yield run_captured(cli, args, index)
+        finally:
+            cli.close_resources()
+        return
+
+    if target is None:
+        cls = type(cli)
+        target = f"{cls.__module__}:{cls.__qualname__}"
+    with multiprocessing.Pool(
+        workers, initializer=_init_worker, initargs=(target,)
+    ) as pool:
+        yield from pool.imap(_run_in_worker, enumerate(argvs), chunksize=chunksize)
+        # let workers exit normally, so that they close their resources, rather
+        # than being terminated when the pool is left
+        pool.close()
+        pool.join()
+
+
+@click.command("batch")
+@click.option(
+    "--workers", default=0, show_default=True, help="Worker processes to use."
+)
+@click.argument("target")
+@click.argument("input", type=click.File("r"), default="-")
+def main(workers, target, input):
+    """
+    Run the TogetherCLI TARGET ("module:attribute") once for each line of INPUT
+    (default: stdin), and write the results as NDJSON. Exits with status 1 if
+    any invocation failed.
+    """
+    cli = load_cli(target)
+    failed = False
+    for result in run_batch(
+        cli, parse_batch_input(input), workers=workers, target=target
+    ):
+        failed = failed or result.exit_code != 0
+        click.echo(json.dumps(result._asdict()))
+    if failed:
+        raise click.exceptions.Exit(1)
+
+
+if __name__ == "__main__":
+    main()
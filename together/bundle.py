@@ -0,0 +1,192 @@
+"""
+Build a TogetherCLI and its plugins into a single-file zipapp
+
+Starting a CLI from a large environment (especially on a network filesystem)
+spends much of its time resolving imports across `sys.path` and reading
+distribution metadata to find plugins. A bundle contains:
+
+- the modules of the CLI, its entrypoint plugins, `together`, `click`,
+  `pluggy`, and any other modules named with `include`, as bytecode
+- a registry of the plugin entry points found at build time, which replaces
+  the entry point scan when the bundle runs
+
+The archive is stored uncompressed, so that imports from it are cheap.
+Bytecode is specific to the python version which built the bundle, and the
+bundle refuses to run on any other version.
+
+Only pure python modules can be bundled. Modules which plugins import (other
+than those listed above) must be named with `include`.
+"""
+
+import importlib.machinery
+import importlib.util
+import os
+import py_compile
+import shutil
+import sys
+import tempfile
+import zipapp
+
+import click
+
+from together.discovery import load_entrypoint_value, scan_entrypoints
+
+# modules needed by every bundle
+BASE_MODULES = ("together", "click", "pluggy")
+
+_REGISTRY_MODULE = "_together_registry"
+
+_MAIN_TEMPLATE = """\
+import importlib.util
+import sys
+
+if importlib.util.MAGIC_NUMBER != {magic!r}:
+    sys.exit("this bundle was built for python {version} and cannot run here")
+
+import {registry}
+from together.discovery import freeze_entrypoints, load_entrypoint_value
+
+for group, records in {registry}.ENTRYPOINTS.items():
+    freeze_entrypoints(group, records)
+
+cli = load_entrypoint_value({target!r})
+if isinstance(cli, type):
+    cli = cli()
+cli(prog_name={prog_name!r})
+"""
+
+
+class BundleError(ValueError):
+    """A bundle could not be built from the current environment"""
+
+
+def _top_level(value):
+    return value.split(":")[0].split(".")[0].strip()
+
+
+def _module_files(name):
+    """
+    Yield (source path, archive path) pairs for all of the files of the
+    top-level module or package `name`
+    """
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise BundleError(f"cannot find module '{name}'")
+
+    if not spec.submodule_search_locations:
+        if not spec.origin or not spec.origin.endswith(".py"):
+            raise BundleError(f"'{name}' is not a pure python module")
+        yield spec.origin, f"{name}.py"
+        return
+
+    for location in spec.submodule_search_locations:
+        for dirpath, dirnames, filenames in os.walk(location):
+            dirnames[:] = sorted(x for x in dirnames if x != "__pycache__")
+            reldir = os.path.relpath(dirpath, location)
+            for filename in sorted(filenames):
+                if filename.endswith(tuple(importlib.machinery.EXTENSION_SUFFIXES)):
+                    raise BundleError(
+                        f"'{name}' contains an extension module, {filename}, "
+                        "which cannot be imported from a bundle"
+                    )
+                if filename.endswith(".pyc"):
+                    continue
+                arcname = os.path.normpath(os.path.join(name, reldir, filename))
+                yield os.path.join(dirpath, filename), arcname
+
+
+def _stage_module(name, staging):
+    for src, arcname in _module_files(name):
+        dest = os.path.join(staging, arcname)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if src.endswith(".py"):
+            # zipimport loads `module.pyc` files sitting beside (or instead of)
+            # their sources. Unchecked hashes skip comparing against the source
+            py_compile.compile(
+                src,
+                cfile=dest + "c",
+                dfile=arcname,
+                doraise=True,
+                invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+            )
+        else:
+            shutil.copyfile(src, dest)
+
+
+def build_bundle(
+    target,
+    output,
+    *,
+    include=(),
+    prog_name=None,
+    interpreter="/usr/bin/env python3",
+):
+    """
+    Build a zipapp at `output` which runs `target`, a "module:attribute" string
+    naming a TogetherCLI subclass or instance
+
+    Returns the sorted list of top-level modules in the bundle.
+    """
+    cli = load_entrypoint_value(target)
+    group = cli.entrypoint_group
+    records = scan_entrypoints(group)
+    modules = set(BASE_MODULES) | set(include) | {_top_level(target)}
+    modules.update(_top_level(record.value) for record in records)
+
+    with tempfile.TemporaryDirectory() as staging:
+        for name in sorted(modules):
+            _stage_module(name, staging)
+
+        with open(os.path.join(staging, f"{_REGISTRY_MODULE}.py"), "w") as fp:
+            fp.write('"""Entry points found when this bundle was built"""\n\n')
+            fp.write(f"ENTRYPOINTS = {{{group!r}: {[tuple(x) for x in records]!r}}}\n")
+        with open(os.path.join(staging, "__main__.py"), "w") as fp:
+            fp.write(
+                _MAIN_TEMPLATE.format(
+                    magic=importlib.util.MAGIC_NUMBER,
+                    version="{}.{}".format(*sys.version_info),
+                    registry=_REGISTRY_MODULE,
+                    target=target,
+                    prog_name=prog_name,
+                )
+            )
+        zipapp.create_archive(staging, output, interpreter=interpreter)
+    return sorted(modules)
+
+
+@click.command("bundle")
+@click.option("-o", "--output", required=True, help="The path of the bundle to write.")
+@click.option(
+    "--include",
+    multiple=True,
+    help="An additional top-level module to bundle. May be repeated.",
+)
+@click.option("--prog-name", help="The program name to use in help and errors.")
+@click.option(
+    "--python",
+    "interpreter",
+    default="/usr/bin/env python3",
+    show_default=True,
+    help="The interpreter for the bundle's shebang line.",
+)
+@click.argument("target")
+def main(output, include, prog_name, interpreter, target):
+    """
+    Bundle the TogetherCLI TARGET ("module:attribute"), its entrypoint
+    plugins, and their dependencies into a single executable file.
+    """
+    try:
+        modules = build_bundle(
+            target,
+            output,
+            include=include,
+            prog_name=prog_name,
+            interpreter=interpreter,
+        )
+    except BundleError as err:
+        raise click.ClickException(str(err))
+    click.echo(f"wrote {output} with modules: {', '.join(modules)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import click
 
+from together.registration import CommandRegistrationError, LazyCommand
+
 
 def _recursive_traverse_click(cur, path, parent_ctx=None):
     if not path:
@@ -18,3 +20,158 @@ def traverse_click(root_cmd, path):
             f"but path started with {path[0]}"
         )
     return _recursive_traverse_click(root_cmd, path[1:])
+
+
+class CommandIndex:
+    """
+    An index of the commands in a click command tree, keyed by their paths.
+
+    Paths are tuples of command names starting with the root name, as in
+    SubcommandRegistration paths. Commands are looked up from the tree (via
+    `get_command`) only the first time their path is requested, and commands
+    attached through the index are recorded without any lookup, so finding the
+    parent for a registration does not require walking the tree from the root.
+    """
+
+    def __init__(self, root_cmd):
+        self.root = root_cmd
+        self._commands = {(root_cmd.name,): root_cmd}
+        self._contexts = {}
+
+    def _context(self, path):
+        if path not in self._contexts:
+            parent_ctx = self._context(path[:-1]) if len(path) > 1 else None
+            self._contexts[path] = click.Context(
+                self._commands[path], info_name=path[-1], parent=parent_ctx
+            )
+        return self._contexts[path]
+
+    def lookup(self, path):
+        """Get the command at `path`, or None if there is no such command"""
+        path = tuple(path)
+        if path in self._commands:
+            return self._commands[path]
+        if len(path) < 2:
+            return None
+
+        parent = self.lookup(path[:-1])
+        if not isinstance(parent, click.MultiCommand):
+            return None
+        cmd = parent.get_command(self._context(path[:-1]), path[-1])
+        if cmd is not None:
+            self._commands[path] = cmd
+        return cmd
+
+    def attach(self, cmd, path=None):
+        """
+        Attach `cmd` to the group at `path` (the root, if omitted), record it
+        in the index, and return its full path.
+
+        Raises a CommandRegistrationError if the path does not lead to a group
+        or if the group already has a command with the same name.
+        """
+        path = tuple(path) if path else (self.root.name,)
+        pathstr = " ".join(path)
+        if path[0] != self.root.name:
+            raise CommandRegistrationError(
+                [
+                    f"cannot attach '{cmd.name}': expected path to start with the "
+                    f"root name, {self.root.name}, but path was '{pathstr}'"
+                ]
+            )
+
+        parent = self.lookup(path)
+        if parent is None:
+            raise CommandRegistrationError(
+                [f"cannot attach '{cmd.name}': no command found at '{pathstr}'"]
+            )
+        if not isinstance(parent, click.MultiCommand) or not hasattr(
+            parent, "add_command"
+        ):
+            raise CommandRegistrationError(
+                [f"cannot attach '{cmd.name}': '{pathstr}' is not a group"]
+            )
+        if self.lookup(path + (cmd.name,)) is not None:
+            raise CommandRegistrationError(
+                [
+                    f"cannot attach '{cmd.name}': '{pathstr}' already has a "
+                    f"command named '{cmd.name}'"
+                ]
+            )
+
+        parent.add_command(cmd)
+        self._commands[path + (cmd.name,)] = cmd
+        return path + (cmd.name,)
+
+    def detach(self, path):
+        """
+        Remove the command at `path` (a full path, including its name) from its
+        parent group, and remove it and everything below it from the index.
+        Returns the removed command.
+
+        Raises a CommandRegistrationError if there is no such command, or its
+        parent does not keep its commands in a `commands` dict (as
+        `click.Group` does).
+        """
+        path = tuple(path)
+        pathstr = " ".join(path)
+        if len(path) < 2:
+            raise CommandRegistrationError([f"cannot detach the root, '{pathstr}'"])
+        cmd = self.lookup(path)
+        if cmd is None:
+            raise CommandRegistrationError(
+                [f"cannot detach '{pathstr}': no command found"]
+            )
+        parent = self.lookup(path[:-1])
+        if isinstance(parent, LazyCommand):
+            parent = parent.load()
+        commands = getattr(parent, "commands", None)
+        if not isinstance(commands, dict) or commands.get(path[-1]) is not cmd:
+            raise CommandRegistrationError(
+                [
+                    f"cannot detach '{pathstr}': '{' '.join(path[:-1])}' does "
+                    "not store its commands in a dict"
+                ]
+            )
+
+        del commands[path[-1]]
+        for cache in (self._commands, self._contexts):
+            for key in [x for x in cache if x[: len(path)] == path]:
+                del cache[key]
+        return cmd
+
+
+def resolve_command_path(root_cmd, args):
+    """
+    Find the path (a tuple of command names, starting with the root name) of
+    the command which `args` would invoke
+
+    Arguments are parsed without running parameter callbacks or loading lazy
+    commands. Resolution stops at the last command which could be found.
+    """
+    path = (root_cmd.name,)
+    cmd = root_cmd
+    parent_ctx = None
+    args = list(args)
+    while isinstance(cmd, click.MultiCommand):
+        if isinstance(cmd, LazyCommand):
+            if not cmd.is_loaded:
+                break
+            cmd = cmd.load()
+            continue
+        ctx = click.Context(
+            cmd, info_name=path[-1], parent=parent_ctx, resilient_parsing=True
+        )
+        try:
+            _opts, rest, _order = cmd.make_parser(ctx).parse_args(args=args)
+            if not rest:
+                break
+            name, subcmd, args = cmd.resolve_command(ctx, rest)
+        except click.UsageError:
+            break
+        if subcmd is None:
+            break
+        path += (name,)
+        cmd = subcmd
+        parent_ctx = ctx
+    return path
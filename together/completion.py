@@ -0,0 +1,76 @@
+"""
+Shell completion served from a command tree snapshot
+
+Click's shell completion runs the program with an environment variable set,
+which normally means loading all plugins and building the whole CLI for every
+completion request. Completion of command and option names only needs the
+structure of the tree, so it can be answered from a snapshot instead.
+Parameters with dynamic (callback-driven) completions still need the live
+tree, and requests for those fall back to the full build.
+"""
+
+import os
+import sys
+
+from together.snapshot import SnapshotMiss
+
+
+class LiveCompletionRequired(Exception):
+    """Raised when completion requires a callback from the live command tree"""
+
+
+def _require_live_tree(ctx, args, incomplete):
+    raise LiveCompletionRequired()
+
+
+def _mark_dynamic(param, desc):
+    if desc["dynamic"]:
+        param.autocompletion = _require_live_tree
+
+
+def get_prog_name(prog_name=None):
+    """Get the program name in the same way as `click.BaseCommand.main`"""
+    if prog_name is None:
+        prog_name = os.path.basename(sys.argv[0] if sys.argv else __file__)
+    return prog_name
+
+
+def get_complete_var(prog_name, complete_var=None):
+    """Get the name of the environment variable click uses to request
+    completion"""
+    if complete_var is None:
+        complete_var = "_{}_COMPLETE".format(prog_name.replace("-", "_").upper())
+    return complete_var
+
+
+def completion_requested(prog_name=None, complete_var=None):
+    prog_name = get_prog_name(prog_name)
+    return bool(os.environ.get(get_complete_var(prog_name, complete_var)))
+
+
+def serve_completion(snapshot, prog_name=None, complete_var=None):
+    """
+    If shell completion was requested, answer it from `snapshot` and exit.
+
+    Returns False if completion was not requested or could not be answered
+    from the snapshot.
+    """
+    prog_name = get_prog_name(prog_name)
+    complete_var = get_complete_var(prog_name, complete_var)
+    complete_instr = os.environ.get(complete_var)
+    if not complete_instr:
+        return False
+
+    # click imports its completion module only when completing, do the same
+    from click._bashcomplete import bashcomplete
+
+    skeleton = snapshot.to_click(param_hook=_mark_dynamic)
+    try:
+        handled = bashcomplete(skeleton, prog_name, complete_var, complete_instr)
+    except (LiveCompletionRequired, SnapshotMiss):
+        return False
+    if not handled:
+        return False
+    # exit in the same way as click does after handling completion
+    sys.stdout.flush()
+    sys.exit(1)
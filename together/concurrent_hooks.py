@@ -0,0 +1,244 @@
+"""
+Concurrent execution of hook implementations
+
+pluggy calls hook implementations one after another. When implementations
+spend their time waiting on I/O, running them on a thread pool can shorten
+startup. Results are always collected in the order pluggy would have produced
+them (LIFO), so the FIFO registration order which `together` derives from them
+is unchanged.
+
+Because implementations run at the same time, they cannot see each other's
+changes to the config. Each `together_configure` implementation writes to its
+own view of the config, and the writes are merged afterwards. Two
+implementations writing the same top-level key is an error. Lazy values
+registered with `register_lazy` count as writes.
+"""
+
+import collections.abc
+import contextlib
+
+
+class ConfigConflictError(ValueError):
+    """Raised when concurrent configure hooks write the same config keys"""
+
+
+class ConfigWriteRecorder(collections.abc.MutableMapping):
+    """
+    A view of a config mapping which records writes and deletions of top-level
+    keys rather than applying them
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.writes = {}
+        self.lazy = {}
+        self.deletes = set()
+
+    def __getitem__(self, key):
+        if key in self.writes:
+            return self.writes[key]
+        if key in self.lazy:
+            # not memoized, as the provider is only registered with the real
+            # config after all hooks finish
+            return self.lazy[key]()
+        if key in self.deletes:
+            raise KeyError(key)
+        return self.base[key]
+
+    def __setitem__(self, key, value):
+        self.deletes.discard(key)
+        self.lazy.pop(key, None)
+        self.writes[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.writes.pop(key, None)
+        self.lazy.pop(key, None)
+        self.deletes.add(key)
+
+    def __contains__(self, key):
+        if key in self.writes or key in self.lazy:
+            return True
+        return key not in self.deletes and key in self.base
+
+    def __iter__(self):
+        for key in self.base:
+            if key not in self.deletes and key not in self.writes:
+                if key not in self.lazy:
+                    yield key
+        yield from self.writes
+        yield from self.lazy
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def register_lazy(self, key, provider):
+        if not hasattr(self.base, "register_lazy"):
+            raise AttributeError(
+                f"{type(self.base).__name__} does not support register_lazy"
+            )
+        self.deletes.discard(key)
+        self.writes.pop(key, None)
+        self.lazy[key] = provider
+
+    @property
+    def touched(self):
+        return set(self.writes) | set(self.lazy) | self.deletes
+
+
+def _is_wrapper(impl):
+    return getattr(impl, "hookwrapper", False) or getattr(impl, "wrapper", False)
+
+
+def _has_wrappers(impls):
+    return any(_is_wrapper(impl) for impl in impls)
+
+
+def _call_impls(impls, executor, kwargs_for):
+    # pluggy calls implementations in reverse registration order
+    ordered = list(reversed(impls))
+    futures = [
+        executor.submit(
+            impl.function, *[kwargs_for(impl)[name] for name in impl.argnames]
+        )
+        for impl in ordered
+    ]
+    # collect every result before raising, so that no implementation is left
+    # running, then raise the first error in call order
+    for future in futures:
+        future.exception()
+    return ordered, [future.result() for future in futures]
+
+
+def _return_none(*args):
+    return None
+
+
+@contextlib.contextmanager
+def _replaced_functions(impls, make_function):
+    # swap each implementation's function for the duration of a hook call, as
+    # the profiler does permanently, so that one call through pluggy can be
+    # attributed to plugins
+    originals = [(impl, impl.function) for impl in impls]
+    for impl, function in originals:
+        impl.function = make_function(impl, function)
+    try:
+        yield
+    finally:
+        for impl, function in originals:
+            impl.function = function
+
+
+def call_plugin_hook(plugin_manager, hookname, plugin_name, **kwargs):
+    """
+    Call the implementations of `hookname` of the plugin registered as
+    `plugin_name`, through pluggy (so that hook call monitoring and tracing
+    apply), and return their non-None results in pluggy's order
+    """
+    hook_caller = getattr(plugin_manager.hook, hookname)
+    others = [
+        impl
+        for impl in hook_caller.get_hookimpls()
+        if impl.plugin_name != plugin_name and not _is_wrapper(impl)
+    ]
+    # other plugins' implementations return None, which pluggy leaves out of
+    # the results
+    with _replaced_functions(others, lambda impl, function: _return_none):
+        return hook_caller(**kwargs)
+
+
+def call_hook_per_plugin(plugin_manager, hookname, executor=None, **kwargs):
+    """
+    Call a (non-firstresult) hook and return (plugin name, result) pairs in
+    pluggy's order. With an `executor`, implementations run on it.
+
+    Without an `executor`, the hook is called once through pluggy. Hooks with
+    wrapper implementations are called normally, and their results are
+    attributed to a plugin name of None.
+    """
+    hook_caller = getattr(plugin_manager.hook, hookname)
+    impls = hook_caller.get_hookimpls()
+    if _has_wrappers(impls):
+        return [(None, x) for x in hook_caller(**kwargs)]
+    if executor is not None:
+        return _call_per_plugin_concurrently(impls, executor, kwargs)
+
+    results = []
+
+    def make_function(impl, function):
+        def record(*args):
+            result = function(*args)
+            if result is not None:
+                results.append((impl.plugin_name, result))
+            return result
+
+        return record
+
+    with _replaced_functions(impls, make_function):
+        hook_caller(**kwargs)
+    return results
+
+
+def _call_per_plugin_concurrently(impls, executor, kwargs):
+    ordered, results = _call_impls(impls, executor, lambda impl: kwargs)
+    return [
+        (impl.plugin_name, result)
+        for impl, result in zip(ordered, results)
+        if result is not None
+    ]
+
+
+def call_hook_concurrently(hook_caller, executor, **kwargs):
+    """
+    Call a (non-firstresult) hook, running its implementations on `executor`,
+    and return the results in pluggy's order
+
+    Hooks with wrapper implementations are called normally.
+    """
+    impls = hook_caller.get_hookimpls()
+    if _has_wrappers(impls):
+        return hook_caller(**kwargs)
+    return [x for _, x in _call_per_plugin_concurrently(impls, executor, kwargs)]
+
+
+def configure_concurrently(hook_caller, config, executor):
+    """
+    Call `together_configure` implementations on `executor`, giving each one
+    a ConfigWriteRecorder, and merge their writes into `config`
+
+    Raises a ConfigConflictError if implementations wrote the same keys.
+    Configs which are not mutable mappings, and hooks with wrapper
+    implementations, are configured sequentially instead.
+    """
+    impls = hook_caller.get_hookimpls()
+    if _has_wrappers(impls) or not isinstance(config, collections.abc.MutableMapping):
+        return hook_caller(config=config)
+
+    recorders = {impl.plugin_name: ConfigWriteRecorder(config) for impl in impls}
+    ordered, _results = _call_impls(
+        impls, executor, lambda impl: {"config": recorders[impl.plugin_name]}
+    )
+
+    owners = {}
+    conflicts = []
+    for impl in ordered:
+        for key in sorted(recorders[impl.plugin_name].touched, key=repr):
+            if key in owners:
+                conflicts.append(
+                    f"config key {key!r} was written by both "
+                    f"'{owners[key]}' and '{impl.plugin_name}'"
+                )
+            owners[key] = impl.plugin_name
+    if conflicts:
+        raise ConfigConflictError("\n".join(conflicts))
+
+    for impl in ordered:
+        recorder = recorders[impl.plugin_name]
+        for key in recorder.deletes:
+            # not `pop`, which would compute a lazy value only to discard it
+            if key in config:
+                del config[key]
+        config.update(recorder.writes)
+        for key, provider in recorder.lazy.items():
+            config.register_lazy(key, provider)
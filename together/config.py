@@ -0,0 +1,204 @@
+"""
+Layered config files, loaded into the config object before `together_configure`
+
+Config files are read from three layers, with later layers taking precedence:
+
+- system: /etc/<app>/config.<ext>
+- user: $XDG_CONFIG_HOME/<app>/config.<ext> (default ~/.config)
+- project: .<app>.<ext> in the working directory or its nearest ancestor
+
+where <ext> is one of "toml", "ini", "cfg", or "json". Each file holds a table
+of sections. Plugins declare the sections they read with the
+`together_config_sections` hook, and only those sections are copied into the
+config.
+
+Parsed files are cached in memory and, optionally, in a JSON file, keyed on
+path, mtime, and size, so an unchanged file is parsed once.
+"""
+
+import configparser
+import copy
+import json
+import os
+import sys
+
+from together._fileutil import atomic_write
+
+CONFIG_EXTENSIONS = ("toml", "ini", "cfg", "json")
+
+# parsed files for this process, keyed by (path, mtime_ns, size)
+_parsed_files = {}
+
+
+class ConfigFileError(ValueError):
+    """A config file could not be read or parsed"""
+
+
+def _parse_toml(text):
+    if sys.version_info >= (3, 11):
+        import tomllib
+    else:  # pragma: no cover
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise ConfigFileError(
+                "reading TOML config files requires 'tomli' on python < 3.11"
+            )
+    return tomllib.loads(text)
+
+
+def _parse_ini(text):
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.read_string(text)
+    return {name: dict(parser.items(name)) for name in parser.sections()}
+
+
+_PARSERS = {
+    "toml": _parse_toml,
+    "ini": _parse_ini,
+    "cfg": _parse_ini,
+    "json": json.loads,
+}
+
+
+def parse_config_file(path):
+    """Parse a config file into a dict of sections, based on its extension"""
+    ext = os.path.splitext(path)[1].lstrip(".")
+    if ext not in _PARSERS:
+        raise ConfigFileError(f"unsupported config file format: {path}")
+    try:
+        with open(path, encoding="utf-8") as fp:
+            data = _PARSERS[ext](fp.read())
+    except (OSError, ValueError, configparser.Error) as err:
+        raise ConfigFileError(f"could not read config file {path}: {err}") from err
+    if not isinstance(data, dict) or not all(
+        isinstance(x, dict) for x in data.values()
+    ):
+        raise ConfigFileError(f"config file {path} must contain only sections")
+    return data
+
+
+def _find_in_dir(dirname, basename):
+    for ext in CONFIG_EXTENSIONS:
+        path = os.path.join(dirname, f"{basename}.{ext}")
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def default_config_paths(app_name, cwd=None):
+    """
+    Find the config files for `app_name` which exist, ordered from lowest to
+    highest precedence
+    """
+    user_dir = os.getenv("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    found = [
+        _find_in_dir(os.path.join("/etc", app_name), "config"),
+        _find_in_dir(os.path.join(user_dir, app_name), "config"),
+    ]
+
+    dirname = os.path.abspath(cwd or os.getcwd())
+    while True:
+        project = _find_in_dir(dirname, f".{app_name}")
+        if project or os.path.dirname(dirname) == dirname:
+            break
+        dirname = os.path.dirname(dirname)
+    found.append(project)
+    return [path for path in found if path]
+
+
+class ConfigFileCache:
+    """
+    A JSON file recording parsed config files, keyed by path, mtime, and size
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+
+    def read(self):
+        try:
+            with open(self.path) as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return {}
+
+    def write(self, data):
+        """Write the cache. Errors are ignored, as an unwritable cache location
+        should never break the CLI"""
+        try:
+            self._write(data)
+        except OSError:
+            pass
+
+    def _write(self, data):
+        atomic_write(self.path, json.dumps(data).encode())
+
+    def invalidate(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class ConfigLoader:
+    """
+    Load sections from a list of config files, ordered from lowest to highest
+    precedence, using `cache` (a ConfigFileCache) if one is given
+    """
+
+    def __init__(self, paths, cache=None):
+        self.paths = list(paths)
+        self.cache = cache
+
+    def _parse_all(self):
+        cached = self.cache.read() if self.cache is not None else {}
+        updated = {}
+        parsed = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            key = [st.st_mtime_ns, st.st_size]
+            memo_key = (path, st.st_mtime_ns, st.st_size)
+
+            entry = cached.get(path)
+            if memo_key in _parsed_files:
+                data = _parsed_files[memo_key]
+            elif entry is not None and entry["key"] == key:
+                data = entry["sections"]
+            else:
+                data = parse_config_file(path)
+            _parsed_files[memo_key] = data
+
+            if entry is None or entry["key"] != key:
+                updated[path] = {"key": key, "sections": data}
+            parsed.append(data)
+
+        if updated and self.cache is not None:
+            for path, entry in updated.items():
+                # values which JSON can't represent (e.g. TOML datetimes) leave
+                # their file out of the on-disk cache
+                try:
+                    json.dumps(entry)
+                except (TypeError, ValueError):
+                    continue
+                cached[path] = entry
+            self.cache.write(cached)
+        return parsed
+
+    def load(self, sections):
+        """
+        Get a dict mapping each of `sections` which appears in any file to its
+        values, merged across files
+
+        The values are copies, so changing them does not affect later loads.
+        """
+        sections = set(sections)
+        if not sections:
+            return {}
+        result = {}
+        for data in self._parse_all():
+            for name in sections.intersection(data):
+                result.setdefault(name, {}).update(copy.deepcopy(data[name]))
+        return result
@@ -1,40 +1,264 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import importlib
+import os
 import sys
+import time
+import traceback
+import types
 import warnings
 
 import click
 import pluggy
 
-from together.click_tools import traverse_click
+from together.aio import loop_owner_scope, wrap_async_callbacks
+from together.click_tools import CommandIndex, resolve_command_path
+from together.completion import completion_requested, serve_completion
+from together.concurrent_hooks import (
+    call_hook_per_plugin,
+    call_plugin_hook,
+    configure_concurrently,
+)
+from together.config import ConfigFileCache, ConfigLoader, default_config_paths
+from together.discovery import (
+    PluginDiscoveryCache,
+    compute_plugin_fingerprint,
+    load_entrypoint_plugins,
+)
 from together.exception_handlers import ExceptionHandlerCollection
-from together.hookspec import TogetherSpec
-from together.registration import SubcommandRegistration
+
+# `hook` is defined with the hookspecs, but remains importable from here
+from together.hookspec import TogetherSpec, hook  # noqa: F401
+from together.lazy_config import LazyConfig
+from together.profiling import get_profiler, write_profile_from_env
+from together.registration import (
+    CommandRegistrationError,
+    LazyCommand,
+    SubcommandRegistration,
+)
+from together.resources import ResourceRegistry, collect_resources
+from together.snapshot import CommandSnapshot
 from together.state import CommandState
+from together.telemetry import TelemetryLog, get_telemetry_path, make_record
+
+
+def _get_invocation_args(args, kwargs):
+    # find the `args` argument to `click.BaseCommand.main`, which may be
+    # passed positionally or by name and defaults to sys.argv[1:]
+    argv = kwargs.get("args", args[0] if args else None)
+    return sys.argv[1:] if argv is None else list(argv)
+
+
+def _reload_plugin_object(plugin):
+    # reload the module which defines a plugin, and find the plugin's
+    # replacement in it: the module itself, the module attribute which held the
+    # plugin, or a new instance of the plugin's class
+    importlib.invalidate_caches()
+    if isinstance(plugin, types.ModuleType):
+        return importlib.reload(plugin)
+
+    module = sys.modules.get(type(plugin).__module__)
+    if module is None:
+        raise ValueError(f"cannot find the module which defines {plugin!r}")
+    attrs = [name for name, value in vars(module).items() if value is plugin]
+    module = importlib.reload(module)
+    if attrs:
+        return getattr(module, attrs[0])
+    try:
+        cls = module
+        for part in type(plugin).__qualname__.split("."):
+            cls = getattr(cls, part)
+    except AttributeError:
+        raise ValueError(
+            f"cannot find the new version of {plugin!r} in {module.__name__}; "
+            "pass the new plugin explicitly"
+        ) from None
+    return cls()
+
+
+def _replace_plugin_entries(entries, plugin_name, new_entries, key):
+    # replace the entries belonging to a plugin with new ones, at the position
+    # of the first old entry (or the end)
+    positions = [i for i, x in enumerate(entries) if key(x) == plugin_name]
+    kept = [x for x in entries if key(x) != plugin_name]
+    insert_at = positions[0] if positions else len(kept)
+    return kept[:insert_at] + list(new_entries) + kept[insert_at:]
+
+
+# marks the config as not yet materialized, as None is a valid config
+_UNSET = object()
 
-hook = pluggy.HookimplMarker("together")
+
+async def _gather(coros):
+    await asyncio.gather(*coros)
+
+
+def _exit_code(code):
+    # the status the interpreter would exit with for a SystemExit code
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    return 1
+
+
+def _exit_status(code):
+    # convert a SystemExit code to a status in the same way as the interpreter,
+    # including printing non-integer codes
+    if code is not None and not isinstance(code, int):
+        print(code, file=sys.stderr)
+    return _exit_code(code)
 
 
 class TogetherCLI:
+    # the phases of construction, in the order they run. Only "plugins" runs
+    # in __init__; the others run when first needed
+    PHASES = ("plugins", "config", "exception_handlers", "build")
+
+    # the setuptools entrypoint group which is used to find plugins
+    entrypoint_group = "together"
+    # if set, a file in which to cache the results of entrypoint discovery
+    plugin_cache_path = None
+    # if set, a file in which to store a snapshot of the command tree, used to
+    # serve help without loading plugins
+    snapshot_path = None
+    # if set, the number of threads used to import entrypoint plugins and to
+    # run `together_configure` and `together_subcommand` implementations
+    concurrent_plugin_threads = 0
+    # if set, the application name used to find config files (see
+    # `together.config`), and a file in which to cache their parsed contents
+    config_app_name = None
+    config_cache_path = None
+    # if set, a file to which each invocation appends latency telemetry (see
+    # `together.telemetry`). TOGETHER_TELEMETRY takes precedence
+    telemetry_path = None
+    # use a LazyConfig as the default config, so that plugins can register
+    # values which are computed on first access
+    lazy_config = False
+    # if set, the logger whose level is set from `verbose_option` ("" for the
+    # root logger). See `together.state.configure_logging`
+    logger_name = None
+
     def __init__(self):
+        init_started = time.perf_counter()
+        # the profiler is a no-op unless TOGETHER_PROFILE is set
+        self.profiler = get_profiler()
+        # the event loop for async hooks and commands is created on demand
+        self._event_loop = None
+
         self.plugin_manager = pluggy.PluginManager("together")
         self.plugin_manager.add_hookspecs(TogetherSpec)
-        self.register_plugins()
+        with self.profiler.span("register_plugins"):
+            self.register_plugins()
+        self.profiler.instrument_hooks(self.plugin_manager)
 
-        # configuration starts at default (which usually means empty dict), but
-        # may be populated by plugins
-        self.config = self.get_default_config()
-        self.plugin_manager.hook.together_configure(config=self.config)
-
-        # build exception handlersbefore the CLI is built (either order is
-        # acceptable)
-        handlers_raw = self.plugin_manager.hook.together_exception_handler(
-            config=self.config
-        )
-        self.exception_handlers = ExceptionHandlerCollection(handlers_raw)
+        # the config and exception handlers are materialized on first use, by
+        # `configure` and `load_exception_handlers`
+        self._config = _UNSET
+        self._exception_handlers = None
 
         # other CLI attributes will be populated during the build
         self.root_command = None
         self.subcommands = None
         self.all_subcommands = None
+        self.command_index = None
+        # resources are declared by plugins on first use. Persistent resources
+        # are held here, across invocations
+        self._resource_definitions = None
+        self.persistent_resources = ResourceRegistry(
+            self.get_resource_definitions, close_with_context=False
+        )
+
+        # the registration which attached each command, keyed by command path
+        self._attached = {}
+        # together_subcommand results, as (plugin name, result) pairs
+        self._subcommand_results = []
+
+        # construction time is counted as startup for the first invocation
+        self._unrecorded_startup = time.perf_counter() - init_started
+
+    @property
+    def completed_phases(self):
+        """The names of the PHASES which have run, in order"""
+        done = {
+            "plugins": True,
+            "config": self._config is not _UNSET,
+            "exception_handlers": self._exception_handlers is not None,
+            "build": self.root_command is not None,
+        }
+        return tuple(phase for phase in self.PHASES if done[phase])
+
+    @property
+    def config(self):
+        """The config object, created and configured by plugins on first use"""
+        if self._config is _UNSET:
+            self.configure()
+        return self._config
+
+    @config.setter
+    def config(self, value):
+        self._config = value
+
+    def configure(self):
+        """
+        Run the config phase, if it has not run: create the default config,
+        load config files, and call the `together_configure` and
+        `together_configure_async` hooks
+        """
+        if self._config is not _UNSET:
+            return self._config
+
+        # configuration starts at default (which usually means empty), but
+        # may be populated by plugins
+        self._config = self.get_default_config()
+        try:
+            with self.profiler.span("configure"):
+                with self.profiler.span("config_files"):
+                    self.load_config_files()
+                with self._hook_executor() as executor:
+                    if executor:
+                        configure_concurrently(
+                            self.plugin_manager.hook.together_configure,
+                            self._config,
+                            executor,
+                        )
+                    else:
+                        self.plugin_manager.hook.together_configure(config=self._config)
+                async_configures = self.plugin_manager.hook.together_configure_async(
+                    config=self._config
+                )
+                if async_configures:
+                    self.get_event_loop().run_until_complete(_gather(async_configures))
+        except BaseException:
+            # a failed phase runs again from scratch on the next access
+            self._config = _UNSET
+            raise
+        return self._config
+
+    @property
+    def exception_handlers(self):
+        """The ExceptionHandlerCollection, loaded from plugins on first use"""
+        if self._exception_handlers is None:
+            self.load_exception_handlers()
+        return self._exception_handlers
+
+    @exception_handlers.setter
+    def exception_handlers(self, value):
+        self._exception_handlers = value
+
+    def load_exception_handlers(self):
+        """
+        Run the exception handler phase, if it has not run. Since most
+        invocations succeed, `__call__` only does so when an exception occurs.
+        """
+        if self._exception_handlers is None:
+            with self.profiler.span("exception_handlers"):
+                handlers_raw = self.plugin_manager.hook.together_exception_handler(
+                    config=self.config
+                )
+                self._exception_handlers = ExceptionHandlerCollection(handlers_raw)
+        return self._exception_handlers
 
     def register_plugins(self):
         """
@@ -48,15 +272,114 @@ class TogetherCLI:
         >>> def register_plugins(self):
         >>>     self.plugin_manager.load_setuptools_entrypoints("mygroup")
 
-        to load plugins under the entrypoint group "mygroup".
+        to load plugins under the entrypoint group "mygroup". If you only need
+        to change the group, you can set `entrypoint_group` instead.
+
+        When `plugin_cache_path` is set, the results of the entrypoint scan are
+        cached in that file. See `together.discovery` for details.
+        """
+        load_entrypoint_plugins(
+            self.plugin_manager,
+            self.entrypoint_group,
+            cache=self.get_plugin_discovery_cache(),
+            profiler=self.profiler,
+            threads=self.concurrent_plugin_threads,
+        )
+
+    @classmethod
+    def get_plugin_discovery_cache(cls):
+        """Get the cache used by `register_plugins`, or None if caching is not
+        enabled"""
+        if cls.plugin_cache_path is None:
+            return None
+        return PluginDiscoveryCache(
+            cls.plugin_cache_path, ignore_dirs=cls.get_cache_directories()
+        )
+
+    @classmethod
+    def get_cache_directories(cls):
+        """
+        The directories which hold the files `together` writes for this CLI
+        (the plugin cache, snapshot, config cache, and telemetry log). Their
+        mtimes are not used to detect changes to the environment, so these
+        files may live in a directory on `sys.path`.
         """
-        self.plugin_manager.load_setuptools_entrypoints("together")
+        paths = (
+            cls.plugin_cache_path,
+            cls.snapshot_path,
+            cls.config_cache_path,
+            cls.telemetry_path,
+        )
+        return tuple(
+            os.path.dirname(os.path.expanduser(x)) for x in paths if x is not None
+        )
+
+    def invalidate_plugin_discovery_cache(self):
+        """Discard cached plugin discovery results, so that the next
+        invocation rescans entrypoints"""
+        cache = self.get_plugin_discovery_cache()
+        if cache is not None:
+            cache.invalidate()
+
+    def get_event_loop(self):
+        """
+        Get the event loop used for async hooks and commands, creating it if
+        necessary. The loop is closed when an invocation of the CLI finishes.
+        """
+        if self._event_loop is None:
+            self._event_loop = asyncio.new_event_loop()
+        return self._event_loop
+
+    def close_event_loop(self):
+        if self._event_loop is None:
+            return
+        loop, self._event_loop = self._event_loop, None
+        try:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            loop.close()
+
+    def _hook_executor(self):
+        """A thread pool for running hooks, or None if concurrency is off"""
+        if not self.concurrent_plugin_threads:
+            return contextlib.nullcontext()
+        return concurrent.futures.ThreadPoolExecutor(self.concurrent_plugin_threads)
 
     def get_default_config(self):
-        """The default configuration object. Override to provide a custom config
-        object."""
+        """The default configuration object, an empty dict (or an empty
+        LazyConfig, if `lazy_config` is set). Override to provide a custom
+        config object."""
+        if self.lazy_config:
+            return LazyConfig(profiler=self.profiler)
         return {}
 
+    def get_config_paths(self):
+        """
+        The config files to load, ordered from lowest to highest precedence.
+        Override to change where config files are found.
+        """
+        if self.config_app_name is None:
+            return []
+        return default_config_paths(self.config_app_name)
+
+    def load_config_files(self):
+        """
+        Load the sections requested by `together_config_sections` from config
+        files, setting each one as a key of the config
+        """
+        sections = []
+        for result in self.plugin_manager.hook.together_config_sections():
+            sections.extend([result] if isinstance(result, str) else result)
+        paths = self.get_config_paths()
+        if not sections or not paths:
+            return
+
+        cache = None
+        if self.config_cache_path is not None:
+            cache = ConfigFileCache(self.config_cache_path)
+        for name, values in ConfigLoader(paths, cache=cache).load(sections).items():
+            self._config[name] = values
+
     def define_state_object_at_root(self):
         """
         This method is called immediately after the root command is registered.
@@ -75,14 +398,36 @@ class TogetherCLI:
 
     def reload_command_state_object(self):
         """reload hook for the command state; tests can use this to reset to a
-        fresh object (but with the same config"""
-        self.root_command.context_settings["obj"] = CommandState(config=self.config)
+        fresh object (but with the same config and persistent resources)"""
+        self.root_command.context_settings["obj"] = CommandState(
+            config=self.config,
+            resources=ResourceRegistry(
+                self.get_resource_definitions, shared=self.persistent_resources
+            ),
+            logger_name=self.logger_name,
+        )
+
+    def get_resource_definitions(self):
+        """The Resources declared by plugins, by name, loaded on first use"""
+        if self._resource_definitions is None:
+            self._resource_definitions = collect_resources(
+                self.plugin_manager.hook.together_resource(config=self.config)
+            )
+        return self._resource_definitions
+
+    def close_resources(self):
+        """Close the persistent resources built by previous invocations"""
+        self.persistent_resources.close()
 
     def build(self):
         # short circuit if the build was already done
         if self.root_command:
             return self.root_command
 
+        with self.profiler.span("build"):
+            return self._build()
+
+    def _build(self):
         self.root_command = self.plugin_manager.hook.together_root_command(
             config=self.config
         )
@@ -95,27 +440,371 @@ class TogetherCLI:
         # plugins will fire in LIFO order (part of the pluggy specification),
         # but we want to register subcommands in FIFO order
         # therefore, reverse the order of the subcommands for registration
-        self.subcommands = reversed(
-            self.plugin_manager.hook.together_subcommand(config=self.config)
-        )
+        # results are collected per plugin, so that each registration records
+        # the plugin which made it
+        with self._hook_executor() as executor:
+            results = call_hook_per_plugin(
+                self.plugin_manager,
+                "together_subcommand",
+                executor,
+                config=self.config,
+            )
+        results.reverse()
+        self._subcommand_results = results
+        self.subcommands = [result for _, result in results]
 
         # conversion produces lists of commands; flatten that out
-        self.all_subcommands = [
-            c for x in self.subcommands for c in SubcommandRegistration.convert(x)
-        ]
+        self.all_subcommands = []
+        for plugin_name, result in results:
+            for registration in SubcommandRegistration.convert(result):
+                registration.plugin_name = plugin_name
+                self.all_subcommands.append(registration)
 
+        # the index records commands as they are attached, so that parents
+        # can be found without traversing the tree for each registration
+        # errors are collected so that all bad registrations are reported at once
+        self.command_index = CommandIndex(self.root_command)
+        errors = []
         for registration in self.all_subcommands:
-            cmd, path = registration.command, registration.path
+            try:
+                with self.profiler.span(
+                    "attach",
+                    command=registration.command.name,
+                    path=registration.path,
+                ):
+                    cmd_path = self.command_index.attach(
+                        registration.command, registration.path
+                    )
+                self._attached[cmd_path] = registration
+            except CommandRegistrationError as err:
+                errors.extend(err.errors)
+        if errors:
+            raise CommandRegistrationError(errors)
+
+        wrap_async_callbacks(self.root_command)
+        return self.root_command
+
+    @property
+    def command_owners(self):
+        """The name of the plugin which registered each command, keyed by the
+        command's path"""
+        return {path: reg.plugin_name for path, reg in self._attached.items()}
+
+    def get_command_owner(self, path):
+        """
+        Get the name of the plugin which registered the command at `path` (a
+        tuple of names), or its nearest registered parent group
+        """
+        for end in range(len(path), 1, -1):
+            if path[:end] in self._attached:
+                return self._attached[path[:end]].plugin_name
+        return None
+
+    def _call_plugin_hook(self, hookname, plugin_name, **kwargs):
+        # call one plugin's implementations of a hook, returning the non-None
+        # results in pluggy's order
+        return call_plugin_hook(self.plugin_manager, hookname, plugin_name, **kwargs)
 
-            # traverse the path to find the parent command
-            if not path:
-                parent = self.root_command
+    def _reset_build(self):
+        self.root_command = None
+        self.subcommands = None
+        self.all_subcommands = None
+        self.command_index = None
+        self._attached = {}
+        self._subcommand_results = []
+
+    def reload_plugin(self, name, plugin=None):
+        """
+        Replace the plugin registered as `name`, and update the built command
+        tree with the new plugin's commands, leaving other plugins' commands in
+        place. Returns the new plugin.
+
+        By default, the module which defines the plugin is reloaded, and the new
+        plugin is found in it. Pass `plugin` to register a given object instead.
+
+        Commands which other plugins attached beneath the plugin's groups are
+        re-attached to the new groups. If the config has been created, the new
+        plugin's configure hooks are run on it, and exception handlers are
+        reloaded on next use. A plugin which provides the root command causes
+        a full rebuild.
+
+        Raises a CommandRegistrationError (after attaching everything it can)
+        if the new registrations cannot all be attached.
+        """
+        old = self.plugin_manager.get_plugin(name)
+        if old is None:
+            raise ValueError(f"no plugin is registered as '{name}'")
+        with self.profiler.span("reload_plugin", plugin=name):
+            if plugin is None:
+                plugin = _reload_plugin_object(old)
+            provided_root = self._plugin_implements("together_root_command", name)
+            # plugins registered after this one are registered again after it,
+            # so that hooks keep running in the same order
+            registered = self.plugin_manager.list_name_plugin()
+            position = [x for x, _ in registered].index(name)
+            later = [
+                (x, obj) for x, obj in registered[position + 1 :] if obj is not None
+            ]
+            for later_name, _ in [(name, old)] + later:
+                self.plugin_manager.unregister(name=later_name)
+            for later_name, later_plugin in [(name, plugin)] + later:
+                self.plugin_manager.register(later_plugin, name=later_name)
+            self.profiler.instrument_hooks(self.plugin_manager)
+
+            if self._config is not _UNSET:
+                self._call_plugin_hook("together_configure", name, config=self._config)
+                async_configures = self._call_plugin_hook(
+                    "together_configure_async", name, config=self._config
+                )
+                if async_configures:
+                    self.get_event_loop().run_until_complete(_gather(async_configures))
+            self._exception_handlers = None
+            # new resource definitions apply to new invocations; persistent
+            # resources are rebuilt from them
+            self._resource_definitions = None
+            self.close_resources()
+
+            if self.root_command is None:
+                return plugin
+            if provided_root or self._plugin_implements("together_root_command", name):
+                self._reset_build()
+                self.build()
             else:
-                parent = traverse_click(self.root_command, path)
+                self._reattach_plugin_commands(name)
 
-            parent.add_command(cmd)
+            if self.snapshot_path is not None:
+                self._try_write_snapshot()
+        return plugin
 
-        return self.root_command
+    def _plugin_implements(self, hookname, plugin_name):
+        # check whether a plugin implements a hook
+        impls = getattr(self.plugin_manager.hook, hookname).get_hookimpls()
+        return any(impl.plugin_name == plugin_name for impl in impls)
+
+    def _reattach_plugin_commands(self, name):
+        # the new registrations are collected first, so that a failing hook
+        # leaves the tree untouched
+        results = [
+            (name, result)
+            for result in reversed(
+                self._call_plugin_hook("together_subcommand", name, config=self.config)
+            )
+        ]
+        registrations = []
+        for plugin_name, result in results:
+            for registration in SubcommandRegistration.convert(result):
+                registration.plugin_name = plugin_name
+                registrations.append(registration)
+
+        removed = [
+            path for path, reg in self._attached.items() if reg.plugin_name == name
+        ]
+        # commands which other plugins attached beneath this plugin's commands;
+        # the outermost of these must be re-attached to the new groups
+        orphans = {
+            path: reg
+            for path, reg in self._attached.items()
+            if reg.plugin_name != name
+            and any(len(path) > len(x) and path[: len(x)] == x for x in removed)
+        }
+        outer_orphans = {
+            path: reg for path, reg in orphans.items() if path[:-1] not in orphans
+        }
+
+        # the groups whose commands change are restored if anything fails, so a
+        # failed reload leaves the old tree in place
+        saved_commands = {}
+        saved_attached = dict(self._attached)
+
+        def save_commands(path):
+            group = self.command_index.lookup(path)
+            if isinstance(group, LazyCommand):
+                group = group.load()
+            commands = getattr(group, "commands", None)
+            if isinstance(commands, dict) and id(commands) not in saved_commands:
+                saved_commands[id(commands)] = (commands, dict(commands))
+
+        errors = []
+        try:
+            # detach innermost first, including commands nested in this
+            # plugin's groups, so that groups which the new plugin returns
+            # again (e.g. ones defined in another module) are emptied of them
+            for path in sorted(
+                set(removed) | set(outer_orphans), key=len, reverse=True
+            ):
+                save_commands(path[:-1])
+                self.command_index.detach(path)
+            for path in removed:
+                del self._attached[path]
+
+            # parents are attached before their children
+            root_path = (self.root_command.name,)
+            to_attach = sorted(
+                [(reg, tuple(reg.path or root_path)) for reg in registrations]
+                + [(reg, path[:-1]) for path, reg in outer_orphans.items()],
+                key=lambda x: len(x[1]),
+            )
+            for registration, parent_path in to_attach:
+                try:
+                    save_commands(parent_path)
+                    cmd_path = self.command_index.attach(
+                        registration.command, parent_path
+                    )
+                except CommandRegistrationError as err:
+                    errors.extend(err.errors)
+                    continue
+                self._attached[cmd_path] = registration
+        except BaseException:
+            self._restore_commands(saved_commands, saved_attached)
+            raise
+        if errors:
+            self._restore_commands(saved_commands, saved_attached)
+            raise CommandRegistrationError(errors)
+
+        for registration in registrations:
+            wrap_async_callbacks(registration.command)
+
+        # keep the recorded registrations in order, with the new ones in place
+        # of the old ones
+        self._subcommand_results = _replace_plugin_entries(
+            self._subcommand_results, name, results, key=lambda x: x[0]
+        )
+        self.subcommands = [result for _, result in self._subcommand_results]
+        self.all_subcommands = _replace_plugin_entries(
+            self.all_subcommands, name, registrations, key=lambda x: x.plugin_name
+        )
+
+    def _restore_commands(self, saved_commands, saved_attached):
+        for commands, original in saved_commands.values():
+            commands.clear()
+            commands.update(original)
+        self._attached = saved_attached
+        # the index is rebuilt from the restored tree
+        self.command_index = CommandIndex(self.root_command)
+
+    def get_telemetry_log(self):
+        """Get the TelemetryLog to record invocations in, or None"""
+        path = get_telemetry_path(self.telemetry_path)
+        if path is None:
+            return None
+        return TelemetryLog(path)
+
+    def _record_telemetry(self, args, kwargs, started, invoked, status, handler):
+        log = self.get_telemetry_log()
+        if log is None:
+            return
+        finished = time.perf_counter()
+        startup = (invoked or finished) - started + self._unrecorded_startup
+        self._unrecorded_startup = 0.0
+        path = ()
+        if self.root_command is not None:
+            path = resolve_command_path(
+                self.root_command, _get_invocation_args(args, kwargs)
+            )
+        log.append(
+            make_record(
+                " ".join(path),
+                self.get_command_owner(path),
+                startup,
+                finished - invoked if invoked else 0.0,
+                status,
+                getattr(handler, "__qualname__", None),
+            )
+        )
+
+    @classmethod
+    def get_snapshot_fingerprint(cls):
+        """
+        Compute the fingerprint used to check that a snapshot is current.
+
+        By default, this covers the plugins found under `entrypoint_group`
+        and the name of the class. If you register plugins in some other way,
+        override this to account for them (e.g. by including a version).
+        """
+        return compute_plugin_fingerprint(
+            cls.entrypoint_group,
+            cache=cls.get_plugin_discovery_cache(),
+            extra=f"{cls.__module__}.{cls.__qualname__}",
+            ignore_dirs=cls.get_cache_directories(),
+        )
+
+    @classmethod
+    def load_snapshot(cls):
+        """Load the snapshot at `snapshot_path`, or None if it is not set or
+        the snapshot is missing or stale"""
+        if cls.snapshot_path is None:
+            return None
+        return CommandSnapshot.load(cls.snapshot_path, cls.get_snapshot_fingerprint())
+
+    @classmethod
+    def serve_help_from_snapshot(cls, args=None, prog_name=None):
+        """
+        Render help from the snapshot and exit, if the arguments (which default
+        to `sys.argv`) request help and the snapshot is current.
+
+        This is a classmethod so that it can be called before the CLI is
+        constructed, and therefore before any plugins are loaded:
+
+        >>> MyCLI.serve_help_from_snapshot()
+        >>> MyCLI()()
+
+        Returns False if help could not be served from the snapshot.
+        """
+        snapshot = cls.load_snapshot()
+        if snapshot is None:
+            return False
+        if args is None:
+            args = sys.argv[1:]
+        return snapshot.serve_help(args, prog_name=prog_name)
+
+    @classmethod
+    def serve_completion_from_snapshot(cls, prog_name=None, complete_var=None):
+        """
+        Answer a shell completion request from the snapshot and exit, if
+        completion was requested and the snapshot is current.
+
+        Like `serve_help_from_snapshot`, call this before constructing the CLI.
+        Completions which rely on callbacks (`autocompletion=` on parameters)
+        are not answered, and this returns False so that the full CLI can
+        handle them.
+        """
+        if not completion_requested(prog_name, complete_var):
+            return False
+        snapshot = cls.load_snapshot()
+        if snapshot is None:
+            return False
+        return serve_completion(snapshot, prog_name, complete_var)
+
+    def write_snapshot(self, path=None):
+        """Build the CLI and write a snapshot of it, to `snapshot_path` by
+        default"""
+        self.build()
+        snapshot = CommandSnapshot.from_command(
+            self.root_command, self.get_snapshot_fingerprint()
+        )
+        snapshot.dump(path or self.snapshot_path)
+
+    def _refresh_snapshot(self, args, kwargs):
+        # only help and completion are served from snapshots, so only those
+        # requests pay to check for staleness
+        help_names = self.root_command.context_settings.get(
+            "help_option_names", ["--help"]
+        )
+        if "--" in args:
+            args = args[: args.index("--")]
+        wants_snapshot = set(help_names).intersection(args) or completion_requested(
+            kwargs.get("prog_name"), kwargs.get("complete_var")
+        )
+        if wants_snapshot and self.load_snapshot() is None:
+            self._try_write_snapshot()
+
+    def _try_write_snapshot(self):
+        # like the other caches, a snapshot which cannot be written (e.g. in a
+        # read-only install) is skipped, and help is rendered from the live tree
+        try:
+            self.write_snapshot()
+        except OSError:
+            pass
 
     def process_exception_handler_result(self, callback_result):
         """
@@ -124,6 +813,42 @@ class TogetherCLI:
         """
         sys.exit(callback_result)
 
+    def run_for_exit_code(self, args, prog_name=None, raise_exceptions=False):
+        """
+        Invoke the CLI once with `args` and a fresh CommandState, and return the
+        exit status it would have had as a separate process.
+
+        This is used to serve many invocations from one process, so the
+        CommandState from any previous invocation is always discarded.
+
+        Exceptions which are not handled print a traceback and give status 1,
+        unless `raise_exceptions` is set, in which case they are raised.
+        """
+        self.build()
+        self.reload_command_state_object()
+        try:
+            self(args=list(args), prog_name=prog_name or self.root_command.name)
+        except SystemExit as err:
+            return _exit_status(err.code)
+        except Exception:
+            if raise_exceptions:
+                raise
+            traceback.print_exc()
+            return 1
+        return 0
+
+    def run_batch(self, argvs, workers=0):
+        """
+        Run many invocations of this CLI, yielding a `together.batch.BatchResult`
+        with the captured output and exit status of each, in order.
+
+        With `workers`, invocations are spread across that many processes, each
+        of which constructs and builds this CLI's class once.
+        """
+        from together.batch import run_batch
+
+        return run_batch(self, argvs, workers=workers)
+
     def __call__(self, *args, **kwargs):
         """
         Invoke the built CLI, wrapping the root command in a try-except block
@@ -134,15 +859,35 @@ class TogetherCLI:
         `click.Abort` and similar exceptions, you must do so with
         customizations to your command, not via exception handlers.
         """
-        self.build()
-
+        started = time.perf_counter()
+        invoked = None
+        # an exception which escapes is reported by the interpreter as status 1
+        status = 1
+        handler = None
         try:
-            return self.root_command(*args, **kwargs)
-        except Exception as err:
-            callback = self.exception_handlers.find_callback(err)
-            if not callback:
-                raise
-            self.process_exception_handler_result(callback(err))
+            self.build()
+
+            if self.snapshot_path is not None:
+                self._refresh_snapshot(_get_invocation_args(args, kwargs), kwargs)
+
+            invoked = time.perf_counter()
+            try:
+                with self.profiler.span("invoke"), loop_owner_scope(self):
+                    result = self.root_command(*args, **kwargs)
+                status = 0
+                return result
+            except Exception as err:
+                handler = self.exception_handlers.find_callback(err)
+                if not handler:
+                    raise
+                self.process_exception_handler_result(handler(err))
+        except SystemExit as err:
+            status = _exit_code(err.code)
+            raise
+        finally:
+            self.close_event_loop()
+            self._record_telemetry(args, kwargs, started, invoked, status, handler)
+            write_profile_from_env(self.profiler)
 
         # warn and forcibly exit (rather than raising a new exception here), as
         # this is supposed to be an unreachable condition in a user-facing
@@ -0,0 +1,314 @@
+"""
+Plugin discovery from setuptools entry points, with an optional on-disk cache
+
+Scanning entry points requires reading the metadata of every installed
+distribution. The cache records the result of that scan, keyed on `sys.path`
+and the modification times of its entries, so that later invocations can skip
+the scan when no distributions have been installed or removed.
+
+Writing a file changes the modification time of its directory, so a cache (or
+snapshot) written into a `sys.path` entry would make itself stale. The mtimes
+of such directories are left out of the key. Instead, the names of the
+distribution metadata entries in them are used.
+"""
+
+import collections
+import concurrent.futures
+import hashlib
+import importlib
+import json
+import os
+import re
+import sys
+
+from together._fileutil import atomic_write
+from together.profiling import NullProfiler
+
+# the same pattern as importlib.metadata uses for entrypoint values
+_ENTRYPOINT_VALUE = re.compile(
+    r"(?P<module>[\w.]+)\s*(:\s*(?P<attr>[\w.]+)\s*)?((?P<extras>\[.*\])\s*)?$"
+)
+
+EntryPointRecord = collections.namedtuple(
+    "EntryPointRecord", ["distribution", "name", "value"]
+)
+
+
+def _importlib_metadata():
+    # importing importlib.metadata takes a significant fraction of startup
+    # time, so only do so when scanning distributions
+    if sys.version_info >= (3, 8):
+        from importlib import metadata
+    else:  # pragma: no cover
+        import importlib_metadata as metadata
+    return metadata
+
+
+def scan_entrypoints(group):
+    """
+    Walk the metadata of all installed distributions and collect the entry
+    points under `group`, as a list of EntryPointRecords
+    """
+    found = []
+    for dist in _importlib_metadata().distributions():
+        for ep in dist.entry_points:
+            if ep.group == group:
+                found.append(EntryPointRecord(dist.metadata["Name"], ep.name, ep.value))
+    return found
+
+
+def _path_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+_DISTRIBUTION_SUFFIXES = (".dist-info", ".egg-info", ".egg-link", ".pth")
+
+
+def _distribution_names(path):
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return None
+    return sorted(x for x in names if x.endswith(_DISTRIBUTION_SUFFIXES))
+
+
+def _normalize_dir(path):
+    return os.path.realpath(os.path.expanduser(path or "."))
+
+
+def compute_environment_key(ignore_dirs=()):
+    """
+    Compute a key which changes whenever `sys.path` changes or any of its
+    entries is modified (e.g. by installing or removing a distribution in
+    site-packages)
+
+    For entries in `ignore_dirs` (e.g. directories which hold caches), the
+    names of distribution metadata entries are used instead of the mtime.
+    """
+    ignored = {_normalize_dir(x) for x in ignore_dirs}
+    hasher = hashlib.sha256()
+    for entry in sys.path:
+        if ignored and _normalize_dir(entry) in ignored:
+            state = _distribution_names(entry or ".")
+        else:
+            state = _path_mtime(entry or ".")
+        hasher.update(f"{entry}\0{state}\n".encode())
+    return hasher.hexdigest()
+
+
+class PluginDiscoveryCache:
+    """
+    A JSON file recording the entry points found under one or more groups,
+    along with the environment key which was current when they were scanned.
+    """
+
+    def __init__(self, path, ignore_dirs=()):
+        self.path = os.path.expanduser(path)
+        # the cache's own directory is always ignored when computing keys
+        self.ignore_dirs = (os.path.dirname(self.path),) + tuple(ignore_dirs)
+
+    def compute_key(self):
+        return compute_environment_key(self.ignore_dirs)
+
+    def _read(self):
+        try:
+            with open(self.path) as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, group, key=None):
+        """
+        Get the cached EntryPointRecords for a group, or None if there is no
+        entry or the entry is stale
+        """
+        data = self._read()
+        key = key or self.compute_key()
+        if data.get("key") != key or group not in data.get("groups", {}):
+            return None
+        return [EntryPointRecord(*x) for x in data["groups"][group]]
+
+    def store(self, group, records, key=None):
+        key = key or self.compute_key()
+        data = self._read()
+        if data.get("key") != key:
+            data = {"key": key, "groups": {}}
+        data["groups"][group] = [list(x) for x in records]
+        atomic_write(self.path, json.dumps(data).encode())
+
+    def invalidate(self):
+        """Remove the cache file, forcing the next discovery to rescan"""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def rescan_requested():
+    """
+    Check the TOGETHER_RESCAN_PLUGINS environment variable, which forces
+    discovery to ignore (and rewrite) any cache
+    """
+    return os.getenv("TOGETHER_RESCAN_PLUGINS", "").lower() not in ("", "0", "false")
+
+
+# entry points fixed at build time by a bundle (see together.bundle), by group
+_frozen_entrypoints = {}
+
+
+def freeze_entrypoints(group, records):
+    """
+    Use `records` as the entry points under `group` for the rest of the
+    process, rather than scanning distributions
+    """
+    _frozen_entrypoints[group] = [EntryPointRecord(*x) for x in records]
+
+
+def get_entrypoints(group, cache=None):
+    """
+    Get the EntryPointRecords under `group`, consulting and updating `cache` (a
+    PluginDiscoveryCache) if one is given
+
+    Entry points frozen with `freeze_entrypoints` are returned without a scan.
+    """
+    if group in _frozen_entrypoints:
+        return list(_frozen_entrypoints[group])
+    records = None
+    if cache is not None:
+        key = cache.compute_key()
+        if not rescan_requested():
+            records = cache.load(group, key=key)
+    if records is None:
+        records = scan_entrypoints(group)
+        if cache is not None:
+            try:
+                cache.store(group, records, key=key)
+            except OSError:
+                # an unwritable cache location should never break the CLI
+                pass
+    return records
+
+
+def compute_plugin_fingerprint(group, cache=None, extra="", ignore_dirs=()):
+    """
+    Compute a fingerprint for the set of installed plugins under `group`,
+    without importing any of them
+
+    Installing or removing plugins is detected through the environment key,
+    so entry points are only included when `cache` can provide them without a
+    scan. `ignore_dirs` is passed to `compute_environment_key`.
+
+    `extra` is mixed into the fingerprint. Use it to account for plugins
+    which are not loaded from entrypoints.
+    """
+    if cache is not None:
+        ignore_dirs = tuple(ignore_dirs) + cache.ignore_dirs
+    hasher = hashlib.sha256()
+    key = compute_environment_key(ignore_dirs)
+    hasher.update(f"{group}\0{extra}\0{key}\n".encode())
+    if cache is not None:
+        for record in get_entrypoints(group, cache=cache):
+            hasher.update("\0".join(record).encode() + b"\n")
+    return hasher.hexdigest()
+
+
+def load_entrypoint_value(value):
+    """Import the object named by an entrypoint value, like "module:attr" """
+    match = _ENTRYPOINT_VALUE.match(value)
+    if not match:
+        raise ValueError(f"malformed entrypoint value: {value}")
+    obj = importlib.import_module(match.group("module"))
+    if match.group("attr"):
+        for part in match.group("attr").split("."):
+            obj = getattr(obj, part)
+    return obj
+
+
+class DistributionInfo:
+    """
+    The distribution of an entry point plugin, as listed by
+    `PluginManager.list_plugin_distinfo`
+
+    Like pluggy's DistFacade, this has a `project_name` and otherwise behaves
+    like an `importlib.metadata.Distribution`. The distribution's metadata is
+    only read when an attribute other than `project_name` is used, so cached
+    discovery stays cheap.
+    """
+
+    def __init__(self, project_name):
+        self.project_name = project_name
+        self._dist = None
+
+    def __getattr__(self, attr):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        if self._dist is None:
+            self._dist = _importlib_metadata().distribution(self.project_name)
+        return getattr(self._dist, attr)
+
+    def __repr__(self):
+        return f"DistributionInfo({self.project_name!r})"
+
+
+def _record_distinfo(plugin_manager, plugin, record):
+    # PluginManager.load_setuptools_entrypoints records the distribution of
+    # each plugin it loads in the same way
+    distinfo = getattr(plugin_manager, "_plugin_distinfo", None)
+    if distinfo is not None:
+        distinfo.append((plugin, DistributionInfo(record.distribution)))
+
+
+def load_entrypoint_plugins(
+    plugin_manager, group, cache=None, profiler=None, threads=0
+):
+    """
+    Register the entry point plugins under `group`, like
+    `PluginManager.load_setuptools_entrypoints`, but consulting and updating
+    `cache` (a PluginDiscoveryCache) if one is given. Their distributions are
+    listed by `PluginManager.list_plugin_distinfo`, as DistributionInfos.
+
+    If a `profiler` is given, the import of each plugin is recorded. With
+    `threads`, plugins are imported on a pool of that many threads, but are
+    still registered in entrypoint order.
+
+    Returns the number of plugins registered.
+    """
+    profiler = profiler or NullProfiler()
+    with profiler.span("discover_entrypoints", group=group):
+        records = get_entrypoints(group, cache=cache)
+    # skip plugins which are blocked or already registered, including by an
+    # earlier entrypoint of the same name
+    seen = set()
+    to_load = []
+    for record in records:
+        if (
+            record.name in seen
+            or plugin_manager.get_plugin(record.name)
+            or plugin_manager.is_blocked(record.name)
+        ):
+            continue
+        seen.add(record.name)
+        to_load.append(record)
+
+    def load(record):
+        with profiler.span(
+            "import_plugin",
+            category="import",
+            plugin=record.name,
+            distribution=record.distribution,
+        ):
+            return load_entrypoint_value(record.value)
+
+    if threads:
+        with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+            plugins = list(executor.map(load, to_load))
+    else:
+        plugins = [load(x) for x in to_load]
+
+    for record, plugin in zip(to_load, plugins):
+        plugin_manager.register(plugin, name=record.name)
+        _record_distinfo(plugin_manager, plugin, record)
+    return len(to_load)
@@ -47,12 +47,39 @@ class ExceptionHandlerCollection:
         with_priorities = [x if len(x) == 3 else (*x, 0) for x in handlers_raw]
         # descending sort by the priority
         self.by_priority = sorted(with_priorities, key=lambda x: x[2], reverse=True)
+        # map exception types to the handlers which may match them
+        self._dispatch_cache = {}
 
-    def find_callback(self, exception):
+    def _candidates_for_type(self, exc_type):
+        """
+        Get the handlers which could match exceptions of a given type, in
+        priority order.
+
+        Class predicates are resolved here, so the result contains only the
+        callable predicates which must still be checked, interleaved in
+        priority order with the class predicates that match. Because a
+        matching class predicate always wins, nothing after the first one is
+        kept.
+        """
+        candidates = []
         for predicate, callback, _priority in self.by_priority:
-            if isinstance(predicate, type):
-                if isinstance(exception, predicate):
-                    return callback
-            elif predicate(exception):
+            if not isinstance(predicate, type):
+                candidates.append((predicate, callback))
+            elif issubclass(exc_type, predicate):
+                candidates.append((None, callback))
+                break
+        return candidates
+
+    def find_callback(self, exception):
+        exc_type = type(exception)
+        try:
+            candidates = self._dispatch_cache[exc_type]
+        except KeyError:
+            candidates = self._dispatch_cache[exc_type] = self._candidates_for_type(
+                exc_type
+            )
+
+        for predicate, callback in candidates:
+            if predicate is None or predicate(exception):
                 return callback
         return None
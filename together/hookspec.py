@@ -4,6 +4,7 @@ The pluggy hookspec for TogetherCLI plugins
 import pluggy
 
 spec_marker = pluggy.HookspecMarker("together")
+hook = pluggy.HookimplMarker("together")
 
 
 class TogetherSpec:
@@ -21,6 +22,8 @@ class TogetherSpec:
         """
         Register a subcommand by returning one of
         - a SubcommandRegistration
+        - a LazySubcommandRegistration, which names a command to import and
+          build only when it is used
         - a click command (or group)
         - a 2-tuple of a click command and its path in the command tree
 
@@ -28,12 +31,39 @@ class TogetherSpec:
         commands.
         """
 
+    @spec_marker
+    def together_config_sections(self):
+        """
+        Return the name of a config file section, or a list of names, which
+        should be loaded into the config before `together_configure` runs.
+
+        Sections are only read from config files when the CLI sets
+        `config_app_name`.
+        """
+
     @spec_marker
     def together_configure(self, config):
         """
         Add or modify data in the existing configuration object.
         """
 
+    @spec_marker
+    def together_configure_async(self, config):
+        """
+        An async variant of `together_configure`. Implementations must be
+        coroutine functions.
+
+        All implementations run concurrently on the CLI's event loop, after
+        every `together_configure` hook has run.
+        """
+
+    @spec_marker
+    def together_resource(self, config):
+        """
+        Declare named resources by returning a together.Resource or a list of
+        them. Commands get them with `together.get_resource(name)`.
+        """
+
     @spec_marker
     def together_exception_handler(self, config):
         """
@@ -0,0 +1,218 @@
+"""
+Audit the imports made by a TogetherCLI
+
+Run a CLI in a subprocess with `python -X importtime`, and attribute each
+imported module to the phase of the CLI during which it was imported: loading
+or calling hooks of a particular plugin, or running the invoked command.
+
+Usage:
+
+    python -m together.importaudit mypackage.cli:MyCLI -- subcommand --opt
+
+The target may name a TogetherCLI subclass or instance. In tests, use
+`audit_imports` and `ImportAudit.check_budget`:
+
+>>> audit = audit_imports("mypackage.cli:MyCLI", ["subcommand"])
+>>> audit.check_budget("plugin:myplugin", max_ms=50, forbidden=["numpy"])
+"""
+
+import collections
+import json
+import re
+import subprocess
+import sys
+
+import click
+
+MARKER = "together-importaudit:"
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+ImportRecord = collections.namedtuple(
+    "ImportRecord", ["module", "self_us", "cumulative_us", "depth"]
+)
+
+# run in the child process: the target's profiler is replaced with one which
+# writes phase markers to stderr, interleaved with the importtime output
+_RUNNER = """\
+import importlib, os, sys
+
+MARKER = {marker!r}
+ARGS = {args!r}
+
+
+def mark(action, label=""):
+    os.write(2, f"{{MARKER}} {{action}} {{label}}\\n".encode())
+
+
+mark("push", "target")
+modname, _, attr = {target!r}.partition(":")
+target = importlib.import_module(modname)
+for part in attr.split("."):
+    target = getattr(target, part)
+mark("pop")
+
+import contextlib
+import together.core
+from together.click_tools import resolve_command_path
+from together.profiling import Profiler
+
+
+class MarkingProfiler(Profiler):
+    @contextlib.contextmanager
+    def span(self, name, category="together", **args):
+        label = None
+        if "plugin" in args:
+            label = "plugin:" + args["plugin"]
+        elif name == "invoke":
+            path = resolve_command_path(cli.root_command, ARGS)
+            label = "command:" + " ".join(path)
+        if label:
+            mark("push", label)
+        try:
+            with super().span(name, category, **args) as record:
+                yield record
+        finally:
+            if label:
+                mark("pop")
+
+
+together.core.get_profiler = MarkingProfiler
+mark("push", "construct")
+cli = target() if isinstance(target, type) else target
+mark("pop")
+try:
+    cli(args=ARGS)
+except SystemExit:
+    pass
+"""
+
+
+class ImportBudgetExceeded(AssertionError):
+    pass
+
+
+class ImportAudit:
+    """
+    The modules imported during each phase of a CLI invocation
+
+    `phases` maps phase labels to lists of ImportRecords. Labels are
+    "target" (importing the target), "construct", "plugin:<name>", and
+    "command:<path>", where the path is the names of the invoked commands
+    (e.g. "command:mycli sub"), without any option values.
+    """
+
+    def __init__(self, phases):
+        self.phases = phases
+
+    @classmethod
+    def parse(cls, stderr):
+        phases = collections.OrderedDict()
+        stack = []
+        for line in stderr.splitlines():
+            if line.startswith(MARKER):
+                action, _, label = line[len(MARKER) :].strip().partition(" ")
+                if action == "push":
+                    stack.append(label)
+                    phases.setdefault(label, [])
+                elif stack:
+                    stack.pop()
+                continue
+            match = _IMPORTTIME_LINE.match(line)
+            if match and stack:
+                self_us, cumulative_us, indent, module = match.groups()
+                phases[stack[-1]].append(
+                    ImportRecord(
+                        module, int(self_us), int(cumulative_us), len(indent) // 2
+                    )
+                )
+        return cls(phases)
+
+    def modules(self, label):
+        return [x.module for x in self.phases.get(label, ())]
+
+    def total_ms(self, label):
+        # the sum of the self times of every module is the cumulative time of
+        # the phase
+        return sum(x.self_us for x in self.phases.get(label, ())) / 1000
+
+    def check_budget(self, label, max_ms=None, max_modules=None, forbidden=()):
+        """
+        Check a phase against an import budget, raising ImportBudgetExceeded
+        (an AssertionError) describing every violation.
+
+        `forbidden` modules are matched by name and by package prefix, so
+        "numpy" forbids "numpy.linalg" as well.
+        """
+        problems = []
+        modules = self.modules(label)
+        if max_ms is not None and self.total_ms(label) > max_ms:
+            problems.append(
+                f"imports took {self.total_ms(label):.1f}ms (budget {max_ms}ms)"
+            )
+        if max_modules is not None and len(modules) > max_modules:
+            problems.append(f"imported {len(modules)} modules (budget {max_modules})")
+        for name in forbidden:
+            hits = [m for m in modules if m == name or m.startswith(name + ".")]
+            if hits:
+                problems.append(f"imported forbidden module(s): {', '.join(hits)}")
+        if problems:
+            raise ImportBudgetExceeded(
+                f"import budget exceeded for '{label}': " + "; ".join(problems)
+            )
+
+    def to_json(self):
+        return {
+            label: {
+                "total_ms": self.total_ms(label),
+                "modules": [x._asdict() for x in records],
+            }
+            for label, records in self.phases.items()
+        }
+
+
+def audit_imports(target, args=(), python=sys.executable, env=None):
+    """
+    Run a CLI under import tracing and return an ImportAudit
+
+    `target` is a "module:attribute" string naming a TogetherCLI subclass or
+    instance, and `args` are the arguments to invoke it with.
+    """
+    runner = _RUNNER.format(marker=MARKER, target=target, args=list(args))
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", runner],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        env=env,
+    )
+    audit = ImportAudit.parse(proc.stderr)
+    if "target" not in audit.phases:
+        raise RuntimeError(f"failed to audit imports for {target}:\n{proc.stderr}")
+    return audit
+
+
+@click.command("importaudit")
+@click.option("--json", "as_json", is_flag=True, help="Output the full audit as JSON.")
+@click.option(
+    "--top", default=5, show_default=True, help="Modules to show for each phase."
+)
+@click.argument("target")
+@click.argument("args", nargs=-1, type=click.UNPROCESSED)
+def main(as_json, top, target, args):
+    """
+    Run a TogetherCLI (TARGET, as "module:attribute") with ARGS and report the
+    modules imported during each phase, with their cumulative import times.
+    """
+    audit = audit_imports(target, args)
+    if as_json:
+        click.echo(json.dumps(audit.to_json(), indent=2))
+        return
+
+    for label, records in audit.phases.items():
+        click.echo(f"{label}: {len(records)} modules, {audit.total_ms(label):.1f}ms")
+        for record in sorted(records, key=lambda x: -x.cumulative_us)[:top]:
+            click.echo(f"  {record.cumulative_us / 1000:8.1f}ms  {record.module}")
+
+
+if __name__ == "__main__":
+    main()
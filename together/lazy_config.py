@@ -0,0 +1,113 @@
+"""
+A config mapping with values which are computed on first access
+
+`together_configure` hooks run on every invocation, before the command to run
+is known. Values which are expensive to compute (e.g. locating credentials or
+scanning directories) can instead be registered as providers with
+`LazyConfig.register_lazy`, and are only computed if a command reads them.
+"""
+
+import collections.abc
+import threading
+import time
+
+from together.profiling import NullProfiler
+
+
+class LazyConfig(collections.abc.MutableMapping):
+    """
+    A dict-like config object. Keys may be set normally, or bound to a
+    provider (a callable taking no arguments) which is called the first time
+    the key is read. The result is stored and returned for later reads.
+
+    Iterating over keys, `len()`, and `in` do not call providers. Reading
+    values (including via `.items()`, `.values()`, or comparison with another
+    mapping) does.
+    """
+
+    def __init__(self, initial=None, *, profiler=None):
+        self._values = dict(initial or {})
+        self._providers = {}
+        self._lock = threading.RLock()
+        self.profiler = profiler or NullProfiler()
+        # seconds spent in each provider which has been called
+        self.timings = {}
+
+    def __getstate__(self):
+        # locks cannot be copied or pickled
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def register_lazy(self, key, provider):
+        """Bind `key` to `provider`, replacing any value it already has"""
+        with self._lock:
+            self._values.pop(key, None)
+            self._providers[key] = provider
+
+    def is_resolved(self, key):
+        """Check whether `key` has a value which does not need computing"""
+        return key in self._values
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        with self._lock:
+            # another thread may have resolved the key while we waited
+            if key in self._values:
+                return self._values[key]
+            provider = self._providers[key]
+            start = time.perf_counter()
+            with self.profiler.span(f"config:{key}"):
+                value = provider()
+            self.timings[key] = time.perf_counter() - start
+            self._values[key] = value
+            del self._providers[key]
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._providers.pop(key, None)
+            self._values[key] = value
+
+    def __delitem__(self, key):
+        with self._lock:
+            if key in self._values:
+                del self._values[key]
+            else:
+                del self._providers[key]
+
+    def __contains__(self, key):
+        return key in self._values or key in self._providers
+
+    def __iter__(self):
+        yield from list(self._values)
+        yield from list(self._providers)
+
+    def __len__(self):
+        return len(self._values) + len(self._providers)
+
+    def __repr__(self):
+        unresolved = ", ".join(repr(key) for key in self._providers)
+        return f"LazyConfig({self._values!r}, unresolved=[{unresolved}])"
+
+    def timing_report(self):
+        """
+        Describe each lazy key as a dict of "key", "seconds" (None if it was
+        never computed), and "resolved", slowest first
+        """
+        report = [
+            {"key": key, "seconds": seconds, "resolved": True}
+            for key, seconds in self.timings.items()
+        ]
+        report.sort(key=lambda x: x["seconds"], reverse=True)
+        report.extend(
+            {"key": key, "seconds": None, "resolved": False} for key in self._providers
+        )
+        return report
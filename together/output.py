@@ -0,0 +1,242 @@
+"""
+Structured output for commands, in a format chosen with `format_option`
+
+Writers take records one at a time, so commands can pass generators and
+output starts before all records exist. Records are dicts (or sequences, when
+`fields` are given). Output is written in chunks of `chunk_size` records and
+flushed after each chunk, rather than line by line.
+"""
+
+import collections.abc
+import csv
+import io
+import json
+
+import click
+
+from together.state import get_state
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+class RecordWriter:
+    """
+    Base class for writers. Subclasses implement `format_record`, returning
+    the text for one record, and may implement `start` and `finish`.
+
+    Writers are context managers, and finish their output on exit.
+    """
+
+    def __init__(self, stream=None, *, fields=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.stream = stream or click.get_text_stream("stdout")
+        self.fields = list(fields) if fields is not None else None
+        self.chunk_size = chunk_size
+        self.count = 0
+        self._pending = []
+        self._closed = False
+
+    def _record_dict(self, record):
+        if isinstance(record, collections.abc.Mapping):
+            return record
+        if self.fields is None:
+            raise ValueError("fields are required to write non-dict records")
+        return dict(zip(self.fields, record))
+
+    def _record_row(self, record):
+        if self.fields is None:
+            self.fields = list(self._record_dict(record))
+        if isinstance(record, collections.abc.Mapping):
+            return [record.get(field) for field in self.fields]
+        return list(record)
+
+    def start(self):
+        return ""
+
+    def format_record(self, record):
+        raise NotImplementedError
+
+    def finish(self):
+        return ""
+
+    def write(self, record):
+        if self.count == 0:
+            self._pending.append(self.start())
+        self._pending.append(self.format_record(record))
+        self.count += 1
+        if self.count % self.chunk_size == 0:
+            self.flush()
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        if self._pending:
+            self.stream.write("".join(self._pending))
+            self._pending.clear()
+        self.stream.flush()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self.count == 0:
+            self._pending.append(self.start())
+        self._pending.append(self.finish())
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _to_json(value):
+    # values like datetimes are written as strings rather than failing
+    return json.dumps(value, default=str)
+
+
+class NDJSONWriter(RecordWriter):
+    """One JSON object per line"""
+
+    def format_record(self, record):
+        return _to_json(self._record_dict(record)) + "\n"
+
+
+class JSONArrayWriter(RecordWriter):
+    """A JSON array, with one record per line"""
+
+    def start(self):
+        return "["
+
+    def format_record(self, record):
+        sep = "\n" if self.count == 0 else ",\n"
+        return sep + _to_json(self._record_dict(record))
+
+    def finish(self):
+        return "\n]\n" if self.count else "]\n"
+
+
+class CSVWriter(RecordWriter):
+    """CSV with a header row. Fields default to the keys of the first record"""
+
+    def _csv_line(self, row):
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerow(row)
+        return buf.getvalue()
+
+    def format_record(self, record):
+        row = self._record_row(record)
+        if self.count == 0:
+            return self._csv_line(self.fields) + self._csv_line(row)
+        return self._csv_line(row)
+
+
+class TableWriter(RecordWriter):
+    """
+    An aligned text table. Column widths are computed from the first
+    `sample_size` records, which are held until then. Later values wider than
+    their column are written in full, shifting the rest of their row.
+    """
+
+    def __init__(self, stream=None, *, sample_size=100, **kwargs):
+        super().__init__(stream, **kwargs)
+        self.sample_size = sample_size
+        self._sample = []
+        self._widths = None
+
+    @staticmethod
+    def _cell(value):
+        return "" if value is None else str(value)
+
+    def _line(self, cells):
+        padded = [cell.ljust(width) for cell, width in zip(cells, self._widths)]
+        return "  ".join(padded).rstrip() + "\n"
+
+    def _release_sample(self):
+        rows = [[str(x) for x in self.fields]] + self._sample
+        self._widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        text = "".join(self._line(row) for row in rows)
+        self._sample = []
+        return text
+
+    def format_record(self, record):
+        cells = [self._cell(x) for x in self._record_row(record)]
+        if self._widths is not None:
+            return self._line(cells)
+        self._sample.append(cells)
+        if len(self._sample) < self.sample_size:
+            return ""
+        return self._release_sample()
+
+    def finish(self):
+        if self._widths is None and self.fields is not None:
+            return self._release_sample()
+        return ""
+
+
+WRITERS = {
+    "text": TableWriter,
+    "json": JSONArrayWriter,
+    "ndjson": NDJSONWriter,
+    "csv": CSVWriter,
+}
+
+
+def get_output_format(default="text"):
+    """Get the output format set via format_option"""
+    state = get_state()
+    return state.get("output_format") or state.get("output_format_default") or default
+
+
+def format_option(f=None, *, default="text", formats=tuple(WRITERS)):
+    """
+    Add a `--format` option which sets the format used by `write_records`.
+
+    Like `verbose_option`, it can be used at several levels of the command
+    tree. A value given on the command line takes precedence over any
+    `default`, and among values (or defaults) the one closest to the invoked
+    command wins.
+    """
+    if f is None:
+        return lambda f: format_option(f, default=default, formats=formats)
+
+    def callback(ctx, param, value):
+        # callbacks run from the root down, so later levels overwrite earlier
+        # ones. explicit values and defaults are kept apart so that a leaf's
+        # default does not override a value given to its parent
+        state = get_state()
+        if value is not None:
+            state.set("output_format", value)
+        state.set("output_format_default", default)
+
+    return click.option(
+        "--format",
+        "output_format",
+        type=click.Choice(formats),
+        expose_value=False,
+        callback=callback,
+        help=f"Output format [default: {default}]",
+    )(f)
+
+
+def get_writer(format=None, stream=None, **kwargs):
+    """Get a RecordWriter for `format`, which defaults to get_output_format()"""
+    format = format or get_output_format()
+    try:
+        writer_class = WRITERS[format]
+    except KeyError:
+        raise ValueError(f"unknown output format: {format}") from None
+    return writer_class(stream, **kwargs)
+
+
+def write_records(records, format=None, stream=None, **kwargs):
+    """
+    Write an iterable of records (e.g. a generator) in `format`, which
+    defaults to the format set by `format_option`. Returns the number of
+    records written.
+    """
+    with get_writer(format, stream, **kwargs) as writer:
+        writer.write_all(records)
+    return writer.count
@@ -0,0 +1,184 @@
+"""
+An opt-in profiler for the phases of a TogetherCLI
+
+Set the TOGETHER_PROFILE environment variable to a file path to record how
+long plugin loading, each plugin's hook implementations, each subcommand
+registration, and the invoked command take. The report is written when the CLI
+exits, as JSON by default, or in Chrome trace event format (viewable in
+chrome://tracing or Perfetto) when TOGETHER_PROFILE_FORMAT=chrome.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+PROFILE_FORMATS = ("json", "chrome")
+
+
+class Profiler:
+    """
+    Records named, nested spans of time.
+
+    Each span has a name, a category, and a dict of args, which are included
+    in the report. Spans which are open when another starts become its parent.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.spans = []
+        self._origin = time.perf_counter()
+        self._local = threading.local()
+
+    @property
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @property
+    def current_span(self):
+        """The innermost open span in this thread, or None"""
+        return self._stack[-1] if self._stack else None
+
+    @contextlib.contextmanager
+    def span(self, name, category="together", **args):
+        record = {
+            "name": name,
+            "category": category,
+            "args": args,
+            "depth": len(self._stack),
+            "thread": threading.get_ident(),
+            "start": time.perf_counter() - self._origin,
+            "duration": None,
+        }
+        self._stack.append(record)
+        try:
+            yield record
+        finally:
+            self._stack.pop()
+            record["duration"] = time.perf_counter() - self._origin - record["start"]
+            self.spans.append(record)
+
+    def instrument_hooks(self, plugin_manager):
+        """
+        Wrap every registered implementation of the `together` hooks so that
+        each plugin's hook calls are recorded as separate spans
+        """
+        for hookname in dir(plugin_manager.hook):
+            if not hookname.startswith("together_"):
+                continue
+            for impl in getattr(plugin_manager.hook, hookname).get_hookimpls():
+                if getattr(impl.function, "_together_profiled", False):
+                    continue
+                impl.function = self._wrap_hook(
+                    impl.function, hookname, impl.plugin_name
+                )
+
+    def _wrap_hook(self, func, hookname, plugin_name):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.span(hookname, category="hook", plugin=plugin_name):
+                return func(*args, **kwargs)
+
+        wrapper._together_profiled = True
+        return wrapper
+
+    def to_json(self):
+        """Produce a JSON-serializable report, with times in milliseconds"""
+        return {
+            "spans": [
+                {
+                    "name": x["name"],
+                    "category": x["category"],
+                    "args": x["args"],
+                    "depth": x["depth"],
+                    "start_ms": x["start"] * 1000,
+                    "duration_ms": x["duration"] * 1000,
+                }
+                for x in sorted(self.spans, key=lambda x: x["start"])
+            ]
+        }
+
+    def to_chrome_trace(self):
+        """Produce a report in the Chrome trace event format"""
+        pid = os.getpid()
+        return {
+            "traceEvents": [
+                {
+                    "name": x["name"],
+                    "cat": x["category"],
+                    "ph": "X",
+                    "ts": x["start"] * 1e6,
+                    "dur": x["duration"] * 1e6,
+                    "pid": pid,
+                    "tid": x["thread"],
+                    "args": x["args"],
+                }
+                for x in sorted(self.spans, key=lambda x: x["start"])
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def write(self, path, format="json"):
+        if format not in PROFILE_FORMATS:
+            raise ValueError(
+                f"profile format must be one of {PROFILE_FORMATS}, got {format}"
+            )
+        data = self.to_chrome_trace() if format == "chrome" else self.to_json()
+        with open(path, "w") as fp:
+            json.dump(data, fp, indent=2)
+
+
+class NullProfiler:
+    """A profiler which records nothing, used when profiling is not enabled"""
+
+    enabled = False
+    current_span = None
+
+    @contextlib.contextmanager
+    def span(self, name, category="together", **args):
+        yield None
+
+    def instrument_hooks(self, plugin_manager):
+        pass
+
+    def write(self, path, format="json"):
+        pass
+
+
+def get_profiler():
+    """Get a Profiler if TOGETHER_PROFILE is set, and a NullProfiler otherwise"""
+    if os.getenv("TOGETHER_PROFILE"):
+        return Profiler()
+    return NullProfiler()
+
+
+def write_profile_from_env(profiler):
+    """
+    Write the report for a profiler to the path in TOGETHER_PROFILE
+
+    This runs after the command, so problems (a bad TOGETHER_PROFILE_FORMAT or
+    an unwritable path) are reported on stderr rather than raised, and do not
+    change the command's exit status.
+    """
+    path = os.getenv("TOGETHER_PROFILE")
+    if not (profiler.enabled and path):
+        return
+    format = os.getenv("TOGETHER_PROFILE_FORMAT", "json")
+    if format not in PROFILE_FORMATS:
+        print(
+            f"together: not writing profile: TOGETHER_PROFILE_FORMAT must be "
+            f"one of {PROFILE_FORMATS}, got {format}",
+            file=sys.stderr,
+            flush=True,
+        )
+        return
+    try:
+        profiler.write(path, format=format)
+    except OSError as err:
+        print(f"together: could not write profile: {err}", file=sys.stderr, flush=True)
@@ -0,0 +1,172 @@
+"""
+Propagation of the command state to worker threads, processes and tasks
+
+`get_state` normally reads the click context, which is thread-local, so work
+handed to a thread pool cannot reach the state, config, or verbosity. The
+helpers here capture the state where work is submitted and make it available
+to `get_state` where the work runs, using contextvars.
+
+Threads and asyncio tasks share the CommandState object itself. Processes get
+a `StateSnapshot`, a picklable copy of the state data and config.
+"""
+
+import asyncio
+import collections.abc
+import concurrent.futures
+import contextvars
+import functools
+import pickle
+
+import click
+
+from together.state import CommandState, _current_state, configure_logging, get_state
+
+
+def capture_context(state=None):
+    """
+    Copy the current contextvars context, with `state` (by default, the
+    current state) set as the state for `get_state`
+
+    Calling `.run(func, ...)` on the result runs `func` with that state, in
+    any thread. Each copy may only be running in one thread at a time.
+
+    Resources which are built where the context runs are closed with the
+    click context which is current here, if any.
+    """
+    if state is None:
+        state = get_state()
+    resources = getattr(state, "resources", None)
+    if resources is not None:
+        resources.bind_context(click.get_current_context(silent=True))
+    context = contextvars.copy_context()
+    context.run(_current_state.set, state)
+    return context
+
+
+def _dump_picklable(mapping):
+    # pickle each value once, leaving out those which can't be pickled
+    dumped = {}
+    for key, value in mapping.items():
+        try:
+            dumped[key] = pickle.dumps(value)
+        except Exception:
+            continue
+    return dumped
+
+
+def _load_all(dumped):
+    return {key: pickle.loads(value) for key, value in dumped.items()}
+
+
+class StateSnapshot:
+    """
+    A picklable copy of a CommandState, for sending to worker processes
+
+    Values are pickled once, when the snapshot is taken, and values which
+    cannot be pickled are left out. Lazy config values which have not been
+    computed are left out too, rather than computed. Resources are not
+    included, so worker processes must build their own.
+    """
+
+    def __init__(self, data, config, logger_name=None):
+        self._data = _dump_picklable(data)
+        self._config = None
+        self._config_is_mapping = isinstance(config, collections.abc.Mapping)
+        if self._config_is_mapping:
+            is_resolved = getattr(config, "is_resolved", None)
+            if is_resolved is not None:
+                # reading unresolved keys would call their providers
+                config = {k: config[k] for k in list(config) if is_resolved(k)}
+            self._config = _dump_picklable(config)
+        elif config is not None:
+            self._config = _dump_picklable({None: config}).get(None)
+        self.logger_name = logger_name
+
+    @classmethod
+    def from_state(cls, state=None):
+        if state is None:
+            state = get_state()
+        return cls(state.data, state.config, getattr(state, "logger_name", None))
+
+    @property
+    def data(self):
+        return _load_all(self._data)
+
+    @property
+    def config(self):
+        if self._config_is_mapping:
+            return _load_all(self._config)
+        return None if self._config is None else pickle.loads(self._config)
+
+    def restore(self):
+        """build a CommandState from the snapshot"""
+        state = CommandState(config=self.config, logger_name=self.logger_name)
+        state.data.update(self.data)
+        return state
+
+
+def _run_with_snapshot(snapshot, func, args, kwargs):
+    state = snapshot.restore()
+    if state.logger_name is not None:
+        configure_logging(state.get("verbosity", 0), state.logger_name)
+    token = _current_state.set(state)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _current_state.reset(token)
+
+
+class ContextExecutor(concurrent.futures.Executor):
+    """
+    Wrap an executor so that submitted functions can use `get_state`
+
+    For thread pools, the state is captured on each `submit`, and shared with
+    the caller. For a ProcessPoolExecutor, a StateSnapshot is sent with each
+    call, so functions (and their arguments) must be picklable as usual. The
+    snapshot is taken when the ContextExecutor is created, so a state must be
+    current then, and later changes to the state are not sent to workers.
+
+    >>> with ContextExecutor(ThreadPoolExecutor()) as executor:
+    ...     results = list(executor.map(fetch, urls))
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self._snapshot = None
+        if isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+            self._snapshot = StateSnapshot.from_state(get_state())
+
+    def submit(self, fn, *args, **kwargs):
+        if self._snapshot is not None:
+            return self.executor.submit(
+                _run_with_snapshot, self._snapshot, fn, args, kwargs
+            )
+        return self.executor.submit(capture_context().run, fn, *args, **kwargs)
+
+    def shutdown(self, wait=True, **kwargs):
+        self.executor.shutdown(wait=wait, **kwargs)
+
+
+async def _with_state(state, coro):
+    # tasks run in their own copy of the context, so this does not leak into
+    # the caller
+    _current_state.set(state)
+    return await coro
+
+
+def create_task(coro):
+    """
+    Schedule a coroutine as an asyncio task which can use `get_state`, even
+    after the click context has exited
+    """
+    return asyncio.ensure_future(_with_state(get_state(), coro))
+
+
+def run_in_thread(func, *args, **kwargs):
+    """
+    Run a function in the event loop's default executor, with the current
+    state, and return an awaitable for its result
+    """
+    loop = asyncio.get_event_loop()
+    call = functools.partial(capture_context().run, func, *args, **kwargs)
+    return loop.run_in_executor(None, call)
@@ -0,0 +1,112 @@
+"""
+A pytest plugin for testing `together` CLIs
+
+Building a large CLI for every test is slow. This plugin builds it once per
+test session (once per worker process, under pytest-xdist) and provides:
+
+- `together_cli`: the session's built TogetherCLI, loaded from the
+  `together_cli` ini option or the `--together-cli` command-line option
+  ("module:attribute", naming a TogetherCLI subclass or instance). Override
+  this fixture in a conftest to construct the CLI some other way.
+- `together_invoke`: a function which runs the CLI with a fresh
+  `CommandState` and returns an `InvokeResult`
+
+Output is captured with pytest's `capsys` rather than `CliRunner`, except for
+invocations which pass `input` or `env`. Output captured by `capsys` before an
+invocation is discarded.
+
+The plugin is registered with pytest through the `pytest11` entry point.
+"""
+
+import collections
+import shlex
+
+import pytest
+
+InvokeResult = collections.namedtuple(
+    "InvokeResult", ["exit_code", "stdout", "stderr", "exception"]
+)
+
+
+def pytest_addoption(parser):
+    parser.addini(
+        "together_cli", "The TogetherCLI to test, as 'module:attribute'", default=""
+    )
+    group = parser.getgroup("together")
+    group.addoption(
+        "--together-cli",
+        dest="together_cli",
+        default=None,
+        help="The TogetherCLI to test, as 'module:attribute'.",
+    )
+
+
+class CliInvoker:
+    """Run a built TogetherCLI and capture its results"""
+
+    def __init__(self, cli, capsys=None):
+        self.cli = cli
+        self.capsys = capsys
+
+    def _run(self, args):
+        try:
+            return self.cli.run_for_exit_code(args, raise_exceptions=True), None
+        except Exception as err:
+            return 1, err
+
+    def __call__(self, args, *, input=None, env=None, assert_exit_code=0):
+        """
+        Run the CLI with `args` (a list, or a string to split like a shell
+        command line), excluding the program name.
+
+        If `assert_exit_code` is not None, raise an AssertionError unless the
+        invocation exits with that status.
+        """
+        if isinstance(args, str):
+            args = shlex.split(args)
+        args = list(args)
+
+        if self.capsys is not None and input is None and env is None:
+            self.capsys.readouterr()
+            exit_code, exception = self._run(args)
+            out, err = self.capsys.readouterr()
+        else:
+            from click.testing import CliRunner
+
+            runner = CliRunner(mix_stderr=False)
+            with runner.isolation(input=input, env=env) as (stdout, stderr):
+                exit_code, exception = self._run(args)
+                out = stdout.getvalue().decode(errors="replace")
+                err = stderr.getvalue().decode(errors="replace")
+
+        result = InvokeResult(exit_code, out, err, exception)
+        if assert_exit_code is not None and exit_code != assert_exit_code:
+            raise AssertionError(
+                f"Failed to run {args!r}.\n"
+                f"exit_code={exit_code} (expected {assert_exit_code})\n"
+                f"stdout:\n{out}"
+                f"stderr:\n{err}"
+            ) from exception
+        return result
+
+
+@pytest.fixture(scope="session")
+def together_cli(pytestconfig):
+    target = pytestconfig.getoption("together_cli") or pytestconfig.getini(
+        "together_cli"
+    )
+    if not target:
+        raise pytest.UsageError(
+            "set the together_cli ini option or pass --together-cli, or "
+            "override the together_cli fixture"
+        )
+    from together.batch import load_cli
+
+    cli = load_cli(target)
+    cli.build()
+    return cli
+
+
+@pytest.fixture
+def together_invoke(together_cli, capsys):
+    return CliInvoker(together_cli, capsys)
@@ -1,7 +1,21 @@
+import importlib
 import typing
 
 import click
 
+from together.aio import wrap_async_callbacks
+
+
+class CommandRegistrationError(ValueError):
+    """
+    Raised when subcommand registrations cannot be attached to the command
+    tree. `errors` holds a message for each failed registration.
+    """
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("\n".join(self.errors))
+
 
 class SubcommandRegistration:
     """
@@ -26,6 +40,10 @@ class SubcommandRegistration:
     Use ``SubcommandRegistration``s when registering commands.
     """
 
+    # the name of the plugin which returned this registration, set by
+    # TogetherCLI.build (None if it could not be determined)
+    plugin_name = None
+
     def __init__(
         self, command: click.BaseCommand, path: typing.Optional[typing.List[str]] = None
     ):
@@ -52,3 +70,121 @@ class SubcommandRegistration:
             # recurse and unpack one layer of nesting to produce a flattened
             # list
             return [y for x in iterator for y in cls.convert(x)]
+
+
+def _import_target(target):
+    # resolve a "module.name:attribute" string, as used in entry points
+    modname, _, attr = target.partition(":")
+    if not attr:
+        raise ValueError(
+            f"lazy command loaders must be of the form 'module:attribute', got {target}"
+        )
+    obj = importlib.import_module(modname)
+    for part in attr.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+class LazyCommand(click.MultiCommand):
+    """
+    A stub command which stands in for a real command until it is needed.
+
+    The stub carries only a name, short help, and hidden flag. When the command
+    is resolved for invocation, completion, or traversal, the loader is called
+    (or imported, if it is a string) to produce the real command, and all
+    further work is delegated to that command.
+    """
+
+    def __init__(self, name, loader, short_help=None, hidden=False):
+        super().__init__(name, short_help=short_help, hidden=hidden)
+        self.loader = loader
+        self._loaded = None
+
+    @property
+    def is_loaded(self):
+        return self._loaded is not None
+
+    def load(self):
+        if self._loaded is not None:
+            return self._loaded
+
+        target = self.loader
+        if isinstance(target, str):
+            target = _import_target(target)
+        if not isinstance(target, click.BaseCommand):
+            target = target()
+        if not isinstance(target, click.BaseCommand):
+            raise TypeError(
+                f"lazy command loader for '{self.name}' did not produce a "
+                f"click command. got bad val: {target}"
+            )
+        if target.name != self.name:
+            raise ValueError(
+                f"lazy command '{self.name}' was declared, but the loader "
+                f"produced a command named '{target.name}'"
+            )
+        wrap_async_callbacks(target)
+        self._loaded = target
+        return target
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        return self.load().make_context(info_name, args, parent=parent, **extra)
+
+    def invoke(self, ctx):
+        return self.load().invoke(ctx)
+
+    def get_command(self, ctx, cmd_name):
+        cmd = self.load()
+        if not isinstance(cmd, click.MultiCommand):
+            return None
+        return cmd.get_command(ctx, cmd_name)
+
+    def list_commands(self, ctx):
+        cmd = self.load()
+        if not isinstance(cmd, click.MultiCommand):
+            return []
+        return cmd.list_commands(ctx)
+
+    def add_command(self, cmd, name=None):
+        target = self.load()
+        if not isinstance(target, click.Group):
+            raise TypeError(
+                f"cannot attach '{cmd.name}' to lazy command '{self.name}', "
+                "which did not load as a click.Group"
+            )
+        target.add_command(cmd, name=name)
+
+    def get_short_help_str(self, limit=45):
+        if self.short_help:
+            return super().get_short_help_str(limit)
+        return self.load().get_short_help_str(limit)
+
+
+class LazySubcommandRegistration(SubcommandRegistration):
+    """
+    A registration which declares a command by name without building it.
+
+    ``loader`` is either a string of the form ``"module:attribute"`` or a
+    callable. The string form is imported only when the command is resolved,
+    so the module holding the command (and its dependencies) is never imported
+    for invocations which do not use it. The resolved attribute may be a click
+    command or a zero-argument callable which returns one.
+
+    >>> LazySubcommandRegistration("foo", "mypackage.foo_cmd:foo", ["mycli"])
+
+    ``short_help`` and ``hidden`` are used when listing commands in help
+    output, so that listing does not trigger a load.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        loader: typing.Union[str, typing.Callable[[], click.BaseCommand]],
+        path: typing.Optional[typing.List[str]] = None,
+        *,
+        short_help: typing.Optional[str] = None,
+        hidden: bool = False,
+    ):
+        super().__init__(
+            LazyCommand(name, loader, short_help=short_help, hidden=hidden), path
+        )
@@ -0,0 +1,125 @@
+"""
+Named resources (e.g. database connections or worker pools) which plugins
+declare with the `together_resource` hook
+
+Each invocation's CommandState has a ResourceRegistry. A resource is built the
+first time it is requested, shared by every command in the invocation, and
+closed when the root context is torn down. Persistent resources are instead
+kept by the TogetherCLI across invocations (as in batch and server modes), and
+closed by `TogetherCLI.close_resources`.
+"""
+
+import contextlib
+import threading
+
+import click
+
+
+class Resource:
+    """
+    Declare a resource named `name`, built by calling `factory` with no
+    arguments. When the resource is closed, `close` is called with its value,
+    or, if `close` is not given, the value's own `close` method (if any).
+    """
+
+    def __init__(self, name, factory, *, close=None, persistent=False):
+        self.name = name
+        self.factory = factory
+        self.close = close
+        self.persistent = persistent
+
+    def __repr__(self):
+        return f"Resource({self.name!r}, persistent={self.persistent})"
+
+
+def _close_value(resource, value):
+    if resource.close is not None:
+        resource.close(value)
+    elif hasattr(value, "close"):
+        value.close()
+
+
+def collect_resources(hook_results):
+    """
+    Convert `together_resource` hook results (Resources or lists of them) into
+    a dict by name. Raises a ValueError if a name is declared twice.
+    """
+    resources = {}
+    for result in hook_results:
+        for resource in result if isinstance(result, (list, tuple)) else [result]:
+            if not isinstance(resource, Resource):
+                raise TypeError(f"together_resource returned {resource!r}")
+            if resource.name in resources:
+                raise ValueError(f"resource '{resource.name}' was declared twice")
+            resources[resource.name] = resource
+    return resources
+
+
+class ResourceRegistry:
+    """
+    Build and hold resources, given a function which returns the Resource
+    definitions by name
+
+    Persistent resources are delegated to the `shared` registry, if given.
+    When `close_with_context` is set, the registry closes itself when the root
+    click context in which it first built a resource is torn down.
+    """
+
+    def __init__(self, get_definitions, *, shared=None, close_with_context=True):
+        self.get_definitions = get_definitions
+        self.shared = shared
+        self.close_with_context = close_with_context
+        self._values = {}
+        self._lock = threading.RLock()
+        self._stack = contextlib.ExitStack()
+        self._close_registered = False
+        # the root context to close with when a resource is built outside of
+        # any click context (e.g. in a worker thread)
+        self._bound_context = None
+
+    def __contains__(self, name):
+        return name in self.get_definitions()
+
+    def bind_context(self, ctx):
+        """
+        Close with the root of `ctx` if a resource is built where there is no
+        current click context, as in threads started by `together.propagation`
+        """
+        if ctx is not None:
+            with self._lock:
+                self._bound_context = ctx.find_root()
+
+    def is_built(self, name):
+        return name in self._values
+
+    def get(self, name):
+        """Get the resource named `name`, building it if necessary"""
+        with self._lock:
+            if name in self._values:
+                return self._values[name]
+            try:
+                resource = self.get_definitions()[name]
+            except KeyError:
+                raise KeyError(f"no resource named '{name}' was declared") from None
+            if resource.persistent and self.shared is not None:
+                return self.shared.get(name)
+
+            value = resource.factory()
+            self._values[name] = value
+            self._stack.callback(_close_value, resource, value)
+            if self.close_with_context and not self._close_registered:
+                ctx = click.get_current_context(silent=True)
+                root = ctx.find_root() if ctx is not None else self._bound_context
+                if root is not None:
+                    root.call_on_close(self.close)
+                    self._close_registered = True
+            return value
+
+    def close(self):
+        """Close the resources built by this registry, newest first"""
+        with self._lock:
+            stack, self._stack = self._stack, contextlib.ExitStack()
+            self._values.clear()
+            self._close_registered = False
+            self._bound_context = None
+        stack.close()
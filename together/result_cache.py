@@ -0,0 +1,341 @@
+"""
+On-disk memoization of command results
+
+`memoize` wraps a command callback so that its return value and the text it
+writes to stdout are cached. They are replayed when the command is run again
+with the same:
+
+- command path (the names of the invoked commands, from the root)
+- parameter values, for the command and all of its parent groups
+- values of the CommandState entries named in `state_keys`
+
+Parameter values are keyed by their `repr`, so parameters with unstable
+reprs (e.g. open files) never produce cache hits.
+
+The cache policy is read from the "memoize" key of the config, a dict which
+may contain:
+
+- "path": the cache directory (default: ~/.cache/together/memoize)
+- "ttl": seconds after which entries expire (default: no expiry). A `ttl`
+  passed to `memoize` takes precedence
+- "max_bytes": the total size of entries, beyond which the least recently
+  used are evicted (default: 64MB)
+- "mode": "use", "refresh" (run the command and replace any cached result),
+  or "off" (default: "use")
+
+`cache_option` adds a `--cache` option which overrides the mode.
+
+Output is captured by replacing `sys.stdout` (and its `buffer`) while the
+command runs, which covers `click.echo`, `print`, and click's text and binary
+streams. Streams which were looked up before the command ran (e.g. saved at
+import time) bypass the capture, and their output is not replayed.
+
+Entries are loaded with `pickle`, which can run arbitrary code, so the cache
+directory must not be writable by untrusted users. It is created readable
+only by its owner.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+import time
+
+import click
+
+from together._fileutil import atomic_write
+from together.state import get_state
+
+CACHE_MODES = ("use", "refresh", "off")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def default_cache_path():
+    cache_home = os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "together", "memoize")
+
+
+def _atomic_write(path, data):
+    # entries are unpickled, so only the owner may write them
+    atomic_write(path, data, dir_mode=0o700)
+
+
+class ResultStore:
+    """
+    A directory of cached results, one file per key. Reading an entry marks
+    it as recently used (by its mtime), and writing one evicts the least
+    recently used entries until the total size is within `max_bytes`.
+
+    Hit, miss, and eviction counts are kept in "stats.json".
+    """
+
+    _SUFFIX = ".entry"
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = os.path.expanduser(path)
+        self.max_bytes = max_bytes
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key + self._SUFFIX)
+
+    def _stats_path(self):
+        return os.path.join(self.path, "stats.json")
+
+    def stats(self):
+        """Get the counts of hits, misses, and evictions"""
+        try:
+            with open(self._stats_path()) as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _count(self, name, n=1):
+        stats = self.stats()
+        stats[name] = stats.get(name, 0) + n
+        try:
+            _atomic_write(self._stats_path(), json.dumps(stats).encode())
+        except OSError:
+            pass
+
+    def get(self, key):
+        """
+        Get the entry for `key` (a dict), or None if it is missing, expired, or
+        cannot be loaded. Expired and unloadable entries are deleted.
+        """
+        path = self._entry_path(key)
+        try:
+            fp = open(path, "rb")
+        except OSError:
+            self._count("misses")
+            return None
+        with fp:
+            entry = self._load_entry(fp)
+        if entry is None or (
+            entry["expires"] is not None and entry["expires"] < time.time()
+        ):
+            self._delete(path)
+            self._count("misses")
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count("hits")
+        return entry
+
+    @staticmethod
+    def _load_entry(fp):
+        # unpickling can raise almost anything (e.g. an ImportError or
+        # AttributeError for a class which was renamed since the entry was
+        # written), and such entries would fail on every run, so they are
+        # treated as corrupt
+        try:
+            entry = pickle.load(fp)
+        except Exception:
+            return None
+        if not isinstance(entry, dict) or not {"value", "stdout", "expires"} <= set(
+            entry
+        ):
+            return None
+        if not isinstance(entry.get("expires"), (int, float, type(None))):
+            return None
+        return entry
+
+    def set(self, key, value, stdout=b"", ttl=None):
+        """Store an entry, then evict entries if the store is too large"""
+        entry = {
+            "value": value,
+            "stdout": stdout,
+            "expires": None if ttl is None else time.time() + ttl,
+        }
+        try:
+            _atomic_write(self._entry_path(key), pickle.dumps(entry))
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            # an unwritable cache, or an unpicklable value, is not cached
+            return
+        self.evict()
+
+    def _delete(self, path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def _entries(self):
+        try:
+            scan = list(os.scandir(self.path))
+        except FileNotFoundError:
+            return []
+        return [x for x in scan if x.name.endswith(self._SUFFIX)]
+
+    def evict(self):
+        """Remove the least recently used entries beyond `max_bytes`"""
+        entries = []
+        for dirent in self._entries():
+            try:
+                st = dirent.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, dirent.path))
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._delete(path)
+            total -= size
+            evicted += 1
+        if evicted:
+            self._count("evictions", evicted)
+
+    def clear(self):
+        """Remove all entries (but not the stats)"""
+        for dirent in self._entries():
+            self._delete(dirent.path)
+
+
+def get_memoize_policy(state=None):
+    """Get the memoize policy dict from the config, with the --cache mode"""
+    state = state or get_state()
+    config = getattr(state, "config", None) or {}
+    policy = dict(config.get("memoize") or {})
+    mode = state.get("cache_mode") if state is not None else None
+    policy["mode"] = mode or policy.get("mode", "use")
+    return policy
+
+
+def get_result_store(policy=None):
+    """Get the ResultStore for a policy (by default, the current policy)"""
+    policy = get_memoize_policy() if policy is None else policy
+    return ResultStore(
+        policy.get("path") or default_cache_path(),
+        max_bytes=policy.get("max_bytes", DEFAULT_MAX_BYTES),
+    )
+
+
+def make_key(ctx, state=None, state_keys=()):
+    """Build a cache key from a click context, its parents, and `state`"""
+    levels = []
+    while ctx is not None:
+        levels.append([ctx.command.name, sorted(ctx.params.items())])
+        ctx = ctx.parent
+    levels.reverse()
+    state_values = sorted((key, state.get(key)) for key in state_keys)
+    material = json.dumps([levels, state_values], default=repr, sort_keys=True)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class _TeeBuffer:
+    # the binary layer of a _Tee, used by click for bytes and for text when
+    # the text stream is misconfigured
+    def __init__(self, buffer, parts):
+        self.raw_buffer = buffer
+        self.parts = parts
+
+    def write(self, data):
+        written = self.raw_buffer.write(data)
+        self.parts.append(bytes(data))
+        return written
+
+    def __getattr__(self, name):
+        return getattr(self.raw_buffer, name)
+
+
+class _Tee:
+    # pass writes through to stdout, recording them as bytes, whether they are
+    # made to the text stream or its buffer. click sometimes writes bytes to
+    # text streams which accept them
+    def __init__(self, stream):
+        self.stream = stream
+        self.parts = []
+        self.encoding = getattr(stream, "encoding", None) or "utf-8"
+        buffer = getattr(stream, "buffer", None)
+        if buffer is not None:
+            self.buffer = _TeeBuffer(buffer, self.parts)
+
+    def write(self, text):
+        written = self.stream.write(text)
+        if isinstance(text, str):
+            text = text.encode(self.encoding, errors="replace")
+        self.parts.append(bytes(text))
+        return written
+
+    def getvalue(self):
+        return b"".join(self.parts)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def memoize(f=None, *, ttl=None, state_keys=()):
+    """
+    Cache the results of a command callback on disk. Apply it beneath the
+    click decorators, so that it wraps the callback:
+
+    >>> @click.command("inventory")
+    >>> @click.option("--site")
+    >>> @together.memoize(ttl=3600)
+    >>> def inventory(site): ...
+
+    Cached results are unpickled, so the cache directory must only be
+    writable by trusted users.
+    """
+    if f is None:
+        return lambda f: memoize(f, ttl=ttl, state_keys=state_keys)
+    if inspect.iscoroutinefunction(f):
+        raise TypeError("memoize cannot be used on coroutine functions")
+
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        ctx = click.get_current_context()
+        state = ctx.obj
+        policy = get_memoize_policy(state)
+        if policy["mode"] == "off":
+            return f(*args, **kwargs)
+
+        store = get_result_store(policy)
+        key = make_key(ctx, state, state_keys)
+        if policy["mode"] == "use":
+            entry = store.get(key)
+            if entry is not None:
+                click.echo(entry["stdout"], nl=False)
+                return entry["value"]
+
+        stdout = sys.stdout
+        tee = sys.stdout = _Tee(stdout)
+        try:
+            value = f(*args, **kwargs)
+        finally:
+            sys.stdout = stdout
+        store.set(
+            key,
+            value,
+            stdout=tee.getvalue(),
+            ttl=ttl if ttl is not None else policy.get("ttl"),
+        )
+        return value
+
+    return wrapper
+
+
+def cache_option(f):
+    """
+    Add a `--cache` option which sets the memoize mode for the invocation,
+    overriding the config
+    """
+
+    def callback(ctx, param, value):
+        if value is not None:
+            get_state().set("cache_mode", value)
+
+    return click.option(
+        "--cache",
+        "cache_mode",
+        type=click.Choice(CACHE_MODES),
+        expose_value=False,
+        callback=callback,
+        help="Whether to use cached results: 'use', 'refresh', or 'off'.",
+    )(f)
@@ -0,0 +1,251 @@
+"""
+A resident server which keeps a built TogetherCLI warm, and a client for it
+
+The server builds the CLI once and then accepts invocations over a Unix domain
+socket. The client sends its arguments, environment, working directory, and
+stdio file descriptors. The server runs the CLI with them (with a fresh
+CommandState) and replies with the exit status.
+
+Invocations are handled one at a time, as each one takes over the server's
+stdio, environment, and working directory while it runs.
+
+Start a server with
+
+    python -m together.server mypackage.cli:MyCLI --socket ~/.cache/mycli.sock
+
+and use `run_client` in the CLI's entry point, so that it falls back to running
+in-process when no server is available:
+
+>>> def main():
+>>>     together.server.run_client("~/.cache/mycli.sock", lambda: MyCLI()())
+
+A request which fails (e.g. a malformed request, or a working directory which
+no longer exists) gets a nonzero status and an error message, and the server
+keeps serving. If the connection fails while the request is being sent, the
+client falls back to running in-process. Once the request has been sent, the
+server may already have run the command, so if the connection drops before a
+status arrives the client exits with an error rather than running it again.
+
+Apart from the `together` package itself (which imports `pluggy` for
+`together.hook`), this module imports only the standard library, so the
+client does not load click or any plugins.
+"""
+
+import array
+import contextlib
+import json
+import os
+import socket
+import struct
+import sys
+
+_HEADER = struct.Struct("!I")
+_STATUS = struct.Struct("!i")
+# the status sent for requests which could not be run
+_ERROR_STATUS = 1
+_STDIO_FDS = (0, 1, 2)
+
+
+def _recv_exactly(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed mid-message")
+        data += chunk
+    return data
+
+
+def _send_request(sock, request, fds):
+    payload = json.dumps(request).encode()
+    sock.sendmsg(
+        [_HEADER.pack(len(payload)) + payload],
+        [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds))],
+    )
+
+
+def _recv_request(sock, fds):
+    """
+    Receive a request, adding the file descriptors sent with it to `fds` as
+    soon as they arrive, so that the caller can close them if the rest of the
+    request is bad
+    """
+    received = array.array("i")
+    msg, ancdata, _flags, _addr = sock.recvmsg(
+        _HEADER.size, socket.CMSG_LEN(len(_STDIO_FDS) * received.itemsize)
+    )
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            received.frombytes(data[: len(data) - (len(data) % received.itemsize)])
+    fds.extend(received)
+    if len(msg) < _HEADER.size:
+        msg += _recv_exactly(sock, _HEADER.size - len(msg))
+    (size,) = _HEADER.unpack(msg)
+    return json.loads(_recv_exactly(sock, size))
+
+
+def _send_reply(sock, status, error=""):
+    message = error.encode()
+    sock.sendall(_STATUS.pack(status) + _HEADER.pack(len(message)) + message)
+
+
+def _recv_reply(sock):
+    (status,) = _STATUS.unpack(_recv_exactly(sock, _STATUS.size))
+    (size,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return status, _recv_exactly(sock, size).decode()
+
+
+@contextlib.contextmanager
+def _redirected_process_state(fds, env, cwd):
+    """
+    Temporarily take over stdio with the client's file descriptors, and use the
+    client's environment and working directory
+    """
+    for stream in (sys.stdout, sys.stderr):
+        stream.flush()
+    saved_fds = [os.dup(fd) for fd in _STDIO_FDS]
+    saved_streams = (sys.stdin, sys.stdout, sys.stderr)
+    saved_env = dict(os.environ)
+    saved_cwd = os.getcwd()
+    try:
+        for client_fd, fd in zip(fds, _STDIO_FDS):
+            os.dup2(client_fd, fd)
+        # fresh stream objects ensure that no buffered data crosses requests
+        sys.stdin = open(0, "r", closefd=False)
+        sys.stdout = open(1, "w", closefd=False)
+        sys.stderr = open(2, "w", closefd=False)
+        os.environ.clear()
+        os.environ.update(env)
+        os.chdir(cwd)
+        yield
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            with contextlib.suppress(OSError):
+                stream.flush()
+        sys.stdin, sys.stdout, sys.stderr = saved_streams
+        for saved_fd, fd in zip(saved_fds, _STDIO_FDS):
+            os.dup2(saved_fd, fd)
+            os.close(saved_fd)
+        os.environ.clear()
+        os.environ.update(saved_env)
+        os.chdir(saved_cwd)
+
+
+def handle_request(cli, conn):
+    """
+    Handle a single invocation sent over `conn`
+
+    Any error in the request is reported to the client with a nonzero status,
+    and returned. Returns None if the invocation ran.
+    """
+    fds = []
+    error = None
+    try:
+        request = _recv_request(conn, fds)
+        if len(fds) != len(_STDIO_FDS):
+            raise ValueError(f"expected {len(_STDIO_FDS)} stdio fds, got {len(fds)}")
+        with _redirected_process_state(fds, request["env"], request["cwd"]):
+            status = cli.run_for_exit_code(
+                request["argv"], prog_name=request.get("prog_name")
+            )
+    except Exception as err:
+        status, error = _ERROR_STATUS, err
+    finally:
+        for fd in fds:
+            os.close(fd)
+    message = "" if error is None else f"together server: bad request: {error!r}"
+    with contextlib.suppress(OSError):
+        _send_reply(conn, status, message)
+    return error
+
+
+def serve(cli, socket_path):
+    """
+    Build `cli` and serve invocations on a Unix socket at `socket_path` until
+    interrupted
+    """
+    socket_path = os.path.expanduser(socket_path)
+    cli.build()
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # only the user who runs the server may connect to it
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    server.listen()
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                error = handle_request(cli, conn)
+            if error is not None:
+                print(f"together server: bad request: {error!r}", file=sys.stderr)
+    finally:
+        server.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(socket_path)
+        cli.close_resources()
+
+
+def run_client(socket_path, fallback, argv=None, prog_name=None):
+    """
+    Send this invocation to the server at `socket_path` and exit with its
+    status. If no server is running there, or the request cannot be sent,
+    return the result of `fallback()`. If the connection drops after the
+    request was sent, exit with a nonzero status, as the command may have run.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(os.path.expanduser(socket_path))
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return fallback()
+
+    with sock:
+        request = {
+            "argv": sys.argv[1:] if argv is None else list(argv),
+            "prog_name": prog_name or os.path.basename(sys.argv[0]),
+            "env": dict(os.environ),
+            "cwd": os.getcwd(),
+        }
+        try:
+            _send_request(sock, request, _STDIO_FDS)
+        except OSError:
+            # includes ConnectionError, for a server which went away
+            return fallback()
+        try:
+            status, error = _recv_reply(sock)
+        except OSError as err:
+            status = _ERROR_STATUS
+            error = f"together server: connection lost before a reply: {err}"
+    if error:
+        print(error, file=sys.stderr)
+    sys.exit(status)
+
+
+def main(argv=None):
+    import argparse
+
+    from together.discovery import load_entrypoint_value
+
+    parser = argparse.ArgumentParser(
+        prog="python -m together.server",
+        description="Serve invocations of a TogetherCLI over a Unix socket.",
+    )
+    parser.add_argument("target", help="a TogetherCLI subclass or instance")
+    parser.add_argument("--socket", required=True, help="path for the socket")
+    args = parser.parse_args(argv)
+
+    target = load_entrypoint_value(args.target)
+    cli = target() if isinstance(target, type) else target
+    try:
+        serve(cli, args.socket)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
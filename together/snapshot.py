@@ -0,0 +1,351 @@
+"""
+Snapshots of a built command tree
+
+A snapshot records the structure of the command tree -- names, help text,
+parameters, and hidden flags -- in a JSON file. From a snapshot, `together`
+can construct a skeleton of the tree which has the same help output as the
+real one, but which holds no callbacks and required no plugins to be loaded.
+
+Snapshots carry a fingerprint, and a snapshot whose fingerprint does not match
+the current one is treated as missing.
+"""
+
+import json
+import os
+import sys
+
+import click
+
+from together._fileutil import atomic_write
+from together.registration import LazyCommand
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+_CONTEXT_SETTING_TYPES = (str, int, float, bool, list, tuple, type(None))
+
+
+class SnapshotMiss(Exception):
+    """Raised when a snapshot does not contain enough information to serve a
+    request, and the live command tree must be used instead"""
+
+
+def _describe_param(param, ctx):
+    desc = {
+        "name": param.name,
+        "opts": param.opts,
+        "secondary_opts": param.secondary_opts,
+        "nargs": param.nargs,
+        "multiple": param.multiple,
+        "required": param.required,
+        "metavar": param.make_metavar(),
+        "choices": (
+            list(param.type.choices) if isinstance(param.type, click.Choice) else None
+        ),
+        "dynamic": param.autocompletion is not None,
+    }
+    if isinstance(param, click.Option):
+        desc.update(
+            kind="option",
+            help=param.help,
+            hidden=param.hidden,
+            is_flag=param.is_flag,
+            is_bool_flag=param.is_bool_flag,
+            count=param.count,
+            help_record=param.get_help_record(ctx),
+        )
+    else:
+        desc["kind"] = "argument"
+    return desc
+
+
+def describe_command(cmd, name=None, parent_ctx=None):
+    """
+    Produce the JSON-serializable description of a command (and all of its
+    subcommands) which is stored in a snapshot
+
+    Lazy commands which have not been loaded are recorded as placeholders, and
+    are not loaded by this function.
+    """
+    name = name or cmd.name
+    if isinstance(cmd, LazyCommand):
+        if not cmd.is_loaded:
+            return {
+                "name": name,
+                "lazy": True,
+                "short_help": cmd.short_help,
+                "hidden": cmd.hidden,
+            }
+        cmd = cmd.load()
+
+    settings = {
+        k: v
+        for k, v in cmd.context_settings.items()
+        if k != "obj" and isinstance(v, _CONTEXT_SETTING_TYPES)
+    }
+    with click.Context(
+        cmd, info_name=name, parent=parent_ctx, **cmd.context_settings
+    ) as ctx:
+        desc = {
+            "name": name,
+            "lazy": False,
+            "help": cmd.help,
+            "short_help": cmd.short_help,
+            "epilog": cmd.epilog,
+            "options_metavar": cmd.options_metavar,
+            "hidden": cmd.hidden,
+            "deprecated": cmd.deprecated,
+            "add_help_option": cmd.add_help_option,
+            "no_args_is_help": getattr(cmd, "no_args_is_help", False),
+            "context_settings": settings,
+            "params": [_describe_param(p, ctx) for p in cmd.params],
+            "subcommands": None,
+        }
+        if isinstance(cmd, click.MultiCommand):
+            desc.update(
+                invoke_without_command=cmd.invoke_without_command,
+                chain=cmd.chain,
+                subcommand_metavar=cmd.subcommand_metavar,
+                subcommands=[
+                    describe_command(cmd.get_command(ctx, subname), subname, ctx)
+                    for subname in cmd.list_commands(ctx)
+                ],
+            )
+    return desc
+
+
+class _SnapshotOption(click.Option):
+    def __init__(self, desc):
+        decls = desc["opts"] + ([desc["name"]] if desc["name"] else [])
+        super().__init__(decls, metavar=desc["metavar"])
+        for attr in (
+            "secondary_opts",
+            "nargs",
+            "multiple",
+            "required",
+            "hidden",
+            "is_flag",
+            "is_bool_flag",
+            "count",
+            "help",
+        ):
+            setattr(self, attr, desc[attr])
+        self.help_record = desc["help_record"]
+        if desc["choices"] is not None:
+            self.type = click.Choice(desc["choices"])
+
+    def get_help_record(self, ctx):
+        return tuple(self.help_record) if self.help_record else None
+
+
+class _SnapshotArgument(click.Argument):
+    def __init__(self, desc):
+        super().__init__(
+            [desc["name"]],
+            nargs=desc["nargs"],
+            required=desc["required"],
+            metavar=desc["metavar"],
+        )
+        if desc["choices"] is not None:
+            self.type = click.Choice(desc["choices"])
+
+
+def _mark_help_shown(ctx):
+    ctx.find_root().command.help_shown = True
+
+
+class _SkeletonMixin:
+    # skeleton commands record on the root command whether help was actually
+    # shown, as options which take values can consume help option names
+    help_shown = False
+
+    def get_help_option(self, ctx):
+        option = super().get_help_option(ctx)
+        if option is not None:
+            show_help = option.callback
+
+            def callback(ctx, param, value):
+                if value and not ctx.resilient_parsing:
+                    _mark_help_shown(ctx)
+                show_help(ctx, param, value)
+
+            option.callback = callback
+        return option
+
+    def parse_args(self, ctx, args):
+        if not args and self.no_args_is_help and not ctx.resilient_parsing:
+            _mark_help_shown(ctx)
+        return super().parse_args(ctx, args)
+
+
+class _SnapshotCommand(_SkeletonMixin, click.Command):
+    pass
+
+
+class _SnapshotGroup(_SkeletonMixin, click.Group):
+    # snapshots record the order produced by `list_commands`, which may not
+    # be sorted for custom MultiCommands
+    def list_commands(self, ctx):
+        return list(self.commands)
+
+
+class _LazyPlaceholder(click.Command):
+    def make_context(self, info_name, args, parent=None, **extra):
+        raise SnapshotMiss(f"'{self.name}' was not loaded when the snapshot was made")
+
+
+def _build_skeleton(desc, param_hook=None):
+    if desc["lazy"]:
+        return _LazyPlaceholder(
+            desc["name"], short_help=desc["short_help"], hidden=desc["hidden"]
+        )
+
+    params = []
+    for param_desc in desc["params"]:
+        if param_desc["kind"] == "option":
+            param = _SnapshotOption(param_desc)
+        else:
+            param = _SnapshotArgument(param_desc)
+        if param_hook:
+            param_hook(param, param_desc)
+        params.append(param)
+
+    kwargs = dict(
+        context_settings=dict(desc["context_settings"]),
+        params=params,
+        help=desc["help"],
+        epilog=desc["epilog"],
+        short_help=desc["short_help"],
+        options_metavar=desc["options_metavar"],
+        add_help_option=desc["add_help_option"],
+        no_args_is_help=desc["no_args_is_help"],
+        hidden=desc["hidden"],
+        deprecated=desc["deprecated"],
+    )
+    if desc["subcommands"] is None:
+        return _SnapshotCommand(desc["name"], **kwargs)
+    return _SnapshotGroup(
+        desc["name"],
+        commands={
+            x["name"]: _build_skeleton(x, param_hook) for x in desc["subcommands"]
+        },
+        invoke_without_command=desc["invoke_without_command"],
+        chain=desc["chain"],
+        subcommand_metavar=desc["subcommand_metavar"],
+        **kwargs,
+    )
+
+
+def _help_option_names(desc, found=None):
+    found = set() if found is None else found
+    if not desc["lazy"]:
+        found.update(desc["context_settings"].get("help_option_names", ["--help"]))
+        for sub in desc["subcommands"] or ():
+            _help_option_names(sub, found)
+    return found
+
+
+class CommandSnapshot:
+    """
+    A snapshot of a command tree, with the fingerprint which was current when
+    it was produced
+    """
+
+    def __init__(self, tree, fingerprint):
+        self.tree = tree
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def from_command(cls, root_command, fingerprint):
+        return cls(describe_command(root_command), fingerprint)
+
+    @classmethod
+    def load(cls, path, fingerprint=None):
+        """
+        Load a snapshot from a file. If the file is missing or unreadable, or
+        if `fingerprint` is given and does not match, return None.
+        """
+        try:
+            with open(os.path.expanduser(path)) as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != SNAPSHOT_FORMAT_VERSION:
+            return None
+        if fingerprint is not None and data.get("fingerprint") != fingerprint:
+            return None
+        return cls(data["tree"], data["fingerprint"])
+
+    def dump(self, path):
+        data = {
+            "version": SNAPSHOT_FORMAT_VERSION,
+            "fingerprint": self.fingerprint,
+            "tree": self.tree,
+        }
+        atomic_write(
+            os.path.expanduser(path), json.dumps(data, separators=(",", ":")).encode()
+        )
+
+    def find(self, path):
+        """
+        Find the description of a command by its path, starting with the root
+        name (as in SubcommandRegistration paths). Returns None if not found.
+        """
+        if not path or path[0] != self.tree["name"]:
+            return None
+        cur = self.tree
+        for name in path[1:]:
+            cur = next(
+                (x for x in cur.get("subcommands") or () if x["name"] == name), None
+            )
+            if cur is None:
+                return None
+        return cur
+
+    def list_subcommands(self, path):
+        """
+        List the (name, short_help) pairs of the visible subcommands of the
+        command at `path`, or None if it is not in the snapshot
+        """
+        desc = self.find(path)
+        if desc is None or desc["lazy"] or desc["subcommands"] is None:
+            return None
+        return [
+            (sub["name"], sub["short_help"] or (sub.get("help") or "").split("\n")[0])
+            for sub in desc["subcommands"]
+            if not sub["hidden"]
+        ]
+
+    def to_click(self, param_hook=None):
+        """Build a skeleton click command tree from the snapshot"""
+        return _build_skeleton(self.tree, param_hook)
+
+    def requests_help(self, args):
+        """
+        Check whether or not a list of arguments might ask for help. This is a
+        quick check by option name, so e.g. the value of an option which
+        happens to be `--help` also matches.
+        """
+        if "--" in args:
+            args = args[: args.index("--")]
+        return bool(_help_option_names(self.tree).intersection(args))
+
+    def serve_help(self, args, prog_name=None):
+        """
+        If `args` requests help, render it from the snapshot and exit.
+
+        Returns False if help was not requested, or if it could not be
+        rendered from the snapshot (e.g. because it is for a lazy command
+        which was not loaded when the snapshot was taken).
+        """
+        if not self.requests_help(args):
+            return False
+        skeleton = self.to_click()
+        try:
+            # not in standalone mode, so that arguments which parse without
+            # showing help (or fail to parse) are left to the live tree
+            skeleton.main(args, prog_name=prog_name, standalone_mode=False)
+        except (SnapshotMiss, click.ClickException, click.Abort):
+            return False
+        if not skeleton.help_shown:
+            return False
+        sys.exit(0)
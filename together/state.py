@@ -1,7 +1,17 @@
+import contextvars
+import logging
 import warnings
 
 import click
 
+# logging levels for each verbosity (count of -v flags). Higher verbosities use
+# the last level
+VERBOSITY_LOG_LEVELS = (logging.WARNING, logging.INFO, logging.DEBUG)
+
+# the state for code running outside of the click context, e.g. in worker
+# threads. Set by the helpers in together.propagation
+_current_state = contextvars.ContextVar("together_state", default=None)
+
 
 class CommandState:
     """
@@ -18,12 +28,16 @@ class CommandState:
 
     Primarily, the CommandState allows easy access to the config object which
     may have been written by plugins. It also allows dict storage of command
-    values.
+    values, and access to the resources declared by plugins.
     """
 
-    def __init__(self, *, config=None):
+    def __init__(self, *, config=None, resources=None, logger_name=None):
         self.data = {}
         self.config = config
+        self.resources = resources
+        # if set, the logger which verbose_option configures ("" for the root
+        # logger)
+        self.logger_name = logger_name
 
     def set(self, optname, value):
         self.data[optname] = value
@@ -31,6 +45,12 @@ class CommandState:
     def get(self, optname, default=None):
         return self.data.get(optname, default)
 
+    def get_resource(self, name):
+        """Get a resource declared with the `together_resource` hook"""
+        if self.resources is None:
+            raise KeyError(f"no resource named '{name}' was declared")
+        return self.resources.get(name)
+
 
 def get_state():
     """
@@ -39,8 +59,84 @@ def get_state():
 
     Since in a normally defined `together` CLI this will be a CommandState
     object, it is called get_state
+
+    Outside of the click context (which is thread-local), the state propagated
+    by the helpers in `together.propagation` is used.
+    """
+    ctx = click.get_current_context(silent=True)
+    if ctx is None:
+        state = _current_state.get()
+        if state is not None:
+            return state
+        # no context or propagated state, let click raise its usual error
+        ctx = click.get_current_context()
+    return ctx.obj
+
+
+def get_resource(name):
+    """get a resource declared with the `together_resource` hook, building it
+    on first use in this invocation"""
+    return get_state().get_resource(name)
+
+
+def verbosity_to_log_level(verbosity):
+    """map a verbosity (count of -v flags) to a logging level"""
+    index = min(max(verbosity, 0), len(VERBOSITY_LOG_LEVELS) - 1)
+    return VERBOSITY_LOG_LEVELS[index]
+
+
+class EchoHandler(logging.Handler):
+    """
+    A logging handler which writes to stderr with click.echo. It looks up
+    stderr for each record, so it follows stream changes (e.g. by CliRunner).
     """
-    return click.get_current_context().obj
+
+    def emit(self, record):
+        try:
+            click.echo(self.format(record), err=True)
+        except Exception:
+            self.handleError(record)
+
+
+def configure_logging(verbosity, logger_name=""):
+    """
+    Set the level of a logger (the root logger, by default) from a verbosity,
+    and give it an EchoHandler if it does not have one. Returns the logger.
+    """
+    logger = logging.getLogger(logger_name or None)
+    level = verbosity_to_log_level(verbosity)
+    if logger.level != level:
+        logger.setLevel(level)
+    if not any(isinstance(x, EchoHandler) for x in logger.handlers):
+        handler = EchoHandler()
+        handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+
+class lazy_format:
+    """
+    A log message argument which is only computed if the message is emitted
+
+    >>> log.debug("state: %s", lazy_format(expensive_summary, data))
+
+    `func(*args, **kwargs)` is called when the argument is first formatted,
+    which logging skips entirely for disabled levels. The result is reused by
+    every handler.
+    """
+
+    __slots__ = ("func", "args", "kwargs", "_value")
+
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self._value = None
+
+    def __str__(self):
+        if self._value is None:
+            self._value = str(self.func(*self.args, **self.kwargs))
+        return self._value
 
 
 def get_verbosity():
@@ -66,6 +162,11 @@ def verbose_option(f):
         # counted at multiple parts of a command heirarchy (multiple
         # callback invocations)
         state.set("verbosity", current_value + value)
+        # the logging level is only changed when the verbosity changes, so
+        # checking whether a level is enabled stays cheap
+        logger_name = getattr(state, "logger_name", None)
+        if logger_name is not None:
+            configure_logging(current_value + value, logger_name)
 
     return click.option(
         "-v",
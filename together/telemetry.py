@@ -0,0 +1,187 @@
+"""
+Local, opt-in latency telemetry
+
+When `TogetherCLI.telemetry_path` or the TOGETHER_TELEMETRY environment
+variable names a file, each invocation appends one line of JSON to it with
+these keys:
+
+- "t": the time the invocation finished (seconds since the epoch)
+- "c": the invoked command path, as space-separated names
+- "p": the plugin which registered the command (or its nearest registered
+  parent group), or null
+- "s": startup time, in milliseconds: the time spent in `__call__` before the
+  root command was invoked, plus the time spent constructing the CLI (for its
+  first invocation)
+- "b": time spent invoking the root command, in milliseconds
+- "x": the exit status
+- "h": the name of the exception handler which handled an error, or null
+
+When the file grows past `max_bytes`, it is rotated to `<path>.1` (and older
+files to `<path>.2`, and so on, up to `backups`). Nothing is sent anywhere.
+
+`make_stats_command` builds a command which reports latency percentiles from
+these files, per command path or per plugin.
+"""
+
+import json
+import os
+import time
+
+import click
+
+DEFAULT_MAX_BYTES = 1024 * 1024
+DEFAULT_BACKUPS = 3
+
+
+def get_telemetry_path(default=None):
+    """Get the telemetry file from TOGETHER_TELEMETRY, or `default`"""
+    return os.getenv("TOGETHER_TELEMETRY") or default
+
+
+def make_record(command, plugin, startup, body, exit_status, handler=None):
+    """Build a telemetry record from times in seconds"""
+    return {
+        "t": round(time.time(), 3),
+        "c": command,
+        "p": plugin,
+        "s": round(startup * 1000, 3),
+        "b": round(body * 1000, 3),
+        "x": exit_status,
+        "h": handler,
+    }
+
+
+class TelemetryLog:
+    """An append-only file of telemetry records, rotated by size"""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, backups=DEFAULT_BACKUPS):
+        self.path = os.path.expanduser(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def paths(self):
+        """The paths of the log and its rotated files, oldest first"""
+        rotated = [f"{self.path}.{n}" for n in range(self.backups, 0, -1)]
+        return rotated + [self.path]
+
+    def _rotate(self):
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{n}"):
+                os.replace(f"{self.path}.{n}", f"{self.path}.{n + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.unlink(self.path)
+
+    def append(self, record):
+        """
+        Append a record, rotating the log first if it is full. Errors are
+        ignored, so that telemetry can never break the CLI.
+        """
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        try:
+            if os.path.getsize(self.path) + len(line) > self.max_bytes:
+                self._rotate()
+        except OSError:
+            pass
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # a single write in append mode, so that concurrent invocations
+            # do not interleave their lines
+            with open(self.path, "a") as fp:
+                fp.write(line)
+        except OSError:
+            pass
+
+    def read(self):
+        """Yield every record in the log, oldest first, skipping bad lines"""
+        for path in self.paths():
+            try:
+                with open(path) as fp:
+                    for line in fp:
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            continue
+            except OSError:
+                continue
+
+
+def percentile(sorted_values, pct):
+    """Get the nearest-rank percentile of a sorted, non-empty list"""
+    index = max(0, -(-len(sorted_values) * pct // 100) - 1)
+    return sorted_values[int(index)]
+
+
+def summarize(records, by="command"):
+    """
+    Group records by "command" or "plugin", and describe the latency of each
+    group, as a list of dicts sorted by total p50 latency (slowest first)
+    """
+    key = {"command": "c", "plugin": "p"}[by]
+    groups = {}
+    for record in records:
+        groups.setdefault(record.get(key), []).append(record)
+
+    rows = []
+    for name, group in groups.items():
+        total = sorted(x["s"] + x["b"] for x in group)
+        startup = sorted(x["s"] for x in group)
+        body = sorted(x["b"] for x in group)
+        rows.append(
+            {
+                by: name,
+                "count": len(group),
+                "errors": sum(1 for x in group if x.get("x")),
+                "p50_ms": percentile(total, 50),
+                "p90_ms": percentile(total, 90),
+                "p99_ms": percentile(total, 99),
+                "startup_p50_ms": percentile(startup, 50),
+                "body_p50_ms": percentile(body, 50),
+            }
+        )
+    rows.sort(key=lambda x: x["p50_ms"], reverse=True)
+    return rows
+
+
+def make_stats_command(path=None, name="stats"):
+    """
+    Build a command which reports latency percentiles from the telemetry file
+    at `path` (by default, from TOGETHER_TELEMETRY). Plugins can register it
+    like any other command.
+    """
+    # imported here so that recording telemetry does not import the output
+    # layer
+    from together.output import format_option, write_records
+
+    @click.command(name)
+    @click.option(
+        "--file",
+        "log_path",
+        default=lambda: get_telemetry_path(path),
+        help="The telemetry file to read (default: TOGETHER_TELEMETRY).",
+    )
+    @click.option(
+        "--by",
+        type=click.Choice(["command", "plugin"]),
+        default="command",
+        show_default=True,
+        help="Group invocations by command path or by plugin.",
+    )
+    @format_option
+    def stats(log_path, by):
+        """Show latency percentiles for recorded invocations."""
+        if not log_path:
+            raise click.UsageError("no telemetry file given or configured")
+        write_records(summarize(TelemetryLog(log_path).read(), by=by))
+
+    return stats
+
+
+main = make_stats_command(name="telemetry")
+
+if __name__ == "__main__":
+    from together.state import CommandState
+
+    # run outside of a TogetherCLI, so provide the state for format_option
+    main(obj=CommandState())